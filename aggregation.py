@@ -0,0 +1,544 @@
+"""
+Fused aggregation engine for the seven sentiment analyses.
+
+Analyses 1-7 used to run seven separate `groupby` calls over the merged frame,
+recomputing overlapping statistics and falling back to Python lambdas for the
+win/loss counts and quartiles. `fused_tables` factorizes each key column once,
+computes every statistic in vectorized passes (`aggregators.Moments` for
+counts/sums/means/stds, one sort per measure for medians and quartiles) and
+projects the results into the existing CSV layouts with `build_tables`.
+
+Top accounts (analysis 7, and the per-coin / per-month variants from
+`account_rankings`) are picked by `top_k_rows` with vectorized passes: a
+sampled threshold per group discards rows that cannot rank, and one lexsort
+over (group, metric, row) ranks the rest. No per-group `nlargest` callback.
+
+`pandas_tables` keeps the original groupby implementation as the reference
+for `check_parity`.
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregators import GroupTable, Moments, group_quantiles
+from schema import decategorize
+
+TABLE_NAMES = [
+    'sentiment_aggregated_metrics',
+    'profitability_by_sentiment',
+    'volume_analysis_by_sentiment',
+    'risk_analysis_by_sentiment',
+    'buy_sell_analysis',
+    'time_trends',
+    'top_accounts_by_sentiment',
+]
+
+# Measure columns needed per grouping. `account_seen` is 1.0 where `Account`
+# is present, so its count reproduces `'Account': 'count'`.
+SENTIMENT_MEASURES = ['account_seen', 'Size USD', 'Closed PnL', 'win', 'loss',
+                      'abs_pnl', 'Fee', 'Size Tokens', 'risk_reward_ratio']
+FLOW_MEASURES = ['account_seen', 'Size USD', 'Closed PnL']
+ACCOUNT_MEASURES = FLOW_MEASURES + ['win']
+
+# Measures whose standard deviation is reported (the rest skip the M2 pass)
+SPREAD_MEASURES = {'Size USD', 'Closed PnL', 'abs_pnl'}
+
+# Top-K ranking metrics: option name -> account_performance column
+RANK_METRICS = {
+    'pnl': 'total_pnl',
+    'volume': 'total_volume',
+    'trades': 'trade_count',
+    'win_rate': 'win_rate',
+}
+DEFAULT_TOP_K = 5
+
+# Top-K groupings beyond sentiment: option name -> extra key column
+TOP_K_GROUPINGS = {
+    'coin': 'Coin',
+    'month': 'year_month',
+}
+
+# Measures behind `grouped_metrics`
+METRIC_MEASURES = ['account_seen', 'Size USD', 'Closed PnL', 'win', 'loss', 'abs_pnl', 'Fee']
+
+# Per-entity report groupings: option name -> key column
+REPORT_GROUPINGS = {
+    'account': 'Account',
+    'coin': 'Coin',
+}
+
+# Per-sentiment order statistics: measure -> quantiles
+QUANTILES = {
+    'Closed PnL': [0.5, 0.25, 0.75],
+    'Size USD': [0.5],
+    'abs_pnl': [0.5],
+    'risk_reward_ratio': [0.5],
+}
+
+
+# ---------- Projection into the CSV layouts ----------
+
+def _frame(table, columns):
+    """Keys plus statistics, ordered like a sorted groupby."""
+    frame = decategorize(table.keys.copy())
+    for name, values in columns.items():
+        frame[name] = values
+    return frame.sort_values(list(table.keys.columns), kind='stable').reset_index(drop=True)
+
+
+def _flow_columns(table, names):
+    pnl = table.moments['Closed PnL']
+    values = {
+        'trade_count': table.moments['account_seen'].count,
+        'total_volume': table.moments['Size USD'].sum(),
+        'total_pnl': pnl.sum(),
+        'avg_pnl': pnl.avg(),
+    }
+    return {new: values[old] for old, new in names.items()}
+
+
+# Above this many rows, top_k_rows pre-filters with a strided sample before sorting
+_TOP_K_SAMPLE_ROWS = 1 << 16
+
+
+def _ranked(codes, values, rows):
+    """`rows` sorted by group, `values` descending and position, with each row's rank in its group."""
+    order = rows[np.lexsort([rows, -values[rows]] + [c[rows] for c in reversed(codes)])]
+    position = np.arange(len(order))
+    starts = np.ones(len(order), dtype=bool)
+    if len(order):
+        starts[1:] = np.logical_or.reduce([c[order][1:] != c[order][:-1] for c in codes])
+    return order, position - np.maximum.accumulate(np.where(starts, position, 0))
+
+
+def top_k_rows(frame, by, metric, k):
+    """
+    The `k` rows with the largest `metric` in each `by` group, without per-group calls.
+
+    Matches `frame.groupby(by).apply(lambda x: x.nlargest(k, metric))`: groups
+    in sorted key order, ties kept in their original row order, rows with a
+    missing key or metric dropped.
+    """
+    values = frame[metric].to_numpy(dtype=np.float64, na_value=np.nan)
+    codes = [pd.factorize(frame[column], sort=True)[0] for column in by]
+    rows = np.flatnonzero(np.logical_and.reduce([c >= 0 for c in codes] + [~np.isnan(values)]))
+
+    if k > 0 and len(rows) > _TOP_K_SAMPLE_ROWS:
+        # The k-th largest value within a strided sample of a group bounds the
+        # group's k-th largest from below, so rows under it cannot make the
+        # top k: only the remaining candidates are sorted
+        group = codes[0].astype(np.int64)
+        for c in codes[1:]:
+            group = group * (int(c.max()) + 1) + c
+        group = pd.factorize(group)[0]
+        order, rank = _ranked(codes, values, rows[::len(rows) // _TOP_K_SAMPLE_ROWS + 1])
+        kth = order[rank == k - 1]
+        threshold = np.full(int(group.max()) + 1, -np.inf)
+        threshold[group[kth]] = values[kth]
+        rows = rows[values[rows] >= threshold[group[rows]]]
+
+    order, rank = _ranked(codes, values, rows)
+    return frame.iloc[order[rank < k]].reset_index(drop=True)
+
+
+def _account_columns(table, rank_by):
+    columns = _flow_columns(table, {
+        'total_pnl': 'total_pnl', 'trade_count': 'trade_count', 'total_volume': 'total_volume'})
+    if rank_by == 'win_rate':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns['win_rate'] = table.moments['win'].sum() / table.rows
+    return columns
+
+
+def build_tables(sentiment, side, monthly, accounts, quantiles, has_tokens=True,
+                 top_k=DEFAULT_TOP_K, rank_by='pnl'):
+    """
+    Project grouped partial aggregates into the seven analysis tables.
+
+    `quantiles` maps measure -> {q: per-group values aligned with `sentiment`}.
+    Column names, dtypes, rounding and row order match `pandas_tables`.
+    Analysis 7 keeps the `top_k` accounts per sentiment by `rank_by`
+    (a `RANK_METRICS` key).
+    """
+    m = sentiment.moments
+    size, pnl = m['Size USD'], m['Closed PnL']
+    wins = m['win'].sum().astype(np.int64)
+    losses = m['loss'].sum().astype(np.int64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        win_rate = m['win'].sum() / sentiment.rows
+
+    sentiment_agg = _frame(sentiment, {
+        'total_trades': m['account_seen'].count,
+        'total_volume_usd': size.sum(),
+        'avg_trade_size_usd': size.avg(),
+        'std_trade_size': size.std(),
+        'total_pnl': pnl.sum(),
+        'avg_pnl': pnl.avg(),
+        'std_pnl': pnl.std(),
+        'median_pnl': quantiles['Closed PnL'][0.5],
+        'win_rate': win_rate,
+        'avg_abs_pnl': m['abs_pnl'].avg(),
+        'total_fees': m['Fee'].sum(),
+    }).round(2)
+    sentiment_agg = sentiment_agg.sort_values('total_trades', ascending=False)
+
+    profitability = _frame(sentiment, {
+        'total_pnl': pnl.sum(),
+        'avg_pnl': pnl.avg(),
+        'median_pnl': quantiles['Closed PnL'][0.5],
+        'winning_trades': wins,
+        'losing_trades': losses,
+        'wins': wins,
+        'losses': losses,
+    }).round(2)
+    profitability['profit_margin'] = (profitability['total_pnl'] / profitability['total_pnl'].abs().sum() * 100).round(2)
+
+    volume_columns = {
+        'total_volume_usd': size.sum(),
+        'avg_volume_usd': size.avg(),
+        'median_volume_usd': quantiles['Size USD'][0.5],
+        'trade_count': size.count,
+    }
+    if has_tokens:
+        volume_columns['total_tokens'] = m['Size Tokens'].sum()
+        volume_columns['avg_tokens'] = m['Size Tokens'].avg()
+    volume_analysis = _frame(sentiment, volume_columns).round(2)
+
+    risk_analysis = _frame(sentiment, {
+        'avg_abs_pnl': m['abs_pnl'].avg(),
+        'median_abs_pnl': quantiles['abs_pnl'][0.5],
+        'std_abs_pnl': m['abs_pnl'].std(),
+        'avg_risk_reward': m['risk_reward_ratio'].avg(),
+        'median_risk_reward': quantiles['risk_reward_ratio'][0.5],
+        'pnl_std': pnl.std(),
+        'pnl_q25': quantiles['Closed PnL'][0.25],
+        'pnl_q75': quantiles['Closed PnL'][0.75],
+    }).round(2)
+
+    buy_sell_analysis = _frame(side, _flow_columns(side, {
+        'trade_count': 'trade_count', 'total_volume': 'total_volume',
+        'total_pnl': 'total_pnl', 'avg_pnl': 'avg_pnl'})).round(2)
+    buy_sell_analysis['side'] = buy_sell_analysis['is_buy'].map({True: 'BUY', False: 'SELL'})
+
+    time_trends = _frame(monthly, _flow_columns(monthly, {
+        'trade_count': 'trade_count', 'total_volume': 'volume', 'total_pnl': 'pnl'})).round(2)
+
+    account_performance = _frame(accounts, _account_columns(accounts, rank_by)).round(2)
+    top_accounts = top_k_rows(account_performance, ['classification'], RANK_METRICS[rank_by], top_k)
+
+    return dict(zip(TABLE_NAMES, [
+        sentiment_agg, profitability, volume_analysis, risk_analysis,
+        buy_sell_analysis, time_trends, top_accounts,
+    ]))
+
+
+# ---------- Fused engine ----------
+
+class FusedAggregator:
+    """Factorizes each key column of `merged` once and aggregates any grouping of them."""
+
+    def __init__(self, merged):
+        self.merged = merged
+        self._factors = {}
+        self._values = {}
+
+    def factor(self, column):
+        """Sorted codes for one key column (-1 for missing), computed once."""
+        if column not in self._factors:
+            series = self.merged[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Categorical codes already follow groupby's sort order
+                codes = series.cat.codes.to_numpy().astype(np.int64)
+                uniques = series.cat.categories
+            else:
+                codes, uniques = pd.factorize(series, sort=True)
+            self._factors[column] = (codes, pd.Series(uniques))
+        return self._factors[column]
+
+    def values(self, measure):
+        if measure not in self._values:
+            if measure == 'account_seen':
+                values = np.where(self.merged['Account'].notna(), 1.0, np.nan)
+            elif measure in self.merged.columns:
+                values = self.merged[measure].to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                values = np.full(len(self.merged), np.nan)
+            self._values[measure] = values
+        return self._values[measure]
+
+    def group_codes(self, names):
+        """Dense group ids for a key combination, ordered like a sorted groupby."""
+        factors = [self.factor(name) for name in names]
+        valid = np.logical_and.reduce([codes >= 0 for codes, _ in factors])
+        dims = tuple(max(len(uniques), 1) for _, uniques in factors)
+        composite = factors[0][0] if len(names) == 1 else np.ravel_multi_index(
+            tuple(np.where(valid, codes, 0) for codes, _ in factors), dims)
+        composite = composite[valid]
+
+        key_space = int(np.prod(dims, dtype=np.float64))
+        if key_space <= max(4 * len(composite), 1 << 16):
+            # Compact key space: renumber the observed keys with a dense lookup
+            # table instead of hashing
+            observed = np.flatnonzero(np.bincount(composite, minlength=key_space))
+            lookup = np.full(key_space, -1, dtype=np.int64)
+            lookup[observed] = np.arange(len(observed))
+            codes, uniques = lookup[composite], observed
+        else:
+            codes, uniques = pd.factorize(composite, sort=True)
+
+        parts = np.unravel_index(uniques, dims)
+        keys = pd.DataFrame({
+            name: factor[1].take(part).reset_index(drop=True)
+            for name, factor, part in zip(names, factors, parts)
+        })
+        return codes, valid, keys
+
+    def table(self, names, measures, spread=()):
+        codes, valid, keys = self.group_codes(names)
+        size = len(keys)
+        rows = np.bincount(codes, minlength=size).astype(np.int64)
+        all_valid = valid.all()
+        moments = {}
+        for measure in measures:
+            values = self.values(measure)
+            moments[measure] = Moments.from_values(
+                codes, values if all_valid else values[valid], size,
+                spread=measure in spread, extrema=False, counts=rows)
+        return GroupTable(keys, rows, moments), codes, valid
+
+
+def fused_tables(merged, top_k=DEFAULT_TOP_K, rank_by='pnl'):
+    """The seven analysis tables from one factorization per key and vectorized passes."""
+    engine = FusedAggregator(merged)
+    sentiment, codes, valid = engine.table(['classification'], SENTIMENT_MEASURES, SPREAD_MEASURES)
+    quantiles = {
+        measure: group_quantiles(codes, engine.values(measure)[valid], len(sentiment.keys), qs)
+        for measure, qs in QUANTILES.items()
+    }
+    side, _, _ = engine.table(['classification', 'is_buy'], FLOW_MEASURES)
+    monthly, _, _ = engine.table(['year_month', 'classification'], FLOW_MEASURES)
+    accounts, _, _ = engine.table(['classification', 'Account'], ACCOUNT_MEASURES)
+    return build_tables(sentiment, side, monthly, accounts, quantiles,
+                        has_tokens='Size Tokens' in merged.columns, top_k=top_k, rank_by=rank_by)
+
+
+def account_rankings(merged, grouping, top_k=DEFAULT_TOP_K, rank_by='pnl'):
+    """
+    Top `top_k` accounts by `rank_by` per sentiment and `grouping` (a
+    `TOP_K_GROUPINGS` key), in the layout of `top_accounts_by_sentiment`.
+    """
+    key = TOP_K_GROUPINGS[grouping]
+    table, _, _ = FusedAggregator(merged).table(['classification', key, 'Account'], ACCOUNT_MEASURES)
+    performance = _frame(table, _account_columns(table, rank_by)).round(2)
+    return top_k_rows(performance, ['classification', key], RANK_METRICS[rank_by], top_k)
+
+
+def sentiment_breakdown(merged, grouping):
+    """
+    Trades, volume, PnL, wins and fees per (`grouping`, sentiment), sorted by
+    the grouping key: the input of the per-account / per-coin reports.
+    `grouping` is a `REPORT_GROUPINGS` key.
+    """
+    key = REPORT_GROUPINGS[grouping]
+    table, _, _ = FusedAggregator(merged).table([key, 'classification'], ACCOUNT_MEASURES + ['Fee'])
+    columns = _flow_columns(table, {
+        'trade_count': 'trade_count', 'total_volume': 'total_volume',
+        'total_pnl': 'total_pnl', 'avg_pnl': 'avg_pnl'})
+    columns['wins'] = table.moments['win'].sum()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        columns['win_rate'] = columns['wins'] / table.rows
+    columns['total_fees'] = table.moments['Fee'].sum()
+    return _frame(table, columns)
+
+
+def grouped_metrics(merged, by=()):
+    """
+    Analysis 1's metrics plus win/loss counts and PnL quartiles per `by`
+    group of `merged` (over all of it when `by` is empty).
+
+    Rows with a missing key are left out, as in a groupby, and groups come in
+    sorted key order; grouped by `classification` the shared columns equal
+    `sentiment_aggregated_metrics`.
+    """
+    engine = FusedAggregator(merged)
+    if by:
+        codes, valid, keys = engine.group_codes(list(by))
+    else:
+        codes = np.zeros(len(merged), dtype=np.int64)
+        valid = np.ones(len(merged), dtype=bool)
+        keys = pd.DataFrame(index=range(1))
+    size = len(keys)
+    rows = np.bincount(codes, minlength=size).astype(np.int64)
+    m = {measure: Moments.from_values(codes, engine.values(measure)[valid], size,
+                                      spread=measure in SPREAD_MEASURES, extrema=False, counts=rows)
+         for measure in METRIC_MEASURES}
+    quantiles = group_quantiles(codes, engine.values('Closed PnL')[valid], size, [0.5, 0.25, 0.75])
+    size_usd, pnl = m['Size USD'], m['Closed PnL']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        win_rate = m['win'].sum() / rows
+
+    frame = decategorize(keys.copy())
+    for name, values in {
+        'total_trades': m['account_seen'].count,
+        'total_volume_usd': size_usd.sum(),
+        'avg_trade_size_usd': size_usd.avg(),
+        'std_trade_size': size_usd.std(),
+        'total_pnl': pnl.sum(),
+        'avg_pnl': pnl.avg(),
+        'std_pnl': pnl.std(),
+        'median_pnl': quantiles[0.5],
+        'pnl_q25': quantiles[0.25],
+        'pnl_q75': quantiles[0.75],
+        'wins': m['win'].sum().astype(np.int64),
+        'losses': m['loss'].sum().astype(np.int64),
+        'win_rate': win_rate,
+        'avg_abs_pnl': m['abs_pnl'].avg(),
+        'total_fees': m['Fee'].sum(),
+    }.items():
+        frame[name] = values
+    if by:
+        frame = frame.sort_values(list(by), kind='stable').reset_index(drop=True)
+    return frame.round(2)
+
+
+# ---------- Reference implementation ----------
+
+def pandas_tables(merged, top_k=DEFAULT_TOP_K, rank_by='pnl'):
+    """The original per-analysis groupby implementation, kept as the parity reference."""
+    # Analysis 1: Overall metrics by sentiment
+    sentiment_agg = merged.groupby('classification', observed=True).agg({
+        'Account': 'count',
+        'Size USD': ['sum', 'mean', 'std'],
+        'Closed PnL': ['sum', 'mean', 'std', 'median'],
+        'win': 'mean',
+        'abs_pnl': 'mean',
+        'Fee': 'sum'
+    }).round(2)
+
+    sentiment_agg.columns = [
+        'total_trades', 'total_volume_usd', 'avg_trade_size_usd', 'std_trade_size',
+        'total_pnl', 'avg_pnl', 'std_pnl', 'median_pnl', 'win_rate', 'avg_abs_pnl', 'total_fees'
+    ]
+
+    sentiment_agg = decategorize(sentiment_agg.reset_index())
+    sentiment_agg = sentiment_agg.sort_values('total_trades', ascending=False)
+
+    # Analysis 2: Profitability analysis
+    profitability = merged.groupby('classification', observed=True).agg({
+        'Closed PnL': ['sum', 'mean', 'median', lambda x: (x > 0).sum(), lambda x: (x < 0).sum()],
+        'win': 'sum',
+        'loss': 'sum'
+    }).round(2)
+
+    profitability.columns = ['total_pnl', 'avg_pnl', 'median_pnl', 'winning_trades', 'losing_trades', 'wins', 'losses']
+    profitability = decategorize(profitability.reset_index())
+    profitability['profit_margin'] = (profitability['total_pnl'] / profitability['total_pnl'].abs().sum() * 100).round(2)
+
+    # Analysis 3: Volume analysis
+    volume_analysis = merged.groupby('classification', observed=True).agg({
+        'Size USD': ['sum', 'mean', 'median', 'count'],
+        'Size Tokens': ['sum', 'mean'] if 'Size Tokens' in merged.columns else []
+    }).round(2)
+
+    if 'Size Tokens' in merged.columns:
+        volume_analysis.columns = ['total_volume_usd', 'avg_volume_usd', 'median_volume_usd', 'trade_count',
+                                   'total_tokens', 'avg_tokens']
+    else:
+        volume_analysis.columns = ['total_volume_usd', 'avg_volume_usd', 'median_volume_usd', 'trade_count']
+
+    volume_analysis = decategorize(volume_analysis.reset_index())
+
+    # Analysis 4: Risk analysis
+    risk_analysis = merged.groupby('classification', observed=True).agg({
+        'abs_pnl': ['mean', 'median', 'std'],
+        'risk_reward_ratio': ['mean', 'median'],
+        'Closed PnL': ['std', lambda x: x.quantile(0.25), lambda x: x.quantile(0.75)]
+    }).round(2)
+
+    risk_analysis.columns = ['avg_abs_pnl', 'median_abs_pnl', 'std_abs_pnl',
+                             'avg_risk_reward', 'median_risk_reward',
+                             'pnl_std', 'pnl_q25', 'pnl_q75']
+    risk_analysis = decategorize(risk_analysis.reset_index())
+
+    # Analysis 5: Buy vs Sell behavior
+    buy_sell_analysis = merged.groupby(['classification', 'is_buy'], observed=True).agg({
+        'Account': 'count',
+        'Size USD': 'sum',
+        'Closed PnL': ['sum', 'mean']
+    }).round(2)
+
+    buy_sell_analysis.columns = ['trade_count', 'total_volume', 'total_pnl', 'avg_pnl']
+    buy_sell_analysis = decategorize(buy_sell_analysis.reset_index())
+    buy_sell_analysis['side'] = buy_sell_analysis['is_buy'].map({True: 'BUY', False: 'SELL'})
+
+    # Analysis 6: Time-based trends
+    time_trends = merged.groupby(['year_month', 'classification'], observed=True).agg({
+        'Account': 'count',
+        'Size USD': 'sum',
+        'Closed PnL': 'sum'
+    }).round(2)
+
+    time_trends.columns = ['trade_count', 'volume', 'pnl']
+    time_trends = decategorize(time_trends.reset_index())
+
+    # Analysis 7: Top performing accounts by sentiment
+    account_performance = merged.groupby(['classification', 'Account'], observed=True).agg({
+        'Closed PnL': 'sum',
+        'Account': 'count',
+        'Size USD': 'sum',
+        **({'win': 'mean'} if rank_by == 'win_rate' else {})
+    }).round(2)
+
+    account_performance.columns = ['total_pnl', 'trade_count', 'total_volume'] + (
+        ['win_rate'] if rank_by == 'win_rate' else [])
+    account_performance = decategorize(account_performance.reset_index())
+    top_accounts = account_performance.groupby('classification').apply(
+        lambda x: x.nlargest(top_k, RANK_METRICS[rank_by])
+    ).reset_index(drop=True)
+
+    return dict(zip(TABLE_NAMES, [
+        sentiment_agg, profitability, volume_analysis, risk_analysis,
+        buy_sell_analysis, time_trends, top_accounts,
+    ]))
+
+
+def key_insights(sentiment_agg):
+    """The summary's leading sentiments by volume, average PnL and win rate ('nan' when there are none)."""
+    def leader(column):
+        if sentiment_agg[column].isna().all():
+            return 'nan'
+        return str(sentiment_agg.loc[sentiment_agg[column].idxmax(), 'classification'])
+
+    return {
+        'highest_volume_sentiment': leader('total_volume_usd'),
+        'highest_avg_pnl_sentiment': leader('avg_pnl'),
+        'highest_win_rate_sentiment': leader('win_rate'),
+    }
+
+
+# ---------- Parity check ----------
+
+def check_parity(expected, actual, rtol=1e-9):
+    """
+    Compare two sets of tables. Returns a list of `(table, status)` pairs.
+
+    `status` is 'identical' when the CSV text matches byte for byte, 'close'
+    when values agree within `rtol` (e.g. a last-digit rounding difference
+    from a different summation order) and otherwise a description of the
+    first mismatch.
+    """
+    results = []
+    for name in TABLE_NAMES:
+        left, right = expected[name], actual[name]
+        if left.to_csv(index=False) == right.to_csv(index=False):
+            results.append((name, 'identical'))
+            continue
+        try:
+            pd.testing.assert_frame_equal(
+                left.reset_index(drop=True), right.reset_index(drop=True),
+                check_dtype=False, check_exact=False, rtol=rtol, atol=0.01,
+            )
+            results.append((name, 'close'))
+        except AssertionError as exc:
+            results.append((name, 'MISMATCH: ' + str(exc).splitlines()[0]))
+    return results
@@ -0,0 +1,591 @@
+"""
+Mergeable partial aggregates for chunked and partitioned analysis.
+
+Every aggregate here can be built from one slice of the trades and merged with
+the aggregate of another slice, so the seven analysis tables can be produced
+without holding the full trade history in memory:
+
+- `KeyIndex` assigns stable integer ids to group keys seen across chunks.
+- `Moments` keeps count, sum, mean, M2 (Welford/Chan), min and max per group.
+- `GroupedStats` ties a `KeyIndex` to a set of `Moments`, one per measure,
+  and freezes into a `GroupTable` for projection. Fine-grained stats can be
+  rolled up to a coarser key and saved to / restored from plain arrays.
+- `group_quantiles` gives exact in-memory per-group quantiles from one sort.
+- `group_sorted_keys` / `run_quantiles` split that in two: partitions sort
+  their own values, and exact quantiles of the union are selected from the
+  sorted runs (e.g. memory-mapped files written by worker processes).
+- `ValueSpill` appends per-group values to disk and answers exact quantiles
+  with a bounded-memory radix select, for the statistics (median, quartiles)
+  that have no mergeable form.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+class KeyIndex:
+    """Dense integer ids for group-key tuples, stable across chunks."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.ids = {}
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def encode(self, frame):
+        """
+        Map each row of `frame[self.names]` to a global id.
+
+        Returns `(codes, mask)`; rows with a missing key component are dropped
+        (as `groupby` does) and excluded by `mask`.
+        """
+        keys = frame[self.names]
+        mask = keys.notna().all(axis=1).to_numpy()
+        keys = keys[mask]
+        if len(self.names) == 1:
+            local_codes, local_uniques = pd.factorize(keys.iloc[:, 0])
+            local_uniques = [(k,) for k in local_uniques]
+        else:
+            local_codes, local_uniques = pd.factorize(pd.MultiIndex.from_frame(keys))
+        lookup = np.empty(len(local_uniques), dtype=np.int64)
+        for i, key in enumerate(local_uniques):
+            key = tuple(key)
+            gid = self.ids.get(key)
+            if gid is None:
+                gid = self.ids[key] = len(self.keys)
+                self.keys.append(key)
+            lookup[i] = gid
+        return lookup[local_codes], mask
+
+    def remap(self, other):
+        """Ids in `self` for every key of `other`, adding keys that are new."""
+        lookup = np.empty(len(other), dtype=np.int64)
+        for i, key in enumerate(other.keys):
+            gid = self.ids.get(key)
+            if gid is None:
+                gid = self.ids[key] = len(self.keys)
+                self.keys.append(key)
+            lookup[i] = gid
+        return lookup
+
+    def to_frame(self):
+        return pd.DataFrame(self.keys, columns=self.names)
+
+
+class Moments:
+    """Per-group count, sum, mean, M2, min and max of one measure; NaNs are skipped."""
+
+    FIELDS = ('count', 'total', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, size=0):
+        self.count = np.zeros(size, dtype=np.int64)
+        self.total = np.zeros(size)
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+
+    def __len__(self):
+        return len(self.count)
+
+    def grow(self, size):
+        extra = size - len(self)
+        if extra <= 0:
+            return
+        self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+        self.total = np.concatenate([self.total, np.zeros(extra)])
+        self.mean = np.concatenate([self.mean, np.zeros(extra)])
+        self.m2 = np.concatenate([self.m2, np.zeros(extra)])
+        self.min = np.concatenate([self.min, np.full(extra, np.inf)])
+        self.max = np.concatenate([self.max, np.full(extra, -np.inf)])
+
+    @classmethod
+    def from_values(cls, codes, values, size, spread=True, extrema=True, counts=None):
+        """
+        Moments of `values` grouped by `codes`, in vectorized passes.
+
+        `spread=False` skips M2 and `extrema=False` skips min/max (left at 0 and
+        +/-inf) when only counts, sums and means are needed. `counts` may pass
+        in the per-group row counts, reused when `values` has no NaNs.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if not valid.all():
+            codes, values = codes[valid], values[valid]
+            counts = None
+
+        part = cls(size)
+        part.count = counts if counts is not None else np.bincount(codes, minlength=size).astype(np.int64)
+        part.total = np.bincount(codes, weights=values, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            part.mean = np.where(part.count > 0, part.total / part.count, 0.0)
+        if spread:
+            # Two-pass M2 within the slice; slices are combined with Chan's update
+            deviation = values - part.mean[codes]
+            part.m2 = np.bincount(codes, weights=deviation * deviation, minlength=size)
+        if extrema:
+            np.minimum.at(part.min, codes, values)
+            np.maximum.at(part.max, codes, values)
+        return part
+
+    def merge(self, other, lookup=None):
+        """
+        Fold `other` into `self` (Chan et al. parallel update).
+
+        `lookup` maps `other`'s group ids to ids in `self`; identity by default.
+        """
+        if lookup is None:
+            lookup = np.arange(len(other))
+        self.grow(int(lookup.max()) + 1 if len(lookup) else 0)
+
+        n_a = self.count[lookup].astype(np.float64)
+        n_b = other.count.astype(np.float64)
+        n = n_a + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = other.mean - self.mean[lookup]
+            mean = np.where(n > 0, self.mean[lookup] + delta * n_b / n, 0.0)
+            m2 = self.m2[lookup] + other.m2 + np.where(n > 0, delta ** 2 * n_a * n_b / n, 0.0)
+
+        self.count[lookup] += other.count
+        self.total[lookup] += other.total
+        self.mean[lookup] = mean
+        self.m2[lookup] = m2
+        self.min[lookup] = np.minimum(self.min[lookup], other.min)
+        self.max[lookup] = np.maximum(self.max[lookup], other.max)
+        return self
+
+    def take(self, index):
+        """The groups at positions `index` (repeats allowed), e.g. to roll one group into several."""
+        part = Moments()
+        for field in self.FIELDS:
+            setattr(part, field, getattr(self, field)[index])
+        return part
+
+    def rollup(self, codes, size, extrema=True):
+        """
+        Combine groups into `size` coarser groups.
+
+        `codes[i]` is the new id of group `i` (-1 drops it). M2 uses the
+        parallel-variance identity, so the result equals the moments of the
+        pooled values. `extrema=False` skips min/max (for groups built without
+        them).
+        """
+        keep = codes >= 0
+        codes = codes[keep]
+        count, mean = self.count[keep], self.mean[keep]
+
+        part = Moments(size)
+        part.count = np.bincount(codes, weights=count, minlength=size).astype(np.int64)
+        part.total = np.bincount(codes, weights=self.total[keep], minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            part.mean = np.where(part.count > 0, part.total / part.count, 0.0)
+        with np.errstate(invalid='ignore'):
+            deviation = np.where(count > 0, mean - part.mean[codes], 0.0)
+        part.m2 = (np.bincount(codes, weights=self.m2[keep], minlength=size)
+                   + np.bincount(codes, weights=count * deviation * deviation, minlength=size))
+        if extrema:
+            np.minimum.at(part.min, codes, self.min[keep])
+            np.maximum.at(part.max, codes, self.max[keep])
+        return part
+
+    def sum(self):
+        return self.total
+
+    def avg(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.total / self.count, np.nan)
+
+    def std(self):
+        """Sample standard deviation (ddof=1), NaN for groups with fewer than two values."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+
+class GroupTable:
+    """Group keys (one row per group) with row counts and per-measure `Moments`."""
+
+    def __init__(self, keys, rows, moments):
+        self.keys = keys
+        self.rows = rows
+        self.moments = moments
+
+
+class GroupedStats:
+    """
+    `Moments` for several measures over one grouping.
+
+    `rows` counts every row of a group (including rows whose measures are NaN),
+    which is the denominator `groupby(...).mean()` uses for boolean columns.
+    """
+
+    def __init__(self, names, measures):
+        self.index = KeyIndex(names)
+        self.measures = list(measures)
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.moments = {m: Moments() for m in self.measures}
+
+    def update(self, frame):
+        codes, mask = self.index.encode(frame)
+        size = len(self.index)
+        self._grow(size)
+        self.rows += np.bincount(codes, minlength=size)
+        for measure in self.measures:
+            values = frame[measure].to_numpy(dtype=np.float64, na_value=np.nan)[mask]
+            self.moments[measure].merge(Moments.from_values(codes, values, size))
+        return codes, mask
+
+    def merge(self, other):
+        lookup = self.index.remap(other.index)
+        self._grow(len(self.index))
+        np.add.at(self.rows, lookup, other.rows)
+        for measure in self.measures:
+            self.moments[measure].merge(other.moments[measure], lookup)
+        return self
+
+    def _grow(self, size):
+        if size > len(self.rows):
+            self.rows = np.concatenate([self.rows, np.zeros(size - len(self.rows), dtype=np.int64)])
+        for moments in self.moments.values():
+            moments.grow(size)
+
+    def keys(self):
+        return self.index.to_frame()
+
+    def table(self):
+        return GroupTable(self.keys(), self.rows, self.moments)
+
+    def rollup(self, keys):
+        """
+        Re-group onto coarser keys.
+
+        `keys` is a frame with one row per existing group giving its new key
+        (rows with a missing component are dropped). Returns the new
+        `GroupedStats` and each old group's new id (-1 when dropped).
+        """
+        coarse = GroupedStats(keys.columns, self.measures)
+        codes, mask = coarse.index.encode(keys)
+        size = len(coarse.index)
+        lookup = np.full(len(keys), -1, dtype=np.int64)
+        lookup[mask] = codes
+        coarse.rows = np.bincount(codes, weights=self.rows[mask], minlength=size).astype(np.int64)
+        coarse.moments = {m: self.moments[m].rollup(lookup, size) for m in self.measures}
+        return coarse, lookup
+
+    @classmethod
+    def from_table(cls, table):
+        """Mergeable stats from a `GroupTable` (e.g. one computed by `FusedAggregator`)."""
+        stats = cls(table.keys.columns, table.moments)
+        for key in table.keys.itertuples(index=False, name=None):
+            stats.index.ids[key] = len(stats.index.keys)
+            stats.index.keys.append(key)
+        stats.rows = np.asarray(table.rows, dtype=np.int64)
+        stats.moments = dict(table.moments)
+        return stats
+
+    def to_arrays(self, prefix):
+        """Flat `{name: ndarray}` snapshot (keys, row counts, moments) for `np.savez`."""
+        arrays = {f'{prefix}/rows': self.rows}
+        columns = list(zip(*self.index.keys)) if len(self.index) else [[] for _ in self.index.names]
+        for name, column in zip(self.index.names, columns):
+            arrays[f'{prefix}/key/{name}'] = np.asarray(column)
+        for measure, moments in self.moments.items():
+            for field in Moments.FIELDS:
+                arrays[f'{prefix}/{measure}/{field}'] = getattr(moments, field)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, names, measures, arrays, prefix):
+        """Inverse of `to_arrays`."""
+        stats = cls(names, measures)
+        columns = [arrays[f'{prefix}/key/{name}'].tolist() for name in names]
+        for key in zip(*columns):
+            stats.index.ids[key] = len(stats.index.keys)
+            stats.index.keys.append(key)
+        stats.rows = arrays[f'{prefix}/rows']
+        for measure, moments in stats.moments.items():
+            for field in Moments.FIELDS:
+                setattr(moments, field, arrays[f'{prefix}/{measure}/{field}'])
+        return stats
+
+
+# ---------- Exact quantiles with bounded memory ----------
+
+_SIGN_BIT = np.uint64(1 << 63)
+_RADIX_BITS = 16
+_RADIX_SIZE = 1 << _RADIX_BITS
+
+# Up to this many groups, quantiles sort each group's slice separately
+_SEGMENT_SORT_GROUPS = 4096
+
+
+def _float_to_key(values):
+    """Order-preserving map from float64 to uint64."""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    negative = (bits & _SIGN_BIT) != 0
+    return np.where(negative, ~bits, bits | _SIGN_BIT)
+
+
+def _key_to_float(keys):
+    keys = np.asarray(keys, dtype=np.uint64)
+    positive = (keys & _SIGN_BIT) != 0
+    return np.where(positive, keys & ~_SIGN_BIT, ~keys).view(np.float64)
+
+
+def _lerp(a, b, t):
+    """Linear interpolation exactly as numpy's 'linear' quantile method does it."""
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def _interpolated(n, qs, select):
+    """Linear-interpolated quantiles of `n` values, given `select(ranks) -> {rank: value}`."""
+    if n == 0:
+        return [np.nan] * len(qs)
+    positions = [q * (n - 1) for q in qs]
+    ranks = [int(np.floor(p)) for p in positions] + [int(np.ceil(p)) for p in positions]
+    values = select(ranks)
+    out = []
+    for pos in positions:
+        lo, hi = int(np.floor(pos)), int(np.ceil(pos))
+        out.append(float(_lerp(values[lo], values[hi], pos - lo)))
+    return out
+
+
+def group_sorted_keys(codes, values, size):
+    """Per-group sorted order-preserving keys of `values` (NaNs dropped), one array per group."""
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    codes, keys = codes[valid], _float_to_key(values[valid])
+    counts = np.bincount(codes, minlength=size)
+    keys = keys[np.argsort(codes, kind='stable')]
+    runs = np.split(keys, np.cumsum(counts)[:-1])
+    for run in runs:
+        run.sort()
+    return runs
+
+
+def select_runs(runs, ranks):
+    """
+    Values at 0-based ranks of the union of sorted key runs.
+
+    Bisects on the 64-bit key: each step counts the keys at or below the
+    midpoint with one binary search per run, so the runs are never merged.
+    """
+    found = {}
+    for rank in sorted(set(int(r) for r in ranks)):
+        lo, hi = 0, (1 << 64) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            below = sum(int(np.searchsorted(run, np.uint64(mid), side='right')) for run in runs)
+            if below > rank:
+                hi = mid
+            else:
+                lo = mid + 1
+        found[rank] = float(_key_to_float(np.array([lo], dtype=np.uint64))[0])
+    return found
+
+
+def run_quantiles(runs, qs):
+    """Exact linear-interpolated quantiles of the union of sorted key runs."""
+    return _interpolated(sum(len(run) for run in runs), qs, lambda ranks: select_runs(runs, ranks))
+
+
+def run_histogram(runs, bins):
+    """`np.histogram(values, bins)` of the union of sorted key runs, without merging them."""
+    runs = [run for run in runs if len(run)]
+    if runs:
+        ends = _key_to_float(np.array([min(run[0] for run in runs), max(run[-1] for run in runs)], dtype=np.uint64))
+    else:
+        ends = np.array([])
+    edges = np.histogram_bin_edges(ends, bins)
+    # A value is in bin i when edges[i] <= value < edges[i + 1] (the last bin
+    # also takes its right edge). As keys -0.0 sorts below 0.0, so a zero edge
+    # is searched as -0.0 from the left and as 0.0 from the right.
+    lower = _float_to_key(np.where(edges[:-1] == 0, -0.0, edges[:-1]))
+    upper = _float_to_key(np.where(edges[-1:] == 0, 0.0, edges[-1:]))
+    below = np.zeros(bins + 1, dtype=np.int64)
+    for run in runs:
+        below[:-1] += np.searchsorted(run, lower, side='left')
+        below[-1] += np.searchsorted(run, upper, side='right')[0]
+    return np.diff(below), edges
+
+
+def group_quantiles(codes, values, size, qs):
+    """
+    Exact per-group quantiles from one sort per group.
+
+    Returns `{q: array of length size}`; groups without values get NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    if not valid.all():
+        codes, values = codes[valid], values[valid]
+    counts = np.bincount(codes, minlength=size)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    # Bucket values by group (stable counting sort on small codes), then sort
+    # inside each bucket: much cheaper than a (group, value) lexsort when there
+    # are few groups, which is the case for the per-sentiment quantiles
+    small = np.int16 if size < np.iinfo(np.int16).max else np.int64
+    if size <= _SEGMENT_SORT_GROUPS:
+        ordered = values[np.argsort(codes.astype(small), kind='stable')]
+        for start, count in zip(starts, counts):
+            ordered[start:start + count].sort()
+    else:
+        order = np.argsort(values)
+        order = order[np.argsort(codes[order].astype(small), kind='stable')]
+        ordered = values[order]
+
+    empty = counts == 0
+    out = {}
+    for q in qs:
+        pos = q * np.maximum(counts - 1, 0)
+        lo, hi = np.floor(pos).astype(np.int64), np.ceil(pos).astype(np.int64)
+        if len(ordered):
+            a = ordered[np.minimum(starts + lo, len(ordered) - 1)]
+            b = ordered[np.minimum(starts + hi, len(ordered) - 1)]
+            out[q] = np.where(empty, np.nan, _lerp(a, b, pos - lo))
+        else:
+            out[q] = np.full(size, np.nan)
+    return out
+
+
+class ValueSpill:
+    """
+    Append-only on-disk store of one measure's values, split by group id.
+
+    Values are kept as order-preserving uint64 keys, one file per group, so an
+    exact quantile needs only sequential chunked reads: a radix select over the
+    top 16 bits narrows the answer to one bucket, and once a bucket holds no
+    more than `budget` values they are loaded and selected in memory.
+
+    `select` and `quantiles` accept a single group id or a list of ids, whose
+    values are then treated as one pooled group.
+    """
+
+    def __init__(self, directory, name, read_chunk=1 << 20, budget=1 << 22):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.read_chunk = read_chunk
+        self.budget = budget
+        self.counts = {}
+
+    def path(self, gid):
+        return self.directory / f'{self.name}.{gid}.bin'
+
+    @staticmethod
+    def _members(group):
+        return [int(g) for g in np.atleast_1d(group)]
+
+    def restore(self, counts):
+        """
+        Reopen a spill whose per-group counts were recorded earlier.
+
+        Files are truncated to the recorded counts, discarding values appended
+        after the record was taken (e.g. by a run that did not finish).
+        """
+        self.counts = {int(gid): int(n) for gid, n in counts.items()}
+        for path in self.directory.glob(f'{self.name}.*.bin'):
+            gid = int(path.name.split('.')[-2])
+            size = self.counts.get(gid, 0) * 8
+            if size == 0:
+                path.unlink()
+            elif path.stat().st_size != size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+    def append(self, codes, values):
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        codes, values = codes[valid], values[valid]
+        if not len(codes):
+            return
+        order = np.argsort(codes, kind='stable')
+        codes, keys = codes[order], _float_to_key(values[order])
+        groups, starts = np.unique(codes, return_index=True)
+        ends = np.append(starts[1:], len(codes))
+        for gid, start, end in zip(groups.tolist(), starts, ends):
+            with open(self.path(gid), 'ab') as f:
+                keys[start:end].tofile(f)
+            self.counts[gid] = self.counts.get(gid, 0) + int(end - start)
+
+    def _chunks(self, group):
+        for gid in self._members(group):
+            if not self.counts.get(gid):
+                continue
+            with open(self.path(gid), 'rb') as f:
+                while True:
+                    block = np.fromfile(f, dtype=np.uint64, count=self.read_chunk)
+                    if not len(block):
+                        break
+                    yield block
+
+    @staticmethod
+    def _matching(block, prefix, bits):
+        if bits == 0:
+            return block
+        return block[(block >> np.uint64(64 - bits)) == np.uint64(prefix)]
+
+    def _histograms(self, gid, prefixes):
+        """One pass: next-digit histogram for every open (prefix, bits) bucket."""
+        hist = {key: np.zeros(_RADIX_SIZE, dtype=np.int64) for key in prefixes}
+        for block in self._chunks(gid):
+            for (prefix, bits), counts in hist.items():
+                selected = self._matching(block, prefix, bits)
+                if len(selected):
+                    digits = (selected >> np.uint64(64 - bits - _RADIX_BITS)) & np.uint64(_RADIX_SIZE - 1)
+                    counts += np.bincount(digits.astype(np.int64), minlength=_RADIX_SIZE)
+        return hist
+
+    def _collect(self, gid, targets, found):
+        """One pass: load each target's bucket and select its rank in memory."""
+        buckets = {(prefix, bits): [] for prefix, bits, _ in targets.values()}
+        for block in self._chunks(gid):
+            for (prefix, bits), parts in buckets.items():
+                parts.append(self._matching(block, prefix, bits))
+        for rank, (prefix, bits, below) in targets.items():
+            values = np.concatenate(buckets[(prefix, bits)])
+            k = rank - below
+            found[rank] = np.partition(values, k)[k]
+
+    def select(self, gid, ranks):
+        """Values at the given 0-based ranks (in sorted order) within one group (or pooled groups)."""
+        ranks = sorted(set(int(r) for r in ranks))
+        found = {}
+        if sum(self.counts.get(g, 0) for g in self._members(gid)) <= self.budget:
+            # Small enough to select in memory in a single read
+            keys = np.partition(np.concatenate(list(self._chunks(gid))), ranks)
+            found = {r: keys[r] for r in ranks}
+        # Open ranks: rank -> (known key prefix, bits fixed, values below the prefix)
+        state = {r: (0, 0, 0) for r in ranks if r not in found}
+        while state:
+            hist = self._histograms(gid, {(p, b) for p, b, _ in state.values()})
+            collect = {}
+            for rank, (prefix, bits, below) in list(state.items()):
+                counts = hist[(prefix, bits)]
+                cumulative = np.cumsum(counts)
+                digit = int(np.searchsorted(cumulative, rank - below, side='right'))
+                below += int(cumulative[digit - 1]) if digit else 0
+                prefix = (prefix << _RADIX_BITS) | digit
+                bits += _RADIX_BITS
+                del state[rank]
+                if bits == 64:
+                    # Every value in the bucket is identical
+                    found[rank] = np.uint64(prefix)
+                elif counts[digit] <= self.budget:
+                    collect[rank] = (prefix, bits, below)
+                else:
+                    state[rank] = (prefix, bits, below)
+            if collect:
+                self._collect(gid, collect, found)
+        return {r: float(_key_to_float(np.array([found[r]], dtype=np.uint64))[0]) for r in ranks}
+
+    def quantiles(self, gid, qs):
+        """Linear-interpolated quantiles of one group (pandas/numpy default method)."""
+        n = sum(self.counts.get(g, 0) for g in self._members(gid))
+        return _interpolated(n, qs, lambda ranks: self.select(gid, ranks))
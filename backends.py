@@ -0,0 +1,249 @@
+"""
+Execution backends for the load -> join -> aggregate stages.
+
+A backend turns the two source files into the seven analysis tables and the
+summary payload:
+
+- `pandas` (the default): the eager in-memory pipeline (`pipeline.py`), from
+  the memory-mapped columnar cache or the parsed CSV.
+- `duckdb`: a lazy plan in an embedded DuckDB database. The trade file
+  (`historical_data.csv`, or `historical_data.parquet` when present) is
+  scanned in parallel and never loaded as a whole. Only the columns the tables
+  use are parsed (projection pushdown), and the `start` / `end` window is
+  applied inside the scan (predicate pushdown). The sentiment join is a hash
+  join on the epoch-day, and the groupings are hash aggregates. These spill
+  to `temp_dir` past `memory_limit`, so the data may be much larger than RAM.
+  DuckDB is an optional dependency, imported only by this backend.
+
+Both backends end in `aggregation.build_tables`: DuckDB only supplies the
+grouped moments (count, sum, min, max, sample variance) and the exact
+per-sentiment quantiles. Column layout, rounding and row order are therefore
+shared, and `check_parity` compares the tables of the two.
+"""
+
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregation import (ACCOUNT_MEASURES, DEFAULT_TOP_K, FLOW_MEASURES, QUANTILES, SENTIMENT_MEASURES,
+                         SPREAD_MEASURES, build_tables)
+from aggregators import GroupedStats, GroupTable, Moments
+from data_cache import FEAR_GREED_CSV, HISTORICAL_CSV, clean_fear_greed
+from schema import apply_sentiment_schema
+from sentiment_join import SentimentTable
+from streaming import summary_payload
+from trade_store import window_days
+
+HISTORICAL_PARQUET = 'historical_data.parquet'
+
+# Groupings behind the seven tables: name -> (key columns, measures)
+GROUPINGS = {
+    'sentiment': (['classification'], SENTIMENT_MEASURES),
+    'side': (['classification', 'is_buy'], FLOW_MEASURES),
+    'monthly': (['year_month', 'classification'], FLOW_MEASURES),
+    'accounts': (['classification', 'Account'], ACCOUNT_MEASURES),
+}
+
+NUMERIC_COLUMNS = ['Size USD', 'Closed PnL', 'Fee', 'Size Tokens']
+
+
+def backend_available(name):
+    """Whether backend `name` can run here (its optional dependency is installed)."""
+    return name != 'duckdb' or importlib.util.find_spec('duckdb') is not None
+
+
+class PandasBackend:
+    """The in-memory pipeline: the tables and summary stages of `pipeline.Pipeline`."""
+
+    def __init__(self, base_dir, cache_dir, start=None, end=None, join_mode='exact', lag=0,
+                 top_k=DEFAULT_TOP_K, rank_by='pnl', use_cache=True):
+        from pipeline import Pipeline
+        self.pipeline = Pipeline(base_dir, cache_dir, cache_dir, persist=use_cache, use_cache=use_cache,
+                                 start=start, end=end, join_mode=join_mode, lag=lag, top_k=top_k, rank_by=rank_by)
+
+    def tables(self):
+        return self.pipeline.get('tables')
+
+    def summary(self, sentiment_agg):
+        """The `analysis_summary.json` payload (without the run date)."""
+        return self.pipeline.get('summary')
+
+
+def _quoted(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(text):
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+class DuckDBBackend:
+    """The tables from SQL over the raw trade file; see the module docstring."""
+
+    def __init__(self, base_dir, cache_dir, start=None, end=None, join_mode='exact', lag=0,
+                 top_k=DEFAULT_TOP_K, rank_by='pnl', memory_limit=None, threads=None):
+        import duckdb
+
+        if join_mode != 'exact':
+            raise ValueError("The duckdb backend joins sentiment by trade day only (join_mode='exact')")
+        self.base_dir = Path(base_dir)
+        self.top_k, self.rank_by = top_k, rank_by
+        self.con = duckdb.connect()
+        temp_dir = Path(cache_dir) / 'duckdb'
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        self.con.execute(f"SET temp_directory = {_literal(temp_dir)}")
+        if memory_limit:
+            self.con.execute(f"SET memory_limit = {_literal(memory_limit)}")
+        if threads:
+            self.con.execute(f"SET threads = {int(threads)}")
+
+        fear_greed = apply_sentiment_schema(clean_fear_greed(pd.read_csv(self.base_dir / FEAR_GREED_CSV)))
+        sentiment = SentimentTable(fear_greed)
+        slots = np.flatnonzero(sentiment.codes >= 0)
+        self.con.register('sentiment', pd.DataFrame({
+            'day': sentiment.first_day + slots,
+            'classification': np.asarray(sentiment.categories.astype(str))[sentiment.codes[slots]],
+        }))
+
+        self.columns = self._source_columns()
+        self.has_tokens = 'Size Tokens' in self.columns
+        self.con.execute(f"CREATE VIEW trades AS {self._trades_sql(start, end)}")
+        self.con.execute(f"CREATE VIEW joined AS {self._joined_sql(lag)}")
+
+    # ---------- Load ----------
+
+    def _source(self):
+        parquet = self.base_dir / HISTORICAL_PARQUET
+        if parquet.exists():
+            return f"read_parquet({_literal(parquet)})"
+        return f"read_csv({_literal(self.base_dir / HISTORICAL_CSV)}, header = true, all_varchar = true)"
+
+    def _source_columns(self):
+        """Stripped column name -> the file's own name (as `clean_historical` strips them)."""
+        names = [row[0] for row in self.con.execute(f"DESCRIBE SELECT * FROM {self._source()}").fetchall()]
+        return {name.strip(): name for name in names}
+
+    def _column(self, name, cast='DOUBLE'):
+        if name not in self.columns:
+            return f"CAST(NULL AS {cast})"
+        return f"TRY_CAST({_quoted(self.columns[name])} AS {cast})"
+
+    def _timestamp_sql(self):
+        """`ts` as `clean_historical` parses it: `Timestamp IST` day-first, else `Timestamp` as epoch ns."""
+        if 'Timestamp IST' in self.columns:
+            return f"try_strptime({self._column('Timestamp IST', 'VARCHAR')}, '%d-%m-%Y %H:%M')"
+        if 'Timestamp' in self.columns:
+            return f"make_timestamp(CAST({self._column('Timestamp')} / 1000 AS BIGINT))"
+        return "CAST(NULL AS TIMESTAMP)"
+
+    def _trades_sql(self, start, end):
+        """The cleaned trades within the window; only these columns are read from the file."""
+        first_day, last_day = window_days(start, end)
+        window = [f"day >= {first_day}"] if first_day is not None else []
+        window += [f"day <= {last_day}"] if last_day is not None else []
+        numeric = ',\n'.join(f"{self._column(name)} AS {_quoted(name)}" for name in NUMERIC_COLUMNS)
+        return f"""
+            SELECT * FROM (
+                SELECT *, date_diff('day', DATE '1970-01-01', CAST(ts AS DATE)) AS day FROM (
+                    SELECT {self._column('Account', 'VARCHAR')} AS "Account",
+                           {self._column('Side', 'VARCHAR')} AS "Side",
+                           {self._timestamp_sql()} AS ts,
+                           {numeric}
+                    FROM {self._source()}
+                )
+            )
+            {'WHERE ' + ' AND '.join(window) if window else ''}
+        """
+
+    # ---------- Join and derived metrics ----------
+
+    def _joined_sql(self, lag):
+        """Trades with their day's classification and `metrics.add_derived_metrics`' columns."""
+        return f"""
+            SELECT t.*, s.classification,
+                   CASE WHEN t."Account" IS NOT NULL THEN 1.0 END AS account_seen,
+                   CAST(coalesce(t."Closed PnL" > 0, false) AS DOUBLE) AS win,
+                   CAST(coalesce(t."Closed PnL" < 0, false) AS DOUBLE) AS loss,
+                   coalesce(upper(t."Side") = 'BUY', false) AS is_buy,
+                   abs(t."Closed PnL") AS abs_pnl,
+                   CASE WHEN t."Closed PnL" <> 0 AND abs(t."Size USD") = 0 THEN 'inf'::DOUBLE
+                        WHEN t."Closed PnL" <> 0 THEN abs(t."Closed PnL") / abs(t."Size USD") END
+                       AS risk_reward_ratio,
+                   strftime(t.ts, '%Y-%m') AS year_month
+            FROM trades t LEFT JOIN sentiment s ON t.day - {int(lag)} = s.day
+        """
+
+    # ---------- Aggregate ----------
+
+    def _grouped(self, names, measures):
+        """One hash aggregate: a `GroupTable` of the groups with no missing key."""
+        keys = ', '.join(_quoted(name) for name in names)
+        parts = []
+        for i, measure in enumerate(measures):
+            column = _quoted(measure)
+            parts += [f"count({column}) AS c{i}", f"coalesce(sum({column}), 0) AS t{i}",
+                      f"min({column}) AS lo{i}", f"max({column}) AS hi{i}"]
+            if measure in SPREAD_MEASURES:
+                parts.append(f"var_samp({column}) AS v{i}")
+        frame = self.con.execute(f"""
+            SELECT {keys}, count(*) AS n_rows, {', '.join(parts)}
+            FROM joined WHERE {' AND '.join(f'{_quoted(name)} IS NOT NULL' for name in names)}
+            GROUP BY {keys}
+        """).df()
+
+        moments = {}
+        for i, measure in enumerate(measures):
+            m = Moments(len(frame))
+            m.count = frame[f'c{i}'].to_numpy(dtype=np.int64)
+            m.total = frame[f't{i}'].to_numpy(dtype=np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                m.mean = np.where(m.count > 0, m.total / m.count, 0.0)
+            if measure in SPREAD_MEASURES:
+                variance = frame[f'v{i}'].to_numpy(dtype=np.float64, na_value=np.nan)
+                m.m2 = np.nan_to_num(variance * np.maximum(m.count - 1, 0))
+            m.min = frame[f'lo{i}'].to_numpy(dtype=np.float64, na_value=np.inf)
+            m.max = frame[f'hi{i}'].to_numpy(dtype=np.float64, na_value=-np.inf)
+            moments[measure] = m
+        return GroupTable(frame[names].reset_index(drop=True), frame['n_rows'].to_numpy(dtype=np.int64), moments)
+
+    def _quantiles(self, labels):
+        """Exact linear-interpolated `QUANTILES` per sentiment, aligned with `labels`."""
+        parts = [f"quantile_cont({_quoted(measure)}, [{', '.join(map(str, qs))}]) AS q{i}"
+                 for i, (measure, qs) in enumerate(QUANTILES.items())]
+        frame = self.con.execute(f"""
+            SELECT classification, {', '.join(parts)} FROM joined
+            WHERE classification IS NOT NULL GROUP BY classification
+        """).df().set_index('classification').reindex(labels)
+        quantiles = {}
+        for i, (measure, qs) in enumerate(QUANTILES.items()):
+            values = np.array([row if isinstance(row, (list, np.ndarray)) else [np.nan] * len(qs)
+                               for row in frame[f'q{i}']], dtype=np.float64).reshape(len(labels), len(qs))
+            quantiles[measure] = {q: values[:, j] for j, q in enumerate(qs)}
+        return quantiles
+
+    def tables(self):
+        self.grouped = {name: self._grouped(names, measures) for name, (names, measures) in GROUPINGS.items()}
+        sentiment = self.grouped['sentiment']
+        quantiles = self._quantiles(list(sentiment.keys['classification']))
+        return build_tables(sentiment, self.grouped['side'], self.grouped['monthly'], self.grouped['accounts'],
+                            quantiles, has_tokens=self.has_tokens, top_k=self.top_k, rank_by=self.rank_by)
+
+    def summary(self, sentiment_agg):
+        """The `analysis_summary.json` payload (without the run date)."""
+        total, first_day, last_day = self.con.execute("SELECT count(*), min(day), max(day) FROM trades").fetchone()
+        payload = summary_payload(GroupedStats.from_table(self.grouped['sentiment']), total, first_day, last_day,
+                                  sentiment_agg)
+        return {key: value for key, value in payload.items() if key != 'analysis_date'}
+
+
+BACKENDS = {
+    'pandas': PandasBackend,
+    'duckdb': DuckDBBackend,
+}
+
+
+def open_backend(name, base_dir, cache_dir, **options):
+    """Backend `name` (a `BACKENDS` key) for the dataset in `base_dir`."""
+    return BACKENDS[name](base_dir, cache_dir, **options)
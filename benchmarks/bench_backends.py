@@ -0,0 +1,98 @@
+"""
+Benchmark: the pandas and DuckDB execution backends on the same synthetic trades.
+
+For each size, every backend produces the seven analysis tables from the raw
+files in a fresh process, with its wall time and peak memory:
+  pandas_csv    the in-memory pipeline, parsing the CSV (no columnar cache)
+  pandas_cache  the same from a warm columnar cache (built beforehand, untimed)
+  duckdb        the out-of-core DuckDB backend (skipped when duckdb is missing)
+The tables of every backend are then checked against pandas_csv with
+`check_parity`; any mismatch makes the benchmark exit with status 1.
+
+    python benchmarks/bench_backends.py --rows 1e5 1e6 1e7 --memory-limit 1GB
+"""
+
+import argparse
+import json
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from aggregation import check_parity  # noqa: E402
+from backends import backend_available, open_backend  # noqa: E402
+from profiling import peak_mb, reset_peak  # noqa: E402
+from run_suite import DEFAULT_WORK_DIR, dataset  # noqa: E402
+
+RUNS = {
+    'pandas_csv': ('pandas', {'use_cache': False}),
+    'pandas_cache': ('pandas', {}),
+    'duckdb': ('duckdb', {}),
+}
+
+
+def measure(task):
+    """Child process: one backend's tables, seconds and peak MiB."""
+    name, data_dir, cache_dir, memory_limit = task
+    backend, options = RUNS[name]
+    if backend == 'duckdb':
+        options = dict(options, memory_limit=memory_limit)
+    if name == 'pandas_cache':
+        open_backend(backend, data_dir, cache_dir, **options).pipeline.get('load')
+    reset_peak()
+    t0 = time.perf_counter()
+    tables = open_backend(backend, data_dir, cache_dir, **options).tables()
+    return tables, round(time.perf_counter() - t0, 4), peak_mb()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=lambda s: int(float(s)), nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', type=Path, default=DEFAULT_WORK_DIR,
+                        help='where datasets are kept between runs (shared with run_suite.py)')
+    parser.add_argument('--memory-limit', help='DuckDB memory budget, e.g. 1GB')
+    parser.add_argument('--json', type=Path, help='write the results here')
+    args = parser.parse_args()
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+
+    runs = [name for name, (backend, _) in RUNS.items() if backend_available(backend)]
+    results, failed = [], False
+    context = multiprocessing.get_context('spawn')
+    for rows in args.rows:
+        data_dir = dataset(args.work_dir, rows, args.seed)
+        scratch = Path(tempfile.mkdtemp(prefix=f'backends-{rows}-', dir=args.work_dir))
+        try:
+            reference = None
+            for name in runs:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    tables, seconds, peak = pool.submit(
+                        measure, (name, data_dir, scratch / 'cache', args.memory_limit)).result()
+                reference = tables if reference is None else reference
+                parity = check_parity(reference, tables)
+                mismatches = [table for table, status in parity if status.startswith('MISMATCH')]
+                failed |= bool(mismatches)
+                status = 'MISMATCH ' + ', '.join(mismatches) if mismatches else \
+                    ('identical' if all(s == 'identical' for _, s in parity) else 'close')
+                results.append({'rows': rows, 'backend': name, 'seconds': seconds, 'peak_mb': peak,
+                                'parity': status})
+                print(f"  {rows:>11,}  {name:<13} {seconds:9.3f}s  {peak:9.1f} MiB  {status}")
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    if 'duckdb' not in runs:
+        print("duckdb is not installed; only the pandas backend was measured")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if failed:
+        sys.exit("Backends disagree")
+
+
+if __name__ == '__main__':
+    main()
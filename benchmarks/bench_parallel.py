@@ -0,0 +1,78 @@
+"""
+Benchmark: scaling of `--workers` partitioned execution for analyses 1-7.
+
+Writes a synthetic dataset (`synthetic.py`), builds the columnar cache once,
+then times `parallel.parallel_tables` at each worker count against the
+single-process `fused_tables` on the same cached data. Every parallel result is
+checked against the single-process tables before its time is reported.
+
+    python benchmarks/bench_parallel.py --rows 2000000 --workers 1 2 4 8 16
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from aggregation import check_parity, fused_tables  # noqa: E402
+from data_cache import load_datasets  # noqa: E402
+from metrics import add_derived_metrics  # noqa: E402
+from parallel import parallel_tables  # noqa: E402
+from schema import CATEGORICAL_COLUMNS, apply_sentiment_schema, apply_trade_schema  # noqa: E402
+from sentiment_join import SentimentTable  # noqa: E402
+from synthetic import write_dataset  # noqa: E402
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--partition-by', choices=['month', 'account'], default='month')
+    parser.add_argument('--json', type=Path, help='also write the results here')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir, cache_dir = Path(tmp) / 'data', Path(tmp) / 'cache'
+        write_dataset(base_dir, args.rows)
+        load_datasets(base_dir, cache_dir)
+
+        def single_process():
+            fear_greed, trades = load_datasets(base_dir, cache_dir, categorical=CATEGORICAL_COLUMNS)
+            fear_greed = apply_sentiment_schema(fear_greed)
+            merged = add_derived_metrics(SentimentTable(fear_greed).join(apply_trade_schema(trades)))
+            merged['year_month'] = merged['ts'].dt.to_period('M')
+            return fear_greed, fused_tables(merged)
+
+        (fear_greed, reference), serial = timed(single_process)
+        results = [{'workers': 'in-process', 'seconds': round(serial, 4), 'speedup': 1.0}]
+        for workers in args.workers:
+            tables, seconds = timed(lambda: parallel_tables(cache_dir, fear_greed, workers, by=args.partition_by))
+            failed = [name for name, status in check_parity(reference, tables) if status.startswith('MISMATCH')]
+            if failed:
+                sys.exit(f"{workers} workers: tables differ from the single-process run: {failed}")
+            results.append({'workers': workers, 'seconds': round(seconds, 4),
+                            'speedup': round(serial / seconds, 2)})
+
+    print(f"{args.rows} rows, partitioned by {args.partition_by}, {os.cpu_count()} CPUs")
+    print(pd.DataFrame(results).to_string(index=False))
+    if args.json:
+        args.json.write_text(json.dumps({'rows': args.rows, 'partition_by': args.partition_by,
+                                         'cpus': os.cpu_count(), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
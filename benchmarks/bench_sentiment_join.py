@@ -0,0 +1,135 @@
+"""
+Benchmark: sentiment enrichment by hash merge vs dense array indexing.
+
+Compares, on synthetic trades over the real (or a synthetic) fear & greed
+series:
+  - merge_date   the original `merge(on='date')` on Python date objects
+  - merge_day    the same merge on int32 epoch-day keys
+  - array_exact  `SentimentTable.lookup` (direct indexing)
+  - merge_asof   `pd.merge_asof` on timestamps
+  - array_asof   `SentimentTable.lookup_asof` (binary search)
+Each array path is checked against its merge counterpart before timing.
+
+    python benchmarks/bench_sentiment_join.py --rows 100000 1000000 10000000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_cache import FEAR_GREED_CSV, clean_fear_greed  # noqa: E402
+from schema import apply_sentiment_schema, epoch_days  # noqa: E402
+from sentiment_join import IST_OFFSET, SentimentTable  # noqa: E402
+
+
+def synthetic_fear_greed(start='2018-02-01', end='2025-05-02', seed=0):
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start, end, freq='D')
+    value = np.clip(50 + 45 * np.sin(np.arange(len(days)) / 23.0) + rng.normal(0, 4, len(days)), 1, 99).round()
+    classification = np.select(
+        [value <= 24, value <= 46, value <= 54, value <= 75],
+        ['Extreme Fear', 'Fear', 'Neutral', 'Greed'], 'Extreme Greed')
+    return pd.DataFrame({
+        'timestamp': days.view('int64') // 10**9,
+        'value': value.astype(int),
+        'classification': classification,
+        'date': days.strftime('%Y-%m-%d'),
+    })
+
+
+def synthetic_trades(n, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2023-05-01').value
+    ts = start + rng.integers(0, 730 * 86_400, n) * 10**9
+    return pd.DataFrame({'ts': pd.to_datetime(ts)})
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(rows, fear_greed_raw, repeat):
+    fear_greed = apply_sentiment_schema(clean_fear_greed(fear_greed_raw.copy()))
+    fg_dates = clean_fear_greed(fear_greed_raw.copy())
+    table = SentimentTable(fear_greed)
+
+    trades = synthetic_trades(rows)
+    trades['day'] = epoch_days(trades['ts'])
+    trades['date'] = trades['ts'].dt.date
+
+    readings = fear_greed[['timestamp', 'classification', 'value']].copy()
+    readings['published'] = pd.to_datetime(readings['timestamp'], unit='s') + IST_OFFSET
+    readings = readings.sort_values('published')
+
+    def merge_date():
+        return trades[['date']].merge(fg_dates[['date', 'classification', 'value']], on='date', how='left')
+
+    def merge_day():
+        return trades[['day']].merge(fear_greed[['day', 'classification', 'value']], on='day', how='left')
+
+    def array_exact():
+        return table.lookup(trades['day'])
+
+    sorted_trades = trades[['ts']].sort_values('ts')
+
+    def merge_asof():
+        # merge_asof needs the trades sorted by time; the sort is part of its cost
+        return pd.merge_asof(trades[['ts']].sort_values('ts'), readings[['published', 'classification', 'value']],
+                             left_on='ts', right_on='published', direction='backward')
+
+    def array_asof():
+        return table.lookup_asof(trades['ts'])
+
+    # Correctness first
+    codes, values = array_exact()
+    expected = merge_day()
+    got = pd.Categorical.from_codes(codes, categories=table.categories)
+    assert (pd.Series(got).astype(object).fillna('') == expected['classification'].astype(object).fillna('')).all()
+    codes, _ = array_asof()
+    got = pd.Series(pd.Categorical.from_codes(codes, categories=table.categories), index=trades.index)
+    expected = merge_asof()['classification'].astype(object).fillna('').to_numpy()
+    assert (got.loc[sorted_trades.index].astype(object).fillna('').to_numpy() == expected).all()
+
+    result = {'rows': rows}
+    for name, fn in [('merge_date', merge_date), ('merge_day', merge_day), ('array_exact', array_exact),
+                     ('merge_asof', merge_asof), ('array_asof', array_asof)]:
+        result[name] = best_of(fn, repeat)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--fear-greed', type=Path, default=None,
+                        help=f'path to {FEAR_GREED_CSV} (default: synthetic series)')
+    parser.add_argument('--json', type=Path, default=None, help='also write results as JSON')
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.fear_greed) if args.fear_greed else synthetic_fear_greed()
+    results = [run(rows, raw, args.repeat) for rows in args.rows]
+
+    frame = pd.DataFrame(results).set_index('rows')
+    print("Seconds (best of %d):" % args.repeat)
+    print(frame.round(4))
+    print("\nSpeed-up vs merge_date:")
+    print((frame[['merge_date']].values / frame).round(1))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: top-K accounts per sentiment, per-group `nlargest` vs one sort.
+
+Builds a synthetic `account_performance` frame (one row per sentiment and
+account, as analysis 7 does; with `--months`, per sentiment, month and
+account) and times
+  - apply_nlargest  `groupby(keys).apply(lambda x: x.nlargest(k, metric))`
+  - top_k_rows      `aggregation.top_k_rows` (sampled threshold + one lexsort, no per-group calls)
+after checking that both return the same rows in the same order.
+
+    python benchmarks/bench_top_k.py --accounts 10000 1000000 5000000
+    python benchmarks/bench_top_k.py --accounts 1000000 --months 24
+"""
+
+import argparse
+import json
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aggregation import RANK_METRICS, top_k_rows  # noqa: E402
+
+SENTIMENTS = ['Extreme Fear', 'Extreme Greed', 'Fear', 'Greed', 'Neutral']
+
+
+def synthetic_account_performance(accounts, months=0, seed=0):
+    """About half of the accounts trade under each sentiment (in one of `months` months)."""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for sentiment in SENTIMENTS:
+        ids = np.flatnonzero(rng.random(accounts) < 0.5)
+        trades = rng.zipf(1.7, len(ids))
+        parts.append(pd.DataFrame({
+            'classification': sentiment,
+            'Account': np.char.add('0x', ids.astype('U40')),
+            'total_pnl': rng.normal(0, 500, len(ids)).round(2),
+            'trade_count': trades,
+            'total_volume': (trades * rng.lognormal(6, 1.5, len(ids))).round(2),
+            'win_rate': (rng.binomial(trades, 0.45) / trades).round(2),
+        }))
+        if months:
+            parts[-1].insert(1, 'year_month', pd.period_range('2023-05', periods=months, freq='M')[
+                rng.integers(0, months, len(ids))])
+    return pd.concat(parts, ignore_index=True)
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--accounts', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--months', type=int, default=0, help='also group by this many months')
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--rank-by', choices=list(RANK_METRICS), default='pnl')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', type=Path, help='also write the results here')
+    args = parser.parse_args()
+    metric = RANK_METRICS[args.rank_by]
+    keys = ['classification', 'year_month'] if args.months else ['classification']
+
+    results = []
+    for accounts in args.accounts:
+        frame = synthetic_account_performance(accounts, args.months)
+
+        def apply_nlargest():
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                return frame.groupby(keys).apply(
+                    lambda x: x.nlargest(args.k, metric)).reset_index(drop=True)
+
+        expected, slow = best_of(apply_nlargest, args.repeat)
+        actual, fast = best_of(lambda: top_k_rows(frame, keys, metric, args.k), args.repeat)
+        if expected.to_csv(index=False) != actual.to_csv(index=False):
+            sys.exit(f"{accounts} accounts: top_k_rows differs from groupby/nlargest")
+        results.append({'accounts': accounts, 'rows': len(frame), 'apply_nlargest': round(slow, 4),
+                        'top_k_rows': round(fast, 4), 'speedup': round(slow / fast, 1)})
+
+    print(f"Top {args.k} by {metric} per {' x '.join(keys)}, seconds (best of {args.repeat})")
+    print(pd.DataFrame(results).to_string(index=False))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Scaling benchmark suite: wall time and peak memory of every pipeline stage.
+
+For each dataset size a seeded synthetic dataset (`synthetic.py`) is written
+once into the work directory and reused by later runs. Each size is then
+measured in a fresh process, stage by stage:
+
+  cache_build, cache_load, schema, join, metrics, fused_tables, cube_build,
+  cube_tables, top_k_coin,
+  parallel_tables, charts          in memory, up to --max-in-memory-rows
+  streaming, incremental_build,
+  incremental_noop                 bounded memory, every size
+  analysis_script, report_script   `comprehensive_analysis.py` and
+                                   `generate_report.py` as subprocesses
+                                   (with --end-to-end)
+
+Peak memory is the process high-water mark (VmHWM) over the stage, reset
+before each stage through /proc/self/clear_refs; where that is unavailable it
+falls back to ru_maxrss, which only ever grows. Results are written as JSON
+and can be compared with an earlier run: a stage that got slower or bigger by
+more than --tolerance is reported and the suite exits with status 1.
+
+    python benchmarks/run_suite.py --rows 1e5 1e6 1e7 1e8 --json bench.json
+    python benchmarks/run_suite.py --rows 1e5 1e6 --baseline bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from profiling import peak_mb, reset_peak  # noqa: E402
+from synthetic import write_dataset  # noqa: E402
+
+DEFAULT_WORK_DIR = REPO / '.cache' / 'bench'
+MAX_IN_MEMORY_ROWS = 20_000_000
+
+
+# ---------- Measurement ----------
+
+# Runs `script` as __main__ and writes its VmHWM (kB) to `peak_file` on exit
+_CHILD = """
+import runpy, sys
+peak_file, sys.argv = sys.argv[1], sys.argv[2:]
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+finally:
+    try:
+        with open('/proc/self/status') as status, open(peak_file, 'w') as f:
+            f.write(next(line.split()[1] for line in status if line.startswith('VmHWM:')))
+    except (OSError, StopIteration):
+        pass
+"""
+
+
+class Recorder:
+    """Runs stages, keeping their results and `{stage, seconds, peak_mb}` records."""
+
+    def __init__(self, rows, verbose=False):
+        self.rows = rows
+        self.verbose = verbose
+        self.records = []
+
+    def stage(self, name, fn):
+        reset_peak()
+        out = io.StringIO()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if self.verbose else out):
+            result = fn()
+        seconds = time.perf_counter() - t0
+        self.records.append({'rows': self.rows, 'stage': name, 'seconds': round(seconds, 4), 'peak_mb': peak_mb()})
+        print(f"  {self.rows:>11,}  {name:<18} {seconds:9.3f}s  {self.records[-1]['peak_mb']:9.1f} MiB",
+              file=sys.stderr)
+        return result
+
+    def command(self, name, script, args):
+        """
+        Time a repository script in a child interpreter.
+
+        The child reports its own VmHWM on exit: after exec that covers only
+        the script, while ru_maxrss also counts this (forking) process. The
+        child's ru_maxrss is the fallback where VmHWM is unavailable. Its
+        stderr goes to a file, which (unlike a pipe) never fills up and
+        blocks the child while this process waits for it.
+        """
+        with tempfile.NamedTemporaryFile('r', suffix='.peak') as peak_file, tempfile.TemporaryFile() as stderr:
+            t0 = time.perf_counter()
+            proc = subprocess.Popen([sys.executable, '-c', _CHILD, peak_file.name, script, *args], cwd=REPO,
+                                    stdout=subprocess.DEVNULL, stderr=stderr)
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            seconds = time.perf_counter() - t0
+            if proc.returncode:
+                stderr.seek(0)
+                raise RuntimeError(f"{name} exited with {proc.returncode}: "
+                                   f"{stderr.read().decode(errors='replace')[-2000:]}")
+            reported = peak_file.read().strip()
+        kb = int(reported) if reported else usage.ru_maxrss // (1024 if sys.platform == 'darwin' else 1)
+        mb = round(kb / 1024, 1)
+        self.records.append({'rows': self.rows, 'stage': name, 'seconds': round(seconds, 4), 'peak_mb': mb})
+        print(f"  {self.rows:>11,}  {name:<18} {seconds:9.3f}s  {self.records[-1]['peak_mb']:9.1f} MiB",
+              file=sys.stderr)
+
+
+# ---------- Stages ----------
+
+def in_memory_stages(rec, data_dir, scratch, workers, dpi):
+    from aggregation import account_rankings, fused_tables
+    from charts import chart_jobs, render_charts
+    from cube import Cube
+    from data_cache import build_cache, load_datasets
+    from metrics import add_derived_metrics
+    from parallel import parallel_tables
+    from schema import CATEGORICAL_COLUMNS, apply_sentiment_schema, apply_trade_schema
+    from sentiment_join import SentimentTable
+
+    cache_dir = scratch / 'cache'
+    rec.stage('cache_build', lambda: build_cache(data_dir, cache_dir))
+    fear_greed, trades = rec.stage(
+        'cache_load', lambda: load_datasets(data_dir, cache_dir, categorical=CATEGORICAL_COLUMNS))
+    fear_greed, trades = rec.stage(
+        'schema', lambda: (apply_sentiment_schema(fear_greed), apply_trade_schema(trades)))
+    merged = rec.stage('join', lambda: SentimentTable(fear_greed).join(trades))
+    del trades
+
+    def metrics():
+        frame = add_derived_metrics(merged)
+        frame['year_month'] = frame['ts'].dt.to_period('M')
+        return frame
+
+    merged = rec.stage('metrics', metrics)
+    rec.stage('fused_tables', lambda: fused_tables(merged))
+    cube = rec.stage('cube_build', lambda: Cube.build(merged))
+    tables = rec.stage('cube_tables', lambda: cube.tables())
+    rec.stage('top_k_coin', lambda: account_rankings(merged, 'coin'))
+    if workers > 1:
+        rec.stage('parallel_tables', lambda: parallel_tables(cache_dir, fear_greed, workers, run_root=scratch))
+    charts_dir = scratch / 'charts'
+    charts_dir.mkdir()
+    jobs = chart_jobs(tables['sentiment_aggregated_metrics'], tables['risk_analysis_by_sentiment'], cube)
+    rec.stage('charts', lambda: render_charts(jobs, charts_dir, dpi=dpi, force=True))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def out_of_core_stages(rec, data_dir, scratch):
+    from incremental import run_incremental
+    from streaming import run_streaming
+
+    out = scratch / 'out-of-core'
+    out.mkdir()
+    rec.stage('streaming', lambda: run_streaming(data_dir, out, out, spill_root=scratch))
+    state_dir = scratch / 'incremental'
+    rec.stage('incremental_build', lambda: run_incremental(data_dir, out, out, state_dir, reset=True))
+    rec.stage('incremental_noop', lambda: run_incremental(data_dir, out, out, state_dir))
+
+
+def end_to_end_stages(rec, data_dir, scratch, dpi):
+    csv_dir, output_dir = scratch / 'e2e' / 'csv_files', scratch / 'e2e' / 'outputs'
+    rec.command('analysis_script', 'comprehensive_analysis.py', [
+        '--data-dir', str(data_dir), '--output-dir', str(output_dir), '--csv-dir', str(csv_dir),
+        '--cache-dir', str(scratch / 'e2e' / 'cache'), '--dpi', str(dpi)])
+    rec.command('report_script', 'generate_report.py', [
+        '--output-dir', str(output_dir), '--csv-dir', str(csv_dir), '--report', str(scratch / 'e2e' / 'report.pdf')])
+
+
+def measure_size(task):
+    """Child process: all stages for one dataset size."""
+    rows, data_dir, options = task
+    rec = Recorder(rows, options['verbose'])
+    scratch = Path(tempfile.mkdtemp(prefix=f'suite-{rows}-', dir=options['work_dir']))
+    try:
+        if rows <= options['max_in_memory_rows']:
+            in_memory_stages(rec, data_dir, scratch, options['workers'], options['dpi'])
+        out_of_core_stages(rec, data_dir, scratch)
+        if options['end_to_end'] and rows <= options['max_in_memory_rows']:
+            end_to_end_stages(rec, data_dir, scratch, options['dpi'])
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return rec.records
+
+
+def dataset(work_dir, rows, seed):
+    """Directory of the synthetic dataset for `rows`, written on first use."""
+    directory = Path(work_dir) / f'data-{rows}-seed{seed}'
+    if not (directory / '.complete').exists():
+        print(f"Writing {rows:,} synthetic trades to {directory}...", file=sys.stderr)
+        write_dataset(directory, rows, seed)
+        (directory / '.complete').touch()
+    return directory
+
+
+# ---------- Reporting ----------
+
+def run_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    import matplotlib
+    import numpy
+    import pandas
+    return {
+        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pandas.__version__,
+        'numpy': numpy.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'peak_reset': reset_peak(),
+    }
+
+
+def compare(results, baseline, tolerance, min_seconds, min_mb):
+    """Rows of (rows, stage, metric, before, after, ratio) that regressed past `tolerance`."""
+    before = {(r['rows'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    for record in results:
+        old = before.get((record['rows'], record['stage']))
+        if old is None:
+            continue
+        for metric, floor in (('seconds', min_seconds), ('peak_mb', min_mb)):
+            if record[metric] > old[metric] * (1 + tolerance) and record[metric] - old[metric] > floor:
+                regressions.append((record['rows'], record['stage'], metric, old[metric], record[metric],
+                                    round(record[metric] / old[metric], 2)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=lambda s: int(float(s)), nargs='+', default=[100_000, 1_000_000],
+                        help='dataset sizes, e.g. 1e5 1e6 1e7 1e8')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', type=Path, default=DEFAULT_WORK_DIR,
+                        help='where datasets are kept between runs and stages scratch')
+    parser.add_argument('--max-in-memory-rows', type=lambda s: int(float(s)), default=MAX_IN_MEMORY_ROWS,
+                        help='larger sizes run only the bounded-memory stages')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='processes for the parallel_tables stage (skipped at 1)')
+    parser.add_argument('--dpi', type=int, default=72, help='chart resolution in the charts stages')
+    parser.add_argument('--end-to-end', action='store_true', help='also time the two scripts as subprocesses')
+    parser.add_argument('--json', type=Path, help='write the results here')
+    parser.add_argument('--baseline', type=Path, help='compare with the JSON of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown / memory growth against the baseline')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='ignore time regressions smaller than this')
+    parser.add_argument('--min-mb', type=float, default=16.0,
+                        help='ignore memory regressions smaller than this')
+    parser.add_argument('--verbose', action='store_true', help="show the stages' own output")
+    args = parser.parse_args()
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+
+    options = {'work_dir': str(args.work_dir), 'max_in_memory_rows': args.max_in_memory_rows,
+               'workers': args.workers, 'dpi': args.dpi, 'end_to_end': args.end_to_end, 'verbose': args.verbose}
+    results = []
+    # A fresh interpreter per size keeps one size's heap out of the next one's peaks
+    context = multiprocessing.get_context('spawn')
+    for rows in args.rows:
+        data_dir = dataset(args.work_dir, rows, args.seed)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results.extend(pool.submit(measure_size, (rows, data_dir, options)).result())
+
+    report = {'meta': run_metadata(), 'results': results}
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.json}", file=sys.stderr)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds, args.min_mb)
+        print(f"\nAgainst {args.baseline} (commit {baseline['meta'].get('commit')}), tolerance {args.tolerance:.0%}:")
+        if regressions:
+            for rows, stage, metric, old, new, ratio in regressions:
+                print(f"  REGRESSION {rows:>11,}  {stage:<18} {metric:<8} {old} -> {new} ({ratio}x)")
+            sys.exit(1)
+        print("  no regressions")
+
+
+if __name__ == '__main__':
+    main()
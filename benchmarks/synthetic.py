@@ -0,0 +1,194 @@
+"""
+Seeded generator for Hyperliquid-shaped trade data and a matching fear & greed series.
+
+The trades have the columns of `historical_data.csv` and a realistic shape:
+account activity and coin popularity follow Zipf-like power laws, prices
+follow a per-coin random walk, roughly half of the fills close a position
+(and carry a non-zero `Closed PnL`) and fees scale with notional. Rows are
+written in time order, in chunks, so datasets far larger than memory (10^8
+rows) can be produced; the output depends only on `rows`, `seed` and
+`chunk_rows`.
+
+    python benchmarks/synthetic.py --rows 1000000 --out /tmp/trades-1e6
+"""
+
+import argparse
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+START = pd.Timestamp('2023-05-01')
+DAYS = 730
+CHUNK_ROWS = 1_000_000
+
+MAJOR_COINS = ['BTC', 'ETH', 'SOL', 'HYPE', 'XRP', 'DOGE', 'SUI', 'AVAX', 'LINK', 'ENA']
+
+COLUMNS = ['Account', 'Coin', 'Execution Price', 'Size Tokens', 'Size USD', 'Side',
+           'Timestamp IST', 'Start Position', 'Direction', 'Closed PnL', 'Transaction Hash',
+           'Order ID', 'Crossed', 'Fee', 'Trade ID', 'Timestamp']
+
+
+def default_accounts(rows):
+    """Distinct accounts for a dataset size (the public sample has 32 for ~211k rows)."""
+    return int(max(32, rows // 5_000))
+
+
+def zipf_weights(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_fear_greed(start=START - pd.Timedelta(days=365), days=DAYS + 730, seed=0, gaps=2):
+    """Daily fear & greed readings covering the trade period, with a few missing days."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days, freq='D')
+    value = np.clip(50 + 45 * np.sin(np.arange(days) / 23.0) + rng.normal(0, 4, days), 1, 99).round()
+    classification = np.select(
+        [value <= 24, value <= 46, value <= 54, value <= 75],
+        ['Extreme Fear', 'Fear', 'Neutral', 'Greed'], 'Extreme Greed')
+    fear_greed = pd.DataFrame({
+        'timestamp': dates.view('int64') // 10**9,
+        'value': value.astype(int),
+        'classification': classification,
+        'date': dates.strftime('%Y-%m-%d'),
+    })
+    if gaps:
+        fear_greed = fear_greed.drop(index=rng.choice(days, gaps, replace=False))
+    return fear_greed.reset_index(drop=True)
+
+
+def ist_minutes(ts):
+    """`dd-mm-YYYY HH:MM` IST strings for sorted unix seconds, formatting each minute once."""
+    minutes, inverse = np.unique((ts + 19_800) // 60, return_inverse=True)
+    return pd.to_datetime(minutes * 60, unit='s').strftime('%d-%m-%Y %H:%M').to_numpy()[inverse]
+
+
+class TradeGenerator:
+    """Deterministic chunks of synthetic fills for `rows` trades over `days` days."""
+
+    def __init__(self, rows, seed=0, accounts=None, coins=250, start=START, days=DAYS):
+        self.rows = rows
+        self.seed = seed
+        self.start = start.value // 10**9
+        self.span = days * 86_400
+        rng = np.random.default_rng(seed)
+        accounts = accounts or default_accounts(rows)
+        self.accounts = np.array([f'0x{i:040x}' for i in rng.permutation(accounts) + 1])
+        self.account_weights = zipf_weights(accounts, 1.1)
+        self.coins = np.array(MAJOR_COINS[:coins] + [f'@{i}' for i in range(max(coins - len(MAJOR_COINS), 0))])
+        self.coin_weights = zipf_weights(len(self.coins), 1.3)
+        self.base_price = rng.lognormal(1, 3, len(self.coins))
+
+    def chunk(self, index, chunk_rows=CHUNK_ROWS):
+        """Rows `[index * chunk_rows, ...)` as a frame in the CSV layout (None past the end)."""
+        first = index * chunk_rows
+        n = min(chunk_rows, self.rows - first)
+        if n <= 0:
+            return None
+        rng = np.random.default_rng([self.seed, index])
+
+        # Time-ordered: each chunk fills its own slice of the period
+        lo = self.start + self.span * first // self.rows
+        hi = self.start + self.span * (first + n) // self.rows
+        ts = np.sort(rng.integers(lo, max(hi, lo + 1), n))
+
+        coin = rng.choice(len(self.coins), n, p=self.coin_weights)
+        drift = np.exp(0.8 * np.sin((ts - self.start) / 8e6 + coin))
+        price = (self.base_price[coin] * drift * rng.lognormal(0, 0.01, n)).round(6)
+        size = rng.lognormal(2, 2, n) / np.sqrt(price)
+        size_usd = (price * size).round(2)
+        side = np.where(rng.random(n) < 0.5, 'BUY', 'SELL')
+        closing = rng.random(n) < 0.5
+        direction = np.where(closing, np.where(side == 'BUY', 'Close Short', 'Close Long'),
+                             np.where(side == 'BUY', 'Open Long', 'Open Short'))
+        pnl = np.where(closing, rng.standard_t(3, n) * 0.02 * size_usd + 0.001 * size_usd, 0.0).round(6)
+
+        return pd.DataFrame({
+            'Account': self.accounts[rng.choice(len(self.accounts), n, p=self.account_weights)],
+            'Coin': self.coins[coin],
+            'Execution Price': price,
+            'Size Tokens': size.round(4),
+            'Size USD': size_usd,
+            'Side': side,
+            'Timestamp IST': ist_minutes(ts),
+            'Start Position': rng.normal(0, 1000, n).round(3),
+            'Direction': direction,
+            'Closed PnL': pnl,
+            'Transaction Hash': np.char.add('0x', np.char.zfill(
+                np.char.mod('%x', rng.integers(0, 2**62, n, dtype=np.int64)), 64)),
+            'Order ID': rng.integers(10**9, 10**11, n),
+            'Crossed': rng.random(n) < 0.6,
+            'Fee': (size_usd * rng.uniform(0.0001, 0.00045, n)).round(6),
+            'Trade ID': rng.integers(10**14, 10**15, n).astype(float),
+            'Timestamp': (ts * 1000).astype(float),
+        }, columns=COLUMNS)
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        index = 0
+        while (frame := self.chunk(index, chunk_rows)) is not None:
+            yield frame
+            index += 1
+
+
+def generate_trades(rows, seed=0, **kwargs):
+    """All `rows` trades as one frame (for sizes that fit in memory)."""
+    return pd.concat(TradeGenerator(rows, seed, **kwargs).chunks(), ignore_index=True)
+
+
+def _write_chunk(task):
+    generator, index, chunk_rows, path = task
+    generator.chunk(index, chunk_rows).to_csv(path, header=index == 0, index=False)
+    return path
+
+
+def write_dataset(directory, rows, seed=0, chunk_rows=CHUNK_ROWS, workers=None, **kwargs):
+    """
+    Write `fear_greed_index.csv` and `historical_data.csv` for `rows` trades into `directory`.
+
+    Chunks are formatted in `workers` processes (default: one per CPU) and
+    concatenated in order, so the file is the same for any worker count.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    generate_fear_greed(seed=seed).to_csv(directory / 'fear_greed_index.csv', index=False)
+
+    generator = TradeGenerator(rows, seed, **kwargs)
+    parts = directory / 'parts.tmp'
+    parts.mkdir(exist_ok=True)
+    tasks = [(generator, i, chunk_rows, parts / f'{i:06d}.csv') for i in range(-(-rows // chunk_rows))]
+    try:
+        with open(directory / 'historical_data.csv', 'wb') as out:
+            if (workers or os.cpu_count() or 1) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    paths = pool.map(_write_chunk, tasks)
+                    for path in paths:
+                        with open(path, 'rb') as part:
+                            shutil.copyfileobj(part, out)
+                        path.unlink()
+            else:
+                for task in tasks:
+                    with open(_write_chunk(task), 'rb') as part:
+                        shutil.copyfileobj(part, out)
+    finally:
+        shutil.rmtree(parts, ignore_errors=True)
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic trade / fear & greed dataset')
+    parser.add_argument('--rows', type=int, required=True)
+    parser.add_argument('--out', type=Path, required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--accounts', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None, help='processes formatting chunks (default: CPUs)')
+    args = parser.parse_args()
+    write_dataset(args.out, args.rows, args.seed, workers=args.workers, accounts=args.accounts)
+    print(f"Wrote {args.rows} trades to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""
+Chart rendering as independent, cached jobs.
+
+Each of the nine charts is a render function plus the small frame it draws
+(aggregates, not the trades: the PnL histogram is binned up front). Jobs run on
+the headless Agg backend, in a process pool when there are several to draw, and
+a job is skipped when the hash of its input, its render code and the DPI
+matches the one recorded for the last render of that file. matplotlib and
+seaborn are imported on the first render, so building jobs stays light.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_DPI = 300
+PREVIEW_DPI = 72
+MANIFEST_NAME = '.chart_hashes.json'
+
+SENTIMENT_ORDER = ['Extreme Fear', 'Fear', 'Neutral', 'Greed', 'Extreme Greed']
+
+# Charts whose input comes from the aggregate cube rather than the analysis tables
+CUBE_CHARTS = ('6_pnl_distribution.png', '7_volume_timeseries.png', '9_buy_vs_sell_pnl.png')
+
+plt = sns = None
+
+
+def _load_pyplot():
+    global plt, sns
+    if plt is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot
+        import seaborn
+        plt, sns = matplotlib.pyplot, seaborn
+
+
+def _style():
+    _load_pyplot()
+    sns.set_style('whitegrid')
+    plt.rcParams['figure.figsize'] = (12, 6)
+
+
+# ---------- Render functions: (data, path, dpi) ----------
+
+def trades_per_sentiment(sentiment_agg, path, dpi):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=sentiment_agg, x='classification', y='total_trades', palette='viridis')
+    plt.title('Total Trades by Market Sentiment', fontsize=14, fontweight='bold')
+    plt.xlabel('Market Sentiment', fontsize=12)
+    plt.ylabel('Number of Trades', fontsize=12)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def avg_pnl_per_sentiment(sentiment_agg, path, dpi):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=sentiment_agg, x='classification', y='avg_pnl', palette='coolwarm')
+    plt.title('Average Closed PnL by Market Sentiment', fontsize=14, fontweight='bold')
+    plt.xlabel('Market Sentiment', fontsize=12)
+    plt.ylabel('Average PnL (USD)', fontsize=12)
+    plt.xticks(rotation=45)
+    plt.axhline(y=0, color='black', linestyle='--', linewidth=0.8)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def win_rate_per_sentiment(sentiment_agg, path, dpi):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=sentiment_agg, x='classification', y='win_rate', palette='RdYlGn')
+    plt.title('Win Rate by Market Sentiment', fontsize=14, fontweight='bold')
+    plt.xlabel('Market Sentiment', fontsize=12)
+    plt.ylabel('Win Rate', fontsize=12)
+    plt.xticks(rotation=45)
+    plt.ylim(0, 1)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def total_volume_per_sentiment(sentiment_agg, path, dpi):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=sentiment_agg, x='classification', y='total_volume_usd', palette='plasma')
+    plt.title('Total Trading Volume by Market Sentiment', fontsize=14, fontweight='bold')
+    plt.xlabel('Market Sentiment', fontsize=12)
+    plt.ylabel('Total Volume (USD)', fontsize=12)
+    plt.yscale('log')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def risk_metrics_per_sentiment(risk_analysis, path, dpi):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=risk_analysis, x='classification', y='avg_abs_pnl', palette='magma')
+    plt.title('Average Absolute PnL (Risk Proxy) by Market Sentiment', fontsize=14, fontweight='bold')
+    plt.xlabel('Market Sentiment', fontsize=12)
+    plt.ylabel('Average Absolute PnL (USD)', fontsize=12)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def pnl_distribution(histograms, path, dpi):
+    # Bars from precomputed counts; identical to plt.hist on the raw values
+    plt.figure(figsize=(12, 6))
+    for sent in SENTIMENT_ORDER:
+        bins = histograms[histograms['classification'] == sent]
+        if len(bins):
+            edges = np.append(bins['left'].to_numpy(), bins['right'].iloc[-1])
+            plt.hist(bins['left'], alpha=0.6, label=sent, bins=edges, weights=bins['count'])
+    plt.title('PnL Distribution by Market Sentiment', fontsize=14, fontweight='bold')
+    plt.xlabel('Closed PnL (USD)', fontsize=12)
+    plt.ylabel('Frequency', fontsize=12)
+    plt.legend()
+    plt.xlim(-1000, 1000)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def volume_timeseries(monthly_volume, path, dpi):
+    plt.figure(figsize=(14, 6))
+    for sent in SENTIMENT_ORDER:
+        if sent in monthly_volume['classification'].values:
+            data = monthly_volume[monthly_volume['classification'] == sent]
+            plt.plot(data['year_month_str'], data['Size USD'], marker='o', label=sent, linewidth=2)
+    plt.title('Monthly Trading Volume by Market Sentiment Over Time', fontsize=14, fontweight='bold')
+    plt.xlabel('Month', fontsize=12)
+    plt.ylabel('Trading Volume (USD)', fontsize=12)
+    plt.legend()
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def correlation_heatmap(correlation_data, path, dpi):
+    corr_matrix = correlation_data.T.corr()
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(corr_matrix, annot=True, fmt='.2f', cmap='coolwarm', center=0, square=True)
+    plt.title('Correlation Matrix: Trading Metrics by Sentiment', fontsize=14, fontweight='bold')
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def buy_vs_sell_pnl(buy_sell_pnl, path, dpi):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=buy_sell_pnl, x='classification', y='Closed PnL', hue='side', palette='Set2')
+    plt.title('Average PnL: Buy vs Sell by Market Sentiment', fontsize=14, fontweight='bold')
+    plt.xlabel('Market Sentiment', fontsize=12)
+    plt.ylabel('Average PnL (USD)', fontsize=12)
+    plt.xticks(rotation=45)
+    plt.legend(title='Side')
+    plt.axhline(y=0, color='black', linestyle='--', linewidth=0.8)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+# ---------- Job inputs ----------
+
+def pnl_histograms(merged, bins=50):
+    """Per-sentiment `Closed PnL` histogram (the bins `plt.hist(..., bins=50)` would use)."""
+    classification = merged['classification']
+    codes = classification.cat.codes.to_numpy() if isinstance(classification.dtype, pd.CategoricalDtype) else None
+    pnl = merged['Closed PnL'].to_numpy(dtype=np.float64, na_value=np.nan)
+    parts = []
+    for sent in SENTIMENT_ORDER:
+        if codes is not None:
+            if sent not in classification.cat.categories:
+                continue
+            selected = codes == classification.cat.categories.get_loc(sent)
+        else:
+            selected = (classification == sent).to_numpy()
+        if not selected.any():
+            continue
+        data = pnl[selected]
+        parts.append((sent, *np.histogram(data[~np.isnan(data)], bins=bins)))
+    return histogram_frame(parts)
+
+
+def histogram_frame(parts):
+    """The `pnl_histograms` frame from `(sentiment, counts, edges)` in `SENTIMENT_ORDER`."""
+    if not parts:
+        return pd.DataFrame(columns=['classification', 'left', 'right', 'count'])
+    return pd.concat([pd.DataFrame({'classification': sent, 'left': edges[:-1], 'right': edges[1:], 'count': counts})
+                      for sent, counts, edges in parts], ignore_index=True)
+
+
+def chart_jobs(sentiment_agg, risk_analysis, cube, names=None):
+    """
+    `{file name: (render function, input frame)}` for the nine charts.
+
+    Inputs beyond the analysis tables are rolled up from `cube` (a
+    `cube.Cube`). With `names`, only those jobs are built; `cube` may then be
+    None unless one of them is in `CUBE_CHARTS`.
+    """
+    def wanted(name):
+        return names is None or name in names
+
+    jobs = {}
+    for name, render in [('1_trades_per_sentiment.png', trades_per_sentiment),
+                         ('2_avg_pnl_per_sentiment.png', avg_pnl_per_sentiment),
+                         ('3_win_rate_per_sentiment.png', win_rate_per_sentiment),
+                         ('4_total_volume_per_sentiment.png', total_volume_per_sentiment)]:
+        if wanted(name):
+            jobs[name] = (render, sentiment_agg)
+    if wanted('5_risk_metrics_per_sentiment.png'):
+        jobs['5_risk_metrics_per_sentiment.png'] = (risk_metrics_per_sentiment, risk_analysis)
+    if wanted('6_pnl_distribution.png'):
+        jobs['6_pnl_distribution.png'] = (pnl_distribution, cube.histograms)
+
+    if wanted('7_volume_timeseries.png'):
+        monthly_volume = cube.frame(['year_month', 'classification'], {'Size USD': ('Size USD', 'sum')})
+        monthly_volume['year_month_str'] = monthly_volume['year_month'].astype(str)
+        jobs['7_volume_timeseries.png'] = (volume_timeseries, monthly_volume.drop(columns='year_month'))
+
+    if wanted('8_correlation_heatmap.png'):
+        correlation_data = sentiment_agg[['total_trades', 'total_volume_usd', 'avg_pnl', 'win_rate', 'avg_abs_pnl']]
+        correlation_data.index = sentiment_agg['classification']
+        jobs['8_correlation_heatmap.png'] = (correlation_heatmap, correlation_data)
+
+    if wanted('9_buy_vs_sell_pnl.png'):
+        buy_sell_pnl = cube.frame(['classification', 'is_buy'], {'Closed PnL': ('Closed PnL', 'avg')})
+        buy_sell_pnl['side'] = buy_sell_pnl['is_buy'].map({True: 'BUY', False: 'SELL'})
+        jobs['9_buy_vs_sell_pnl.png'] = (buy_vs_sell_pnl, buy_sell_pnl)
+    return jobs
+
+
+# ---------- Rendering ----------
+
+def job_digest(render, data, dpi):
+    """Hash of a job's input frame, its render code and the DPI."""
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(render).encode())
+    digest.update(f'{dpi}|{list(data.columns)}|{list(data.dtypes.astype(str))}|{data.index.name}'.encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _render(task):
+    render, data, path, dpi = task
+    _style()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        render(data, path, dpi)
+    return path
+
+
+def render_charts(jobs, output_dir, dpi=DEFAULT_DPI, workers=None, force=False):
+    """
+    Render the jobs whose inputs changed since the last render.
+
+    Returns `{file name: 'rendered' | 'unchanged'}`. `workers` defaults to one
+    process per stale chart, capped at the CPU count; with one worker the
+    charts are drawn in this process.
+    """
+    output_dir = Path(output_dir)
+    manifest_path = output_dir / MANIFEST_NAME
+    recorded = {}
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            recorded = json.load(f)
+
+    digests = {name: job_digest(render, data, dpi) for name, (render, data) in jobs.items()}
+    stale = [name for name in jobs
+             if force or recorded.get(name) != digests[name] or not (output_dir / name).exists()]
+
+    tasks = [(jobs[name][0], jobs[name][1], output_dir / name, dpi) for name in stale]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render, tasks))
+    else:
+        for task in tasks:
+            _render(task)
+
+    recorded.update({name: digests[name] for name in stale})
+    with open(manifest_path, 'w') as f:
+        json.dump(recorded, f, indent=2)
+    return {name: 'rendered' if name in stale else 'unchanged' for name in jobs}
@@ -1,356 +1,440 @@
 """
 Comprehensive Data Science Analysis: Trading Behavior vs Market Sentiment
 This script performs a complete analysis of trader behavior in relation to market sentiment.
+
+The work itself is the stage pipeline in `pipeline.py`; this script runs the
+stages for the requested mode, prints the tables and writes the CSVs, charts
+and summary. Importing it runs nothing (`main()` does).
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
+import argparse
+import sys
 import warnings
 from datetime import datetime
 import json
 
-warnings.filterwarnings('ignore')
-
-# Set style
-sns.set_style('whitegrid')
-plt.rcParams['figure.figsize'] = (12, 6)
-
-# Paths
-BASE_DIR = Path(__file__).parent.parent / 'primetrade.ai'
-OUTPUT_DIR = Path(__file__).parent / 'outputs'
-CSV_DIR = Path(__file__).parent / 'csv_files'
-OUTPUT_DIR.mkdir(exist_ok=True)
-CSV_DIR.mkdir(exist_ok=True)
-
-print("Loading datasets...")
-
-# Load datasets
-fear_greed = pd.read_csv(BASE_DIR / 'fear_greed_index.csv')
-historical_data = pd.read_csv(BASE_DIR / 'historical_data.csv', low_memory=False)
-
-# Clean column names
-historical_data.columns = historical_data.columns.str.strip()
-fear_greed.columns = fear_greed.columns.str.strip()
-
-print(f"Fear & Greed Index: {len(fear_greed)} rows")
-print(f"Historical Trading Data: {len(historical_data)} rows")
-
-# Data preprocessing
-print("\nPreprocessing data...")
-
-# Process fear & greed data
-fear_greed['date'] = pd.to_datetime(fear_greed['date'], errors='coerce').dt.date
-fear_greed = fear_greed.dropna(subset=['date', 'classification'])
-
-# Process historical data
-if 'Timestamp IST' in historical_data.columns:
-    historical_data['ts'] = pd.to_datetime(historical_data['Timestamp IST'], dayfirst=True, errors='coerce')
-elif 'Timestamp' in historical_data.columns:
-    historical_data['ts'] = pd.to_datetime(historical_data['Timestamp'], errors='coerce')
-else:
-    historical_data['ts'] = pd.NaT
-
-historical_data['date'] = historical_data['ts'].dt.date
-
-# Convert numeric columns
-numeric_cols = ['Closed PnL', 'Size USD', 'Execution Price', 'Fee', 'Size Tokens']
-for col in numeric_cols:
-    if col in historical_data.columns:
-        historical_data[col] = pd.to_numeric(historical_data[col], errors='coerce')
-
-# Merge datasets
-print("Merging datasets...")
-merged = historical_data.merge(
-    fear_greed[['date', 'classification', 'value']], 
-    on='date', 
-    how='left'
-)
-
-print(f"Merged dataset: {len(merged)} rows")
-print(f"Rows with sentiment: {merged['classification'].notna().sum()}")
-
-# Create derived metrics
-merged['win'] = merged['Closed PnL'] > 0
-merged['loss'] = merged['Closed PnL'] < 0
-merged['is_buy'] = merged['Side'].str.upper() == 'BUY' if 'Side' in merged.columns else False
-merged['is_sell'] = merged['Side'].str.upper() == 'SELL' if 'Side' in merged.columns else False
-
-# Calculate risk metrics (using absolute PnL as proxy for risk)
-merged['abs_pnl'] = merged['Closed PnL'].abs()
-merged['risk_reward_ratio'] = np.where(
-    merged['Closed PnL'] != 0,
-    merged['abs_pnl'] / merged['Size USD'].abs(),
-    np.nan
-)
-
-# Analysis 1: Overall metrics by sentiment
-print("\n=== Analysis 1: Overall Metrics by Sentiment ===")
-sentiment_agg = merged.groupby('classification').agg({
-    'Account': 'count',
-    'Size USD': ['sum', 'mean', 'std'],
-    'Closed PnL': ['sum', 'mean', 'std', 'median'],
-    'win': 'mean',
-    'abs_pnl': 'mean',
-    'Fee': 'sum'
-}).round(2)
-
-sentiment_agg.columns = [
-    'total_trades', 'total_volume_usd', 'avg_trade_size_usd', 'std_trade_size',
-    'total_pnl', 'avg_pnl', 'std_pnl', 'median_pnl', 'win_rate', 'avg_abs_pnl', 'total_fees'
-]
-
-sentiment_agg = sentiment_agg.reset_index()
-sentiment_agg = sentiment_agg.sort_values('total_trades', ascending=False)
-print(sentiment_agg)
-
-sentiment_agg.to_csv(CSV_DIR / 'sentiment_aggregated_metrics.csv', index=False)
-
-# Analysis 2: Profitability analysis
-print("\n=== Analysis 2: Profitability Analysis ===")
-profitability = merged.groupby('classification').agg({
-    'Closed PnL': ['sum', 'mean', 'median', lambda x: (x > 0).sum(), lambda x: (x < 0).sum()],
-    'win': 'sum',
-    'loss': 'sum'
-}).round(2)
-
-profitability.columns = ['total_pnl', 'avg_pnl', 'median_pnl', 'winning_trades', 'losing_trades', 'wins', 'losses']
-profitability = profitability.reset_index()
-profitability['profit_margin'] = (profitability['total_pnl'] / profitability['total_pnl'].abs().sum() * 100).round(2)
-print(profitability)
-
-profitability.to_csv(CSV_DIR / 'profitability_by_sentiment.csv', index=False)
-
-# Analysis 3: Volume analysis
-print("\n=== Analysis 3: Volume Analysis ===")
-volume_analysis = merged.groupby('classification').agg({
-    'Size USD': ['sum', 'mean', 'median', 'count'],
-    'Size Tokens': ['sum', 'mean'] if 'Size Tokens' in merged.columns else []
-}).round(2)
-
-if 'Size Tokens' in merged.columns:
-    volume_analysis.columns = ['total_volume_usd', 'avg_volume_usd', 'median_volume_usd', 'trade_count', 
-                               'total_tokens', 'avg_tokens']
-else:
-    volume_analysis.columns = ['total_volume_usd', 'avg_volume_usd', 'median_volume_usd', 'trade_count']
-
-volume_analysis = volume_analysis.reset_index()
-print(volume_analysis)
-
-volume_analysis.to_csv(CSV_DIR / 'volume_analysis_by_sentiment.csv', index=False)
-
-# Analysis 4: Risk analysis
-print("\n=== Analysis 4: Risk Analysis ===")
-risk_analysis = merged.groupby('classification').agg({
-    'abs_pnl': ['mean', 'median', 'std'],
-    'risk_reward_ratio': ['mean', 'median'],
-    'Closed PnL': ['std', lambda x: x.quantile(0.25), lambda x: x.quantile(0.75)]
-}).round(2)
-
-risk_analysis.columns = ['avg_abs_pnl', 'median_abs_pnl', 'std_abs_pnl', 
-                        'avg_risk_reward', 'median_risk_reward',
-                        'pnl_std', 'pnl_q25', 'pnl_q75']
-risk_analysis = risk_analysis.reset_index()
-print(risk_analysis)
-
-risk_analysis.to_csv(CSV_DIR / 'risk_analysis_by_sentiment.csv', index=False)
-
-# Analysis 5: Buy vs Sell behavior
-print("\n=== Analysis 5: Buy vs Sell Analysis ===")
-if 'is_buy' in merged.columns:
-    buy_sell_analysis = merged.groupby(['classification', 'is_buy']).agg({
-        'Account': 'count',
-        'Size USD': 'sum',
-        'Closed PnL': ['sum', 'mean']
-    }).round(2)
-    
-    buy_sell_analysis.columns = ['trade_count', 'total_volume', 'total_pnl', 'avg_pnl']
-    buy_sell_analysis = buy_sell_analysis.reset_index()
-    buy_sell_analysis['side'] = buy_sell_analysis['is_buy'].map({True: 'BUY', False: 'SELL'})
-    print(buy_sell_analysis)
-    
-    buy_sell_analysis.to_csv(CSV_DIR / 'buy_sell_analysis.csv', index=False)
-
-# Analysis 6: Time-based trends
-print("\n=== Analysis 6: Time-based Trends ===")
-merged['year_month'] = merged['ts'].dt.to_period('M')
-time_trends = merged.groupby(['year_month', 'classification']).agg({
-    'Account': 'count',
-    'Size USD': 'sum',
-    'Closed PnL': 'sum'
-}).round(2)
-
-time_trends.columns = ['trade_count', 'volume', 'pnl']
-time_trends = time_trends.reset_index()
-time_trends.to_csv(CSV_DIR / 'time_trends.csv', index=False)
-
-# Analysis 7: Top performing accounts by sentiment
-print("\n=== Analysis 7: Top Accounts by Sentiment ===")
-account_performance = merged.groupby(['classification', 'Account']).agg({
-    'Closed PnL': 'sum',
-    'Account': 'count',
-    'Size USD': 'sum'
-}).round(2)
-
-account_performance.columns = ['total_pnl', 'trade_count', 'total_volume']
-account_performance = account_performance.reset_index()
-
-top_accounts = account_performance.groupby('classification').apply(
-    lambda x: x.nlargest(5, 'total_pnl')
-).reset_index(drop=True)
-
-top_accounts.to_csv(CSV_DIR / 'top_accounts_by_sentiment.csv', index=False)
-
-# ========== VISUALIZATIONS ==========
-print("\n=== Creating Visualizations ===")
-
-# 1. Trades per sentiment
-plt.figure(figsize=(10, 6))
-sns.barplot(data=sentiment_agg, x='classification', y='total_trades', palette='viridis')
-plt.title('Total Trades by Market Sentiment', fontsize=14, fontweight='bold')
-plt.xlabel('Market Sentiment', fontsize=12)
-plt.ylabel('Number of Trades', fontsize=12)
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.savefig(OUTPUT_DIR / '1_trades_per_sentiment.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# 2. Average PnL per sentiment
-plt.figure(figsize=(10, 6))
-sns.barplot(data=sentiment_agg, x='classification', y='avg_pnl', palette='coolwarm')
-plt.title('Average Closed PnL by Market Sentiment', fontsize=14, fontweight='bold')
-plt.xlabel('Market Sentiment', fontsize=12)
-plt.ylabel('Average PnL (USD)', fontsize=12)
-plt.xticks(rotation=45)
-plt.axhline(y=0, color='black', linestyle='--', linewidth=0.8)
-plt.tight_layout()
-plt.savefig(OUTPUT_DIR / '2_avg_pnl_per_sentiment.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# 3. Win rate per sentiment
-plt.figure(figsize=(10, 6))
-sns.barplot(data=sentiment_agg, x='classification', y='win_rate', palette='RdYlGn')
-plt.title('Win Rate by Market Sentiment', fontsize=14, fontweight='bold')
-plt.xlabel('Market Sentiment', fontsize=12)
-plt.ylabel('Win Rate', fontsize=12)
-plt.xticks(rotation=45)
-plt.ylim(0, 1)
-plt.tight_layout()
-plt.savefig(OUTPUT_DIR / '3_win_rate_per_sentiment.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# 4. Total volume per sentiment
-plt.figure(figsize=(10, 6))
-sns.barplot(data=sentiment_agg, x='classification', y='total_volume_usd', palette='plasma')
-plt.title('Total Trading Volume by Market Sentiment', fontsize=14, fontweight='bold')
-plt.xlabel('Market Sentiment', fontsize=12)
-plt.ylabel('Total Volume (USD)', fontsize=12)
-plt.yscale('log')
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.savefig(OUTPUT_DIR / '4_total_volume_per_sentiment.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# 5. Risk metrics
-plt.figure(figsize=(10, 6))
-sns.barplot(data=risk_analysis, x='classification', y='avg_abs_pnl', palette='magma')
-plt.title('Average Absolute PnL (Risk Proxy) by Market Sentiment', fontsize=14, fontweight='bold')
-plt.xlabel('Market Sentiment', fontsize=12)
-plt.ylabel('Average Absolute PnL (USD)', fontsize=12)
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.savefig(OUTPUT_DIR / '5_risk_metrics_per_sentiment.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# 6. PnL distribution by sentiment
-plt.figure(figsize=(12, 6))
-sentiment_order = ['Extreme Fear', 'Fear', 'Neutral', 'Greed', 'Extreme Greed']
-for sent in sentiment_order:
-    if sent in merged['classification'].values:
-        data = merged[merged['classification'] == sent]['Closed PnL'].dropna()
-        plt.hist(data, alpha=0.6, label=sent, bins=50)
-plt.title('PnL Distribution by Market Sentiment', fontsize=14, fontweight='bold')
-plt.xlabel('Closed PnL (USD)', fontsize=12)
-plt.ylabel('Frequency', fontsize=12)
-plt.legend()
-plt.xlim(-1000, 1000)
-plt.tight_layout()
-plt.savefig(OUTPUT_DIR / '6_pnl_distribution.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# 7. Time series of sentiment and trading volume
-if 'year_month' in merged.columns:
-    monthly_volume = merged.groupby(['year_month', 'classification'])['Size USD'].sum().reset_index()
-    monthly_volume['year_month_str'] = monthly_volume['year_month'].astype(str)
-    
-    plt.figure(figsize=(14, 6))
-    for sent in sentiment_order:
-        if sent in monthly_volume['classification'].values:
-            data = monthly_volume[monthly_volume['classification'] == sent]
-            plt.plot(data['year_month_str'], data['Size USD'], marker='o', label=sent, linewidth=2)
-    plt.title('Monthly Trading Volume by Market Sentiment Over Time', fontsize=14, fontweight='bold')
-    plt.xlabel('Month', fontsize=12)
-    plt.ylabel('Trading Volume (USD)', fontsize=12)
-    plt.legend()
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / '7_volume_timeseries.png', dpi=300, bbox_inches='tight')
-    plt.close()
-
-# 8. Correlation heatmap
-correlation_data = sentiment_agg[['total_trades', 'total_volume_usd', 'avg_pnl', 'win_rate', 'avg_abs_pnl']]
-correlation_data.index = sentiment_agg['classification']
-corr_matrix = correlation_data.T.corr()
-
-plt.figure(figsize=(8, 6))
-sns.heatmap(corr_matrix, annot=True, fmt='.2f', cmap='coolwarm', center=0, square=True)
-plt.title('Correlation Matrix: Trading Metrics by Sentiment', fontsize=14, fontweight='bold')
-plt.tight_layout()
-plt.savefig(OUTPUT_DIR / '8_correlation_heatmap.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# 9. Buy vs Sell comparison
-if 'is_buy' in merged.columns:
-    buy_sell_pnl = merged.groupby(['classification', 'is_buy'])['Closed PnL'].mean().reset_index()
-    buy_sell_pnl['side'] = buy_sell_pnl['is_buy'].map({True: 'BUY', False: 'SELL'})
-    
-    plt.figure(figsize=(10, 6))
-    sns.barplot(data=buy_sell_pnl, x='classification', y='Closed PnL', hue='side', palette='Set2')
-    plt.title('Average PnL: Buy vs Sell by Market Sentiment', fontsize=14, fontweight='bold')
-    plt.xlabel('Market Sentiment', fontsize=12)
-    plt.ylabel('Average PnL (USD)', fontsize=12)
-    plt.xticks(rotation=45)
-    plt.legend(title='Side')
-    plt.axhline(y=0, color='black', linestyle='--', linewidth=0.8)
-    plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / '9_buy_vs_sell_pnl.png', dpi=300, bbox_inches='tight')
-    plt.close()
-
-print(f"\n=== Analysis Complete ===")
-print(f"Outputs saved to: {OUTPUT_DIR}")
-print(f"CSV files saved to: {CSV_DIR}")
-
-# Generate summary statistics
-summary = {
-    'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-    'total_trades': int(len(merged)),
-    'trades_with_sentiment': int(merged['classification'].notna().sum()),
-    'date_range': {
-        'start': str(merged['date'].min()),
-        'end': str(merged['date'].max())
-    },
-    'sentiment_distribution': {str(k): int(v) for k, v in merged['classification'].value_counts().to_dict().items()},
-    'key_insights': {
-        'highest_volume_sentiment': str(sentiment_agg.loc[sentiment_agg['total_volume_usd'].idxmax(), 'classification']),
-        'highest_avg_pnl_sentiment': str(sentiment_agg.loc[sentiment_agg['avg_pnl'].idxmax(), 'classification']),
-        'highest_win_rate_sentiment': str(sentiment_agg.loc[sentiment_agg['win_rate'].idxmax(), 'classification'])
-    }
-}
-
-with open(OUTPUT_DIR / 'analysis_summary.json', 'w') as f:
-    json.dump(summary, f, indent=2)
-
-print("\nSummary statistics saved to analysis_summary.json")
+import pandas as pd
 
+from aggregation import DEFAULT_TOP_K, RANK_METRICS, REPORT_GROUPINGS, TOP_K_GROUPINGS, check_parity
+from backends import BACKENDS, backend_available, open_backend
+from charts import DEFAULT_DPI, PREVIEW_DPI
+from incremental import run_incremental
+from lagged_sentiment import DEFAULT_MAX_LAG, DEFAULT_WINDOWS
+from parallel import PARTITION_KEYS
+from pipeline import ANALYSIS_TABLES, Pipeline
+from profiling import StageProfiler
+from significance import DEFAULT_CONFIDENCE, DEFAULT_RESAMPLES, DEFAULT_SEED, with_intervals
+from sketches import DEFAULT_DISTINCT_ERROR, DEFAULT_QUANTILE_ERROR
+from streaming import DEFAULT_CHUNKSIZE, run_streaming
+
+ANALYSIS_TITLES = dict(zip(ANALYSIS_TABLES, [
+    'Analysis 1: Overall Metrics by Sentiment',
+    'Analysis 2: Profitability Analysis',
+    'Analysis 3: Volume Analysis',
+    'Analysis 4: Risk Analysis',
+    'Analysis 5: Buy vs Sell Analysis',
+    'Analysis 6: Time-based Trends',
+    'Analysis 7: Top Accounts by Sentiment',
+]))
+
+
+def parse_args(argv=None):
+    """Command line options."""
+    parser = argparse.ArgumentParser(description='Trading behavior vs market sentiment analysis')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='parse the CSVs directly instead of using the columnar cache, and keep no stage results')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='force the columnar cache to be rebuilt from the CSVs')
+    parser.add_argument('--float32', action='store_true',
+                        help='store numeric measures as float32 (smaller, but CSVs may differ in the last digit)')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='load the object-typed frame too and report per-column memory before/after the schema')
+    parser.add_argument('--start', metavar='YYYY-MM-DD',
+                        help='only analyse trades from this date (inclusive; read from the day-ordered store)')
+    parser.add_argument('--end', metavar='YYYY-MM-DD',
+                        help='only analyse trades up to this date (inclusive)')
+    parser.add_argument('--engine', choices=['cube', 'fused', 'pandas'], default='cube',
+                        help='aggregation engine for analyses 1-7 (cube = roll-ups of the aggregate cube, fused = '
+                             'one pass over the trades, pandas = original per-analysis groupbys)')
+    parser.add_argument('--check-parity', action='store_true',
+                        help='also run the other engine (with --backend duckdb: the pandas backend) and compare '
+                             'every table')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='pandas',
+                        help='execution backend for load, join and aggregation (duckdb = out-of-core SQL over the '
+                             'raw CSV/Parquet; CSVs and summary only, no charts)')
+    parser.add_argument('--memory-limit', metavar='SIZE',
+                        help='--backend duckdb: memory budget before spilling to disk, e.g. 4GB')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, metavar='K',
+                        help='accounts kept per group in the top-accounts tables')
+    parser.add_argument('--rank-by', choices=list(RANK_METRICS), default='pnl',
+                        help='metric the top-accounts tables rank by')
+    parser.add_argument('--top-k-by', nargs='+', choices=list(TOP_K_GROUPINGS), default=[],
+                        help='also write top accounts per (sentiment, coin) and/or (sentiment, month)')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help='run analyses 1-7 in N processes over partitions of the cached trades')
+    parser.add_argument('--partition-by', choices=PARTITION_KEYS, default='month',
+                        help='how --workers splits the trades (calendar month or account)')
+    parser.add_argument('--sentiment-join', choices=['exact', 'asof'], default='exact',
+                        help="exact: the trade day's reading; asof: the latest reading at or before the trade time")
+    parser.add_argument('--sentiment-lag', type=int, default=0, metavar='N',
+                        help='use the sentiment from N days before each trade')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                        help='resolution of the saved charts')
+    parser.add_argument('--preview', action='store_true',
+                        help=f'fast low-resolution charts ({PREVIEW_DPI} DPI)')
+    parser.add_argument('--chart-workers', type=int, default=None, metavar='N',
+                        help='processes used to draw charts (default: one per CPU)')
+    parser.add_argument('--report', action='store_true',
+                        help='also build the PDF report in this process from the in-memory tables')
+    parser.add_argument('--report-path', type=Path, default=None,
+                        help='path of the --report PDF (default: ds_report.pdf in --output-dir)')
+    parser.add_argument('--entity-reports', nargs='+', choices=list(REPORT_GROUPINGS), default=[],
+                        help='write one sentiment-breakdown PDF per account and/or coin into outputs/reports_<kind>')
+    parser.add_argument('--report-workers', type=int, default=None, metavar='N',
+                        help='processes building --entity-reports (default: one per CPU)')
+    parser.add_argument('--report-batch-size', type=int, default=None, metavar='N',
+                        help='entities per --entity-reports batch (default: 64)')
+    parser.add_argument('--significance', action='store_true',
+                        help='bootstrap intervals for avg PnL, win rate and trade size per sentiment (added to '
+                             'sentiment_aggregated_metrics.csv and the report) and permutation tests of the leaders')
+    parser.add_argument('--resamples', type=int, default=DEFAULT_RESAMPLES, metavar='N',
+                        help='--significance: bootstrap resamples and permutations per comparison')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE,
+                        help='--significance: interval confidence level')
+    parser.add_argument('--bootstrap-seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--bootstrap-workers', type=int, default=None, metavar='N',
+                        help='--significance: processes for the resampling blocks (default: one per CPU)')
+    parser.add_argument('--lagged-sentiment', action='store_true',
+                        help='also write PnL, win rate and volume by sentiment 0..--max-lag days before each '
+                             'trade and by rolling-window sentiment (lagged_sentiment_metrics.csv)')
+    parser.add_argument('--max-lag', type=int, default=DEFAULT_MAX_LAG, metavar='N',
+                        help='--lagged-sentiment: largest lag in days')
+    parser.add_argument('--windows', type=int, nargs='+', default=DEFAULT_WINDOWS, metavar='W',
+                        help='--lagged-sentiment: rolling windows in days')
+    parser.add_argument('--trade-sequences', action='store_true',
+                        help='also write per-account sequence behaviour (streaks, time between trades, holding '
+                             'time, running position and PnL) by sentiment (trade_sequence_by_sentiment.csv)')
+    parser.add_argument('--approximate', action='store_true',
+                        help='medians/quartiles and distinct accounts per sentiment from fixed-size sketches')
+    parser.add_argument('--quantile-error', type=float, default=DEFAULT_QUANTILE_ERROR, metavar='EPS',
+                        help='--approximate: target normalized rank error of the quantiles')
+    parser.add_argument('--distinct-error', type=float, default=DEFAULT_DISTINCT_ERROR, metavar='EPS',
+                        help='--approximate: target relative error of the distinct counts')
+    parser.add_argument('--streaming', action='store_true',
+                        help='build the CSVs and summary from a bounded-memory chunked pass (no charts)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help='rows per chunk in --streaming and --incremental mode')
+    parser.add_argument('--incremental', action='store_true',
+                        help='fold only trades added since the last run into saved per-day aggregates (no charts)')
+    parser.add_argument('--reset-state', action='store_true',
+                        help='discard the saved --incremental state and rebuild it from the full history')
+    parser.add_argument('--profile-sample', nargs='?', const=True, default=False, metavar='STAGE',
+                        help='sample Python stacks and save the profile of the slowest stage (or of STAGE)')
+    parser.add_argument('--data-dir', type=Path, default=Path(__file__).parent.parent / 'primetrade.ai',
+                        help='directory holding historical_data.csv and fear_greed_index.csv')
+    parser.add_argument('--output-dir', type=Path, default=Path(__file__).parent / 'outputs',
+                        help='where charts and analysis_summary.json are written')
+    parser.add_argument('--csv-dir', type=Path, default=Path(__file__).parent / 'csv_files',
+                        help='where the analysis CSVs are written')
+    parser.add_argument('--cache-dir', type=Path, default=Path(__file__).parent / '.cache',
+                        help='columnar cache, stage results and --incremental state')
+    args = parser.parse_args(argv)
+    if args.workers > 1 and (args.no_cache or args.engine == 'pandas'):
+        parser.error('--workers needs the columnar cache and the cube or fused engine')
+    if (args.report or args.entity_reports) and (args.streaming or args.incremental):
+        parser.error('--report and --entity-reports need the in-memory mode')
+    if args.incremental and args.sentiment_join != 'exact':
+        parser.error('--incremental keeps per-day aggregates and supports --sentiment-join exact only')
+    for name in ('start', 'end'):
+        value = getattr(args, name)
+        if value is not None:
+            try:
+                setattr(args, name, pd.Timestamp(value).strftime('%Y-%m-%d'))
+            except ValueError:
+                parser.error(f'--{name} must be a date (YYYY-MM-DD), got {value!r}')
+    if args.start and args.end and args.start > args.end:
+        parser.error('--start is after --end')
+    if (args.start or args.end) and (args.streaming or args.incremental or args.workers > 1):
+        parser.error('--start/--end select rows of the in-memory frame; not with --streaming, --incremental '
+                     'or --workers')
+    if args.lagged_sentiment and (args.streaming or args.incremental):
+        parser.error('--lagged-sentiment needs the in-memory mode')
+    if args.trade_sequences and (args.streaming or args.incremental):
+        parser.error('--trade-sequences orders each account\'s trades and needs the in-memory mode')
+    if args.significance and (args.streaming or args.incremental):
+        parser.error('--significance resamples the trades and needs the in-memory mode')
+    if args.resamples < 1 or not 0 < args.confidence < 1:
+        parser.error('--resamples must be >= 1 and --confidence between 0 and 1')
+    if args.max_lag < 0 or min(args.windows) < 1:
+        parser.error('--max-lag must be >= 0 and --windows >= 1')
+    if args.backend != 'pandas':
+        if not backend_available(args.backend):
+            parser.error(f'--backend {args.backend} needs the {args.backend} package (pip install {args.backend})')
+        if (args.streaming or args.incremental or args.workers > 1 or args.approximate or args.report
+                or args.entity_reports or args.significance or args.lagged_sentiment or args.trade_sequences):
+            parser.error(f'--backend {args.backend} writes the seven CSVs and the summary; not with --streaming, '
+                         '--incremental, --workers, --approximate, reports or the extra analyses')
+        if args.sentiment_join != 'exact':
+            parser.error(f'--backend {args.backend} supports --sentiment-join exact only')
+    if args.approximate and (args.incremental or args.workers > 1 or args.engine != 'cube' or args.check_parity):
+        parser.error('--approximate works with the cube engine (in-memory or --streaming), without --workers, '
+                     '--incremental or --check-parity')
+    if not (0 < args.quantile_error < 1 and 0 < args.distinct_error < 1):
+        parser.error('--quantile-error and --distinct-error must be between 0 and 1')
+    return args
+
+
+def approximate(args):
+    """The pipeline's `approximate` option: (quantile error, distinct error) or None."""
+    return (args.quantile_error, args.distinct_error) if args.approximate else None
+
+
+def no_trades_message(args):
+    """Why there is nothing to analyse: no trade (in the --start/--end window) has a sentiment reading."""
+    if args.start or args.end:
+        return (f"No trades with a sentiment reading between {args.start or 'the start'} and "
+                f"{args.end or 'the end'}; nothing to analyse")
+    return "No trades with a sentiment reading; nothing to analyse"
+
+
+def run_out_of_core(args, profiler):
+    """--streaming / --incremental: CSVs and summary without the in-memory frame (no charts)."""
+    if args.streaming:
+        # Bounded-memory path: the seven CSVs and the summary come from one chunked pass
+        print(f"Streaming {args.data_dir / 'historical_data.csv'} in chunks of {args.chunksize} rows...")
+        mode = 'streaming'
+        with profiler.stage(mode) as stage:
+            tables, summary = run_streaming(args.data_dir, args.csv_dir, args.output_dir, chunksize=args.chunksize,
+                                            join_mode=args.sentiment_join, lag=args.sentiment_lag,
+                                            top_k=args.top_k, rank_by=args.rank_by,
+                                            approximate=approximate(args))
+            stage['rows_in'] = summary['total_trades']
+            stage['rows_out'] = sum(len(table) for table in tables.values())
+    else:
+        # Append path: per-day partial aggregates and a ts watermark are kept in
+        # .cache/incremental; only trades added since the last run are read
+        print(f"Incremental update from {args.data_dir / 'historical_data.csv'}...")
+        mode = 'incremental'
+        with profiler.stage(mode) as stage:
+            tables, summary = run_incremental(args.data_dir, args.csv_dir, args.output_dir,
+                                              args.cache_dir / 'incremental', chunksize=args.chunksize,
+                                              lag=args.sentiment_lag, reset=args.reset_state,
+                                              top_k=args.top_k, rank_by=args.rank_by)
+            stage['rows_in'] = summary['total_trades']
+            stage['rows_out'] = sum(len(table) for table in tables.values())
+    profiler.write(args.output_dir, mode=mode)
+    print(f"\nCSV files saved to: {args.csv_dir}")
+
+
+def run_backend(args, profiler):
+    """--backend other than pandas: CSVs and summary from that backend (no charts), optionally checked."""
+    print(f"Aggregating {args.data_dir} with the {args.backend} backend...")
+    options = {'start': args.start, 'end': args.end, 'lag': args.sentiment_lag, 'top_k': args.top_k,
+               'rank_by': args.rank_by}
+    with profiler.stage(args.backend) as stage:
+        backend = open_backend(args.backend, args.data_dir, args.cache_dir, memory_limit=args.memory_limit,
+                               **options)
+        tables = backend.tables()
+        if tables['sentiment_aggregated_metrics'].empty:
+            sys.exit(no_trades_message(args))
+        summary = backend.summary(tables['sentiment_aggregated_metrics'])
+        stage['rows_in'] = summary['total_trades']
+        stage['rows_out'] = sum(len(table) for table in tables.values())
+
+    for name, table in tables.items():
+        print(f"\n=== {name} ===")
+        print(table)
+        table.to_csv(args.csv_dir / f'{name}.csv', index=False)
+    summary = {'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), **summary}
+    with open(args.output_dir / 'analysis_summary.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    if args.check_parity:
+        print(f"\n=== Parity: {args.backend} backend vs pandas backend ===")
+        reference = open_backend('pandas', args.data_dir, args.cache_dir, use_cache=not args.no_cache, **options)
+        parity = check_parity(reference.tables(), tables)
+        for name, status in parity:
+            print(f"{name}: {status}")
+        if any(status.startswith('MISMATCH') for _, status in parity):
+            sys.exit("Parity check failed")
+    profiler.write(args.output_dir, mode=args.backend)
+    print(f"\nCSV files saved to: {args.csv_dir}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    warnings.filterwarnings('ignore')
+    OUTPUT_DIR, CSV_DIR = args.output_dir, args.csv_dir
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    CSV_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Wall/CPU time, rows and peak memory per stage, written to outputs/profile.json
+    profiler = StageProfiler(sample=args.profile_sample)
+
+    if args.streaming or args.incremental:
+        run_out_of_core(args, profiler)
+        return
+    if args.backend != 'pandas':
+        run_backend(args, profiler)
+        return
+
+    pipeline = Pipeline(
+        args.data_dir, args.cache_dir, OUTPUT_DIR, report_path=args.report_path, profiler=profiler, persist=not args.no_cache,
+        use_cache=not args.no_cache, rebuild_cache=args.rebuild_cache, object_columns=args.memory_report,
+        start=args.start, end=args.end,
+        float32=args.float32, join_mode=args.sentiment_join, lag=args.sentiment_lag, engine=args.engine,
+        workers=args.workers, partition_by=args.partition_by, top_k=args.top_k, rank_by=args.rank_by,
+        dpi=PREVIEW_DPI if args.preview else args.dpi, chart_workers=args.chart_workers,
+        approximate=approximate(args), max_lag=args.max_lag, windows=sorted(set(args.windows)),
+        significance=args.significance, resamples=args.resamples, confidence=args.confidence,
+        bootstrap_seed=args.bootstrap_seed, bootstrap_workers=args.bootstrap_workers)
+
+    # Load datasets (parsed and cleaned once, then memory-mapped from the columnar
+    # cache) and apply the compact schema (categoricals, int32 epoch-days)
+    print("Loading datasets...")
+    if args.memory_report:
+        mem_report = pipeline.get('memory_report')
+        print("\n=== Memory by Column (object-typed vs compact schema) ===")
+        print(mem_report)
+        mem_report.to_csv(OUTPUT_DIR / 'memory_report.csv')
+
+    if args.workers > 1:
+        # The workers read their partitions of the trades from the columnar
+        # cache and return partial cubes; only the sentiment table and the
+        # merged cube are held here
+        print(f"Fear & Greed Index: {len(pipeline.get('fear_greed'))} rows")
+        print(f"Aggregating in {args.workers} processes (partitioned by {args.partition_by})...")
+        cube = pipeline.get('cube')
+        with_sentiment = int(cube.table(['classification'], []).rows.sum())
+        print(f"Historical Trading Data: {int(cube.rows.sum())} rows")
+    else:
+        fear_greed, historical_data = pipeline.get('schema')
+        print(f"Fear & Greed Index: {len(fear_greed)} rows")
+        print(f"Historical Trading Data: {len(historical_data)} rows"
+              + (f" (window {args.start or 'start'} to {args.end or 'end'})" if args.start or args.end else ""))
+
+        # Merge datasets: direct day-indexed lookup into the dense sentiment table
+        print("Merging datasets...")
+        merged = pipeline.get('join')
+        with_sentiment = merged['classification'].notna().sum()
+        print(f"Merged dataset: {len(merged)} rows")
+    print(f"Rows with sentiment: {with_sentiment}")
+    if not with_sentiment:
+        sys.exit(no_trades_message(args))
+
+    # Derived metrics (win/loss, side flags, risk proxies) and the aggregate
+    # cube, then analyses 1-7 as roll-ups of the cube (or one fused pass, or
+    # the original per-analysis groupbys)
+    tables = pipeline.get('tables')
+
+    if args.significance:
+        # Bootstrap intervals and permutation tests from blocks of resample
+        # index matrices, spread over --bootstrap-workers processes
+        print(f"Resampling ({args.resamples} bootstrap resamples and permutations)...")
+        intervals, tests = pipeline.get('significance')
+        tables = dict(tables, sentiment_aggregated_metrics=with_intervals(
+            tables['sentiment_aggregated_metrics'], intervals))
+
+    with profiler.stage('write_tables') as stage:
+        for name, title in ANALYSIS_TITLES.items():
+            print(f"\n=== {title} ===")
+            print(tables[name])
+            tables[name].to_csv(CSV_DIR / f'{name}.csv', index=False)
+        stage['rows_in'] = stage['rows_out'] = sum(len(tables[name]) for name in ANALYSIS_TITLES)
+
+    for grouping in args.top_k_by:
+        name = f'top_accounts_by_sentiment_{grouping}'
+        print(f"\n=== Top {args.top_k} Accounts by Sentiment and {grouping.title()} ({args.rank_by}) ===")
+        ranking = pipeline.get(name)
+        print(ranking)
+        ranking.to_csv(CSV_DIR / f'{name}.csv', index=False)
+
+    if args.significance:
+        print(f"\n=== Significance: Leading Sentiment vs Each Other (permutation tests) ===")
+        print(tests)
+        tests.to_csv(CSV_DIR / 'significance_tests.csv', index=False)
+
+    if args.lagged_sentiment:
+        # Every lag and window from per-day roll-ups of the cube in one batch,
+        # instead of one sentiment join per lag
+        lagged = pipeline.get('lagged_sentiment')
+        print(f"\n=== Average PnL by Sentiment 0-{args.max_lag} Days Before the Trade ===")
+        by_lag = lagged[lagged['feature'] == 'lag']
+        print(by_lag.pivot(index='days', columns='sentiment', values='avg_pnl')[
+            list(by_lag['sentiment'].unique())].to_string())
+        lagged.to_csv(CSV_DIR / 'lagged_sentiment_metrics.csv', index=False)
+        print(f"Lagged and rolling-window sentiment metrics ({len(lagged)} rows) saved to lagged_sentiment_metrics.csv")
+
+    if args.trade_sequences:
+        # Streaks, gaps, positions and cumulative PnL from one (Account, ts)
+        # sort and segmented scans, aggregated by the trade's sentiment
+        sequences = pipeline.get('trade_sequences')
+        print("\n=== Trade-Sequence Behaviour by Sentiment ===")
+        print(sequences.set_index('classification').T.to_string())
+        sequences.to_csv(CSV_DIR / 'trade_sequence_by_sentiment.csv', index=False)
+        print("Trade-sequence metrics saved to trade_sequence_by_sentiment.csv")
+
+    if args.approximate:
+        # Quartiles in the tables above and distinct accounts come from the
+        # sketches; the report measures them against the exact values
+        print("\n=== Distinct Accounts by Sentiment (HyperLogLog estimate) ===")
+        distinct = pipeline.get('distinct_accounts')
+        print(distinct)
+        distinct.to_csv(CSV_DIR / 'distinct_accounts_by_sentiment.csv', index=False)
+        report = pipeline.get('approximation_report')
+        with open(OUTPUT_DIR / 'approximation_report.json', 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Max quantile rank error {report['max_rank_error']:.5f} "
+              f"(bound {report['quantile_rank_error_bound']}), max distinct-count error "
+              f"{report['max_distinct_relative_error']:.5f} (std. error {report['distinct_relative_error_bound']}); "
+              f"see approximation_report.json")
+
+    if args.check_parity:
+        print(f"\n=== Parity: {'cube' if args.engine == 'pandas' else args.engine} engine vs per-analysis groupbys ===")
+        parity = pipeline.get('parity')
+        for name, status in parity:
+            print(f"{name}: {status}")
+        if any(status.startswith('MISMATCH') for _, status in parity):
+            sys.exit("Parity check failed")
+
+    # ========== VISUALIZATIONS ==========
+    print("\n=== Creating Visualizations ===")
+
+    # Each chart is an independent job on the Agg backend; charts whose input,
+    # render code and DPI are unchanged since the last run are not redrawn
+    for name, status in pipeline.get('charts').items():
+        print(f"{name}: {status}")
+
+    print(f"\n=== Analysis Complete ===")
+    print(f"Outputs saved to: {OUTPUT_DIR}")
+    print(f"CSV files saved to: {CSV_DIR}")
+
+    # Generate summary statistics
+    summary = {'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), **pipeline.get('summary')}
+    with open(OUTPUT_DIR / 'analysis_summary.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    print("\nSummary statistics saved to analysis_summary.json")
+
+    if args.report:
+        # Built from the tables and summary already in memory (no CSV round trip)
+        print(f"PDF report generated: {pipeline.get('report')}")
+
+    for kind in args.entity_reports:
+        # Imported here so that runs without reports never load reportlab
+        from generate_report import build_entity_reports
+        breakdown = pipeline.get(f'sentiment_breakdown_{kind}')
+        with profiler.stage(f'{kind}_reports', rows_in=len(breakdown)) as stage:
+            stats = build_entity_reports(breakdown, kind, REPORT_GROUPINGS[kind], OUTPUT_DIR / f'reports_{kind}',
+                                         workers=args.report_workers, batch_size=args.report_batch_size)
+            stage['rows_out'] = stats['reports']
+        print(f"{stats['reports']} {kind} reports in {stats['seconds']}s "
+              f"({stats['reports_per_sec']} reports/sec) saved to {OUTPUT_DIR / f'reports_{kind}'}")
+
+    profiler.write(OUTPUT_DIR, mode='in-memory')
+    print(f"Stage profile saved to {OUTPUT_DIR / 'profile.json'} (slowest: {profiler.slowest()})")
+
+
+if __name__ == '__main__':
+    main()
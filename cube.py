@@ -0,0 +1,269 @@
+"""
+Materialized aggregate cube over the joined trades.
+
+`Cube.build` groups the trades once at (day, classification, Account, Coin,
+is_buy) grain and keeps additive measures per cell: the row count and, per
+measure, count, sum, mean and M2 (`aggregators.Moments`; M2 is the
+numerically stable form of the sum of squares and merges exactly). Wins,
+losses and fees are measures like volume and PnL. Any coarser grouping is a
+roll-up of the cells (`Cube.table`), so the seven analysis tables, the
+summary and the charts are derived from the cube instead of re-scanning the
+trades. The pipeline persists the cube, so a later process can re-slice it
+without loading the trades:
+
+    cube = Pipeline(...).get('cube')
+    table = cube.table(['Coin', 'classification'])   # a GroupTable
+    frame = cube.frame(['year_month'], {'volume': ('Size USD', 'sum')})
+
+Medians, quartiles and the PnL histogram have no additive form; they are
+computed per sentiment in the same pass and stored with the cube, so they
+exist at sentiment grain only. In approximate mode (`approximate=(quantile
+error, distinct error)`) the quantiles come from per-sentiment KLL sketches
+and distinct accounts from HyperLogLog (`sketches.py`), so no sentiment's
+values are sorted; `approximation_report` measures the error against exact.
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregation import (ACCOUNT_MEASURES, DEFAULT_TOP_K, FLOW_MEASURES, QUANTILES, SENTIMENT_MEASURES,
+                         SPREAD_MEASURES, FusedAggregator, build_tables, key_insights)
+from aggregators import GroupTable, Moments, group_quantiles
+from charts import pnl_histograms
+from schema import MISSING_DAY, day_to_date, decategorize
+from sketches import GroupSketches, hash_values, quantile_errors
+
+CUBE_KEYS = ['day', 'classification', 'Account', 'Coin', 'is_buy']
+CUBE_MEASURES = SENTIMENT_MEASURES
+
+# Keys derived from the cube's own keys
+DERIVED_KEYS = {'year_month'}
+
+
+def _cells(engine, names):
+    """
+    Cell id per row for a key combination, keeping rows with missing keys.
+
+    Unlike `FusedAggregator.group_codes`, a missing key is a cell of its own
+    (so the cube still accounts for every trade). Returns the ids and one row
+    of keys per cell, in sorted key order, with the columns' original dtypes.
+    """
+    factors = [engine.factor(name) for name in names]
+    dims = tuple(len(uniques) + 1 for _, uniques in factors)
+    composite = np.ravel_multi_index(
+        tuple(np.where(codes >= 0, codes, len(uniques)) for codes, uniques in factors), dims)
+    codes, cells = pd.factorize(composite, sort=True)
+
+    keys = {}
+    for name, (_, uniques), part in zip(names, factors, np.unravel_index(cells, dims)):
+        part = np.where(part < len(uniques), part, -1)
+        source = engine.merged[name]
+        if isinstance(source.dtype, pd.CategoricalDtype):
+            keys[name] = pd.Categorical.from_codes(part, dtype=source.dtype)
+        else:
+            values = pd.Series(uniques.to_numpy().take(np.maximum(part, 0)), dtype=source.dtype)
+            keys[name] = values.where(part >= 0) if (part < 0).any() else values
+    return codes, pd.DataFrame(keys)
+
+
+def _months(days):
+    """Calendar month of each epoch-day key (NaT for the missing-day sentinel)."""
+    days = np.asarray(days, dtype=np.int64)
+    months = pd.Series(pd.to_datetime(np.where(days == MISSING_DAY, 0, days), unit='D'))
+    return months.where(days != MISSING_DAY).dt.to_period('M')
+
+
+def _distinct_accounts(accounts, codes, size):
+    """Exact distinct accounts per group id (the reference for the HyperLogLog estimates)."""
+    present = pd.notna(accounts)
+    pairs = pd.DataFrame({'group': codes[present], 'account': accounts[present]}).drop_duplicates()
+    return np.bincount(pairs['group'].to_numpy(), minlength=size)
+
+
+class Cube:
+    """Additive per-cell aggregates plus per-sentiment order statistics; see the module docstring."""
+
+    def __init__(self, keys, rows, moments, quantiles, histograms, has_tokens=True, sketches=None):
+        self.keys = keys
+        self.rows = rows
+        self.moments = moments
+        self.quantiles = quantiles
+        self.histograms = histograms
+        self.has_tokens = has_tokens
+        self.sketches = sketches
+        self.accounts_estimate = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, merged, approximate=None, order_statistics=True):
+        """
+        One pass over the joined, derived trades; with `approximate=(quantile
+        error, distinct error)` the order statistics are sketched. Without
+        `order_statistics` only the cells are built (a partition's cube, see
+        `merge`).
+        """
+        engine = FusedAggregator(merged)
+        codes, keys = _cells(engine, CUBE_KEYS)
+        size = len(keys)
+        rows = np.bincount(codes, minlength=size).astype(np.int64)
+        moments = {
+            measure: Moments.from_values(codes, engine.values(measure), size,
+                                         spread=measure in SPREAD_MEASURES, extrema=False, counts=rows)
+            for measure in CUBE_MEASURES
+        }
+        if not order_statistics:
+            return cls(keys, rows, moments, {}, None, has_tokens='Size Tokens' in merged.columns)
+
+        sentiment_codes, valid, sentiment_keys = engine.group_codes(['classification'])
+        labels = sentiment_keys['classification']
+        sketches = None
+        if approximate:
+            sketches = GroupSketches(QUANTILES, *approximate)
+            sketches.update(sentiment_codes, {m: engine.values(m)[valid] for m in QUANTILES}, len(labels))
+            hashes, has_account = hash_values(merged['Account'])
+            has_account = has_account[valid]
+            sketches.update_distinct(sentiment_codes[has_account], hashes[valid][has_account], len(labels))
+        quantiles = {}
+        for measure, qs in QUANTILES.items():
+            if sketches is not None:
+                values = sketches.quantiles(measure, qs)
+            else:
+                values = group_quantiles(sentiment_codes, engine.values(measure)[valid], len(labels), qs)
+            quantiles[measure] = {q: pd.Series(v, index=labels) for q, v in values.items()}
+        cube = cls(keys, rows, moments, quantiles, pnl_histograms(merged),
+                   has_tokens='Size Tokens' in merged.columns, sketches=sketches)
+        if sketches is not None:
+            cube.accounts_estimate = pd.Series(sketches.distinct.estimate(), index=labels)
+        return cube
+
+    @classmethod
+    def merge(cls, parts):
+        """
+        One cube from the cubes of disjoint sets of trades, cells with equal
+        keys combined. Order statistics do not merge: the caller sets
+        `quantiles` and `histograms` from all the trades.
+        """
+        keys = pd.concat([part.keys for part in parts], ignore_index=True)
+        codes, cells = _cells(FusedAggregator(keys), CUBE_KEYS)
+        size = len(cells)
+        rows = np.bincount(codes, weights=np.concatenate([part.rows for part in parts]),
+                           minlength=size).astype(np.int64)
+        moments = {}
+        for measure in CUBE_MEASURES:
+            stacked = Moments()
+            for field in Moments.FIELDS:
+                setattr(stacked, field, np.concatenate([getattr(part.moments[measure], field) for part in parts]))
+            moments[measure] = stacked.rollup(codes, size, extrema=False)
+        return cls(cells, rows, moments, {}, None, has_tokens=all(part.has_tokens for part in parts))
+
+    # ---------- Re-slicing ----------
+
+    def key_frame(self, names):
+        """The cell keys `names` (cube keys or `DERIVED_KEYS`), one row per cell."""
+        return pd.DataFrame({
+            name: _months(self.keys['day']) if name == 'year_month' else self.keys[name]
+            for name in names
+        })
+
+    def table(self, names, measures=None):
+        """
+        Roll the cells up to `names` (rows with a missing key dropped, as in a
+        groupby) as a `GroupTable` of `measures` (default: all).
+        """
+        measures = list(self.moments) if measures is None else measures
+        codes, valid, keys = FusedAggregator(self.key_frame(names)).group_codes(list(names))
+        size = len(keys)
+        lookup = np.full(len(self), -1, dtype=np.int64)
+        lookup[valid] = codes
+        rows = np.bincount(codes, weights=self.rows[valid], minlength=size).astype(np.int64)
+        return GroupTable(keys, rows, {m: self.moments[m].rollup(lookup, size, extrema=False) for m in measures})
+
+    def frame(self, names, columns):
+        """
+        A rolled-up frame: `names` plus `columns` given as
+        `{output: (measure, 'count' | 'sum' | 'avg' | 'std')}`, in sorted key order.
+        """
+        table = self.table(names, sorted({measure for measure, _ in columns.values()}))
+        frame = decategorize(table.keys.copy())
+        for output, (measure, statistic) in columns.items():
+            moments = table.moments[measure]
+            frame[output] = moments.count if statistic == 'count' else getattr(moments, statistic)()
+        return frame.sort_values(list(names), kind='stable').reset_index(drop=True)
+
+    # ---------- Analysis outputs ----------
+
+    def tables(self, top_k=DEFAULT_TOP_K, rank_by='pnl'):
+        """The seven analysis tables, rolled up from the cells (see `aggregation.build_tables`)."""
+        sentiment = self.table(['classification'])
+        labels = sentiment.keys['classification']
+        quantiles = {measure: {q: values.reindex(labels).to_numpy() for q, values in by_q.items()}
+                     for measure, by_q in self.quantiles.items()}
+        return build_tables(sentiment, self.table(['classification', 'is_buy'], FLOW_MEASURES),
+                            self.table(['year_month', 'classification'], FLOW_MEASURES),
+                            self.table(['classification', 'Account'], ACCOUNT_MEASURES),
+                            quantiles, has_tokens=self.has_tokens, top_k=top_k, rank_by=rank_by)
+
+    def distinct_accounts(self):
+        """Distinct accounts per sentiment: counted from the cells, or estimated in approximate mode."""
+        if self.sketches is not None:
+            estimate = self.accounts_estimate.round().astype(np.int64)
+            return pd.DataFrame({'classification': estimate.index.astype(str), 'unique_accounts': estimate.to_numpy()})
+        accounts = self.table(['classification', 'Account'], [])
+        counts = decategorize(accounts.keys)['classification'].value_counts(sort=False)
+        return counts.rename_axis('classification').rename('unique_accounts').reset_index()
+
+    def approximation_report(self, merged):
+        """
+        Achieved error of the sketched statistics against exact values computed
+        from `merged` (the trades the cube was built from), with the configured
+        bounds and the memory each sentiment's sketches take.
+        """
+        engine = FusedAggregator(merged)
+        codes, valid, keys = engine.group_codes(['classification'])
+        labels = keys['classification']
+        exact_accounts = _distinct_accounts(merged['Account'].to_numpy()[valid], codes, len(labels))
+        report = dict(self.sketches.describe(), groups={})
+        for gid, label in enumerate(labels):
+            in_group = codes == gid
+            values = {measure: engine.values(measure)[valid][in_group] for measure in QUANTILES}
+            estimate, exact = self.accounts_estimate[label], exact_accounts[gid]
+            report['groups'][str(label)] = {
+                'rows': int(in_group.sum()),
+                # What exact quantiles hold: every non-missing value, 8 bytes each
+                'exact_bytes': int(sum(8 * (~np.isnan(v)).sum() for v in values.values())),
+                'quantiles': {
+                    measure: quantile_errors([self.quantiles[measure][q][label] for q in qs], values[measure], qs)
+                    for measure, qs in QUANTILES.items()
+                },
+                'unique_accounts': {
+                    'approximate': int(round(estimate)),
+                    'exact': int(exact),
+                    'relative_error': round(abs(estimate - exact) / max(exact, 1), 6),
+                },
+            }
+        errors = [entry['rank_error'] for group in report['groups'].values()
+                  for entries in group['quantiles'].values() for entry in entries]
+        report['max_rank_error'] = max(errors, default=None)
+        report['max_distinct_relative_error'] = max(
+            (group['unique_accounts']['relative_error'] for group in report['groups'].values()), default=None)
+        return report
+
+    def summary(self, sentiment_agg):
+        """The `analysis_summary.json` payload (without the run date)."""
+        days = self.keys['day'].to_numpy()
+        valid_days = days[days != MISSING_DAY]
+        sentiment = self.table(['classification'], [])
+        counts = pd.Series(sentiment.rows, index=decategorize(sentiment.keys)['classification'])
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        return {
+            'total_trades': int(self.rows.sum()),
+            'trades_with_sentiment': int(sentiment.rows.sum()),
+            'date_range': {
+                'start': str(day_to_date(valid_days.min())) if len(valid_days) else 'nan',
+                'end': str(day_to_date(valid_days.max())) if len(valid_days) else 'nan'
+            },
+            'sentiment_distribution': {str(k): int(v) for k, v in counts.items()},
+            'key_insights': key_insights(sentiment_agg)
+        }
@@ -0,0 +1,305 @@
+"""
+Typed columnar cache for the raw trading datasets.
+
+The first run parses both CSVs, cleans them the same way the analysis script
+always has (parsed `ts`, numeric columns, `date`) and writes every column to its
+own .npy file. Later runs memory-map those files instead of re-parsing the CSVs.
+The cache is keyed on the size, mtime, ctime and SHA-256 of each source file
+and is rebuilt automatically when either input changes.
+
+The column files live in `<cache_dir>/columnar/`, and a rebuild replaces
+only that subdirectory. Other state kept under the cache directory (stage
+results, the day-ordered store, the `--incremental` aggregates) survives it.
+"""
+
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 2
+MANIFEST_NAME = 'manifest.json'
+COLUMNAR_DIR = 'columnar'
+HASH_CHUNK_BYTES = 1 << 20
+
+FEAR_GREED_CSV = 'fear_greed_index.csv'
+HISTORICAL_CSV = 'historical_data.csv'
+
+NUMERIC_COLS = ['Closed PnL', 'Size USD', 'Execution Price', 'Fee', 'Size Tokens']
+
+
+# ---------- Cleaning ----------
+
+def clean_fear_greed(fear_greed):
+    """Strip column names, parse `date` and drop rows without a classification."""
+    fear_greed.columns = fear_greed.columns.str.strip()
+    fear_greed['date'] = pd.to_datetime(fear_greed['date'], errors='coerce').dt.date
+    return fear_greed.dropna(subset=['date', 'classification'])
+
+
+def clean_historical(historical_data):
+    """Strip column names, parse `ts`/`date` and coerce the numeric columns."""
+    historical_data.columns = historical_data.columns.str.strip()
+
+    if 'Timestamp IST' in historical_data.columns:
+        historical_data['ts'] = pd.to_datetime(historical_data['Timestamp IST'], dayfirst=True, errors='coerce')
+    elif 'Timestamp' in historical_data.columns:
+        historical_data['ts'] = pd.to_datetime(historical_data['Timestamp'], errors='coerce')
+    else:
+        historical_data['ts'] = pd.NaT
+
+    historical_data['date'] = historical_data['ts'].dt.date
+
+    for col in NUMERIC_COLS:
+        if col in historical_data.columns:
+            historical_data[col] = pd.to_numeric(historical_data[col], errors='coerce')
+    return historical_data
+
+
+# ---------- Source fingerprints ----------
+
+def file_digest(path):
+    """SHA-256 of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    stat = Path(path).stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'ctime_ns': stat.st_ctime_ns,
+            'sha256': file_digest(path)}
+
+
+def source_is_current(recorded, path):
+    """
+    Check a source file against its recorded fingerprint.
+
+    Size, mtime and ctime are compared first; the content hash is only
+    recomputed when the size matches but a time moved. A copy can carry the
+    mtime over (`cp -p`, `rsync -t`, a restore) but not the ctime, so a
+    replaced file is always hashed.
+    """
+    path = Path(path)
+    if recorded is None or not path.exists():
+        return False
+    stat = path.stat()
+    if stat.st_size != recorded['size']:
+        return False
+    if stat.st_mtime_ns == recorded['mtime_ns'] and stat.st_ctime_ns == recorded.get('ctime_ns'):
+        return True
+    if file_digest(path) != recorded['sha256']:
+        return False
+    recorded['mtime_ns'], recorded['ctime_ns'] = stat.st_mtime_ns, stat.st_ctime_ns
+    return True
+
+
+# ---------- Columnar frame storage ----------
+
+def write_frame(frame, directory):
+    """
+    Write each column of `frame` to its own .npy file and return the column specs.
+
+    Numeric and bool columns are stored as-is, datetimes as int64 nanoseconds and
+    everything else as int32 codes plus a small pickled array of unique values.
+    Uniques are sorted where the values allow it, so the codes can back a
+    categorical directly.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    specs = []
+    for i, name in enumerate(frame.columns):
+        series = frame[name]
+        stem = f'col_{i:03d}'
+        spec = {'name': name, 'file': f'{stem}.npy'}
+
+        if pd.api.types.is_datetime64_dtype(series.dtype):
+            spec['kind'] = 'datetime'
+            spec['dtype'] = str(series.dtype)
+            np.save(directory / spec['file'], series.to_numpy().view('int64'))
+        elif pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+            spec['kind'] = 'numeric'
+            np.save(directory / spec['file'], series.to_numpy())
+        else:
+            spec['kind'] = 'object'
+            spec['uniques'] = f'{stem}_uniques.npy'
+            try:
+                codes, uniques = pd.factorize(series, sort=True)
+                spec['sorted'] = True
+            except TypeError:
+                codes, uniques = pd.factorize(series)
+                spec['sorted'] = False
+            np.save(directory / spec['file'], codes.astype(np.int32))
+            np.save(directory / spec['uniques'], np.asarray(uniques, dtype=object), allow_pickle=True)
+        specs.append(spec)
+    return specs
+
+
+def read_frame(directory, specs, mmap=True, categorical=(), columns=None, rows=None):
+    """
+    Rebuild a frame from `write_frame` output, memory-mapping the column files.
+
+    Object columns named in `categorical` are returned as categoricals built
+    straight from the stored codes, without materializing Python objects.
+    `columns` restricts the frame to some columns and `rows` (an index array)
+    to some rows; only the selected rows are read from the mapped files.
+    """
+    directory = Path(directory)
+    mmap_mode = 'r' if mmap else None
+    wanted = columns
+    columns = {}
+    for spec in specs:
+        if wanted is not None and spec['name'] not in wanted:
+            continue
+        values = np.load(directory / spec['file'], mmap_mode=mmap_mode)
+        if rows is not None:
+            values = values[rows]
+        if spec['kind'] == 'datetime':
+            columns[spec['name']] = values.view(spec['dtype'])
+        elif spec['kind'] == 'numeric':
+            columns[spec['name']] = values
+        else:
+            uniques = np.load(directory / spec['uniques'], allow_pickle=True)
+            if spec['name'] in categorical and spec['sorted']:
+                columns[spec['name']] = pd.Categorical.from_codes(values, categories=uniques)
+                continue
+            # Code -1 (missing) picks the trailing NaN
+            lookup = np.append(uniques, np.nan)
+            columns[spec['name']] = lookup[values]
+    return pd.DataFrame(columns)
+
+
+# ---------- Cache entry point ----------
+
+def read_sources(base_dir):
+    """Parse and clean both CSVs without touching the cache."""
+    base_dir = Path(base_dir)
+    fear_greed = clean_fear_greed(pd.read_csv(base_dir / FEAR_GREED_CSV))
+    historical_data = clean_historical(pd.read_csv(base_dir / HISTORICAL_CSV, low_memory=False))
+    return fear_greed, historical_data
+
+
+def columnar_dir(cache_dir):
+    """Directory of the column files and manifest (the part `build_cache` replaces)."""
+    return Path(cache_dir) / COLUMNAR_DIR
+
+
+def _load_manifest(cache_dir):
+    path = columnar_dir(cache_dir) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != CACHE_VERSION:
+        return None
+    return manifest
+
+
+def _write_manifest(directory, manifest):
+    with open(Path(directory) / MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def cache_specs(cache_dir):
+    """Column specs of the cached tables (`{'fear_greed': [...], 'historical': [...]}`), or None."""
+    manifest = _load_manifest(cache_dir)
+    return manifest['tables'] if manifest is not None else None
+
+
+def cache_is_current(cache_dir, base_dir):
+    manifest = _load_manifest(cache_dir)
+    if manifest is None:
+        return False
+    sources = manifest['sources']
+    before = json.dumps(sources, sort_keys=True)
+    current = all(
+        source_is_current(sources.get(name), Path(base_dir) / name)
+        for name in (FEAR_GREED_CSV, HISTORICAL_CSV)
+    )
+    if current and json.dumps(sources, sort_keys=True) != before:
+        # Persist refreshed times so the hash check is not repeated next run
+        _write_manifest(columnar_dir(cache_dir), manifest)
+    return current
+
+
+def source_digests(base_dir, cache_dir):
+    """
+    SHA-256 of both source files: the manifest's for a source it still
+    matches (see `source_is_current`), else hashed now.
+    """
+    manifest = _load_manifest(cache_dir)
+    sources = manifest['sources'] if manifest is not None else {}
+    before = json.dumps(sources, sort_keys=True)
+    digests = {}
+    for name in (FEAR_GREED_CSV, HISTORICAL_CSV):
+        path = Path(base_dir) / name
+        current = source_is_current(sources.get(name), path)
+        digests[name] = sources[name]['sha256'] if current else file_digest(path)
+    if manifest is not None and json.dumps(sources, sort_keys=True) != before:
+        _write_manifest(columnar_dir(cache_dir), manifest)
+    return digests
+
+
+def build_cache(base_dir, cache_dir):
+    """Parse both CSVs and (re)write the columnar directory. Returns the cleaned frames."""
+    base_dir = Path(base_dir)
+    directory = columnar_dir(cache_dir)
+    fear_greed, historical_data = read_sources(base_dir)
+
+    # Write into a scratch directory and swap it in, so a crash never leaves
+    # a half-written cache behind a valid manifest
+    staging = directory.with_name(directory.name + '.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    manifest = {
+        'version': CACHE_VERSION,
+        'sources': {
+            FEAR_GREED_CSV: file_fingerprint(base_dir / FEAR_GREED_CSV),
+            HISTORICAL_CSV: file_fingerprint(base_dir / HISTORICAL_CSV),
+        },
+        'tables': {
+            'fear_greed': write_frame(fear_greed, staging / 'fear_greed'),
+            'historical': write_frame(historical_data, staging / 'historical'),
+        },
+        'rows': {'fear_greed': int(len(fear_greed)), 'historical': int(len(historical_data))},
+    }
+    _write_manifest(staging, manifest)
+    shutil.rmtree(directory, ignore_errors=True)
+    staging.rename(directory)
+    return fear_greed, historical_data
+
+
+def load_datasets(base_dir, cache_dir, use_cache=True, rebuild=False, categorical=()):
+    """
+    Return the cleaned `(fear_greed, historical_data)` frames.
+
+    With `use_cache`, a current cache is memory-mapped and a stale or missing
+    one is rebuilt from the CSVs first. `categorical` names object columns to
+    read back as categoricals (only honoured on cache hits).
+    """
+    if not use_cache:
+        return read_sources(base_dir)
+    if rebuild or not cache_is_current(cache_dir, base_dir):
+        print(f"Building columnar cache in {cache_dir}...")
+        return build_cache(base_dir, cache_dir)
+
+    manifest = _load_manifest(cache_dir)
+    directory = columnar_dir(cache_dir)
+    fear_greed = read_frame(directory / 'fear_greed', manifest['tables']['fear_greed'], categorical=categorical)
+    historical_data = read_frame(directory / 'historical', manifest['tables']['historical'],
+                                 categorical=categorical)
+    return fear_greed, historical_data
+
+
+def load_fear_greed(base_dir, cache_dir, rebuild=False, categorical=()):
+    """The cleaned fear & greed frame alone, from the cache (rebuilt first when stale); no trade column is read."""
+    if rebuild or not cache_is_current(cache_dir, base_dir):
+        print(f"Building columnar cache in {cache_dir}...")
+        return build_cache(base_dir, cache_dir)[0]
+    manifest = _load_manifest(cache_dir)
+    return read_frame(columnar_dir(cache_dir) / 'fear_greed', manifest['tables']['fear_greed'],
+                      categorical=categorical)
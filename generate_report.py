@@ -1,5 +1,13 @@
 """
 Generate PDF Report for Trading Behavior vs Market Sentiment Analysis
+
+`build_report` writes the global report from in-memory aggregates (the
+summary dict and the per-sentiment table, optionally with the bootstrap
+intervals and permutation tests of `significance.py`); the command line reads
+them from the files `comprehensive_analysis.py` wrote. `build_entity_reports` writes
+one sentiment-breakdown PDF per account or coin from a
+`aggregation.sentiment_breakdown` table, in batches across processes. All
+reports share the paragraph and table styles defined once below.
 """
 
 from reportlab.lib.pagesizes import letter, A4
@@ -8,34 +16,21 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import argparse
 import json
+import os
+import re
+import time
 
-# Paths
-BASE_DIR = Path(__file__).parent
-OUTPUT_DIR = BASE_DIR / 'outputs'
-CSV_DIR = BASE_DIR / 'csv_files'
-REPORT_PATH = BASE_DIR / 'ds_report.pdf'
-
-# Load summary data
-with open(OUTPUT_DIR / 'analysis_summary.json', 'r') as f:
-    summary = json.load(f)
-
-# Load aggregated metrics
+import numpy as np
 import pandas as pd
-sentiment_agg = pd.read_csv(CSV_DIR / 'sentiment_aggregated_metrics.csv')
-profitability = pd.read_csv(CSV_DIR / 'profitability_by_sentiment.csv')
-risk_analysis = pd.read_csv(CSV_DIR / 'risk_analysis_by_sentiment.csv')
 
-# Create PDF
-doc = SimpleDocTemplate(str(REPORT_PATH), pagesize=letter,
-                        rightMargin=72, leftMargin=72,
-                        topMargin=72, bottomMargin=18)
-
-# Container for the 'Flowable' objects
-elements = []
+BASE_DIR = Path(__file__).parent
+DEFAULT_BATCH_SIZE = 64
 
-# Define styles
+# Styles (built once, shared by every report)
 styles = getSampleStyleSheet()
 title_style = ParagraphStyle(
     'CustomTitle',
@@ -63,57 +58,7 @@ body_style = ParagraphStyle(
     alignment=TA_JUSTIFY
 )
 
-# Title
-elements.append(Paragraph("Trading Behavior vs Market Sentiment Analysis", title_style))
-elements.append(Spacer(1, 0.2*inch))
-elements.append(Paragraph("Data Science Assignment - Web3 Trading Team", styles['Heading2']))
-elements.append(Spacer(1, 0.3*inch))
-
-# Executive Summary
-elements.append(Paragraph("Executive Summary", heading_style))
-elements.append(Paragraph(
-    f"This report presents a comprehensive analysis of the relationship between trader behavior and market sentiment. "
-    f"The analysis covers {summary['total_trades']:,} trades from {summary['date_range']['start']} to {summary['date_range']['end']}, "
-    f"correlated with Bitcoin Fear & Greed Index data. Key findings reveal significant differences in trading behavior "
-    f"across different market sentiment conditions, with Extreme Greed periods showing the highest profitability and "
-    f"Fear periods showing the highest trading volume.",
-    body_style
-))
-elements.append(Spacer(1, 0.2*inch))
-
-# Key Findings
-elements.append(Paragraph("Key Findings", heading_style))
-
-findings = [
-    f"<b>Highest Average PnL:</b> {summary['key_insights']['highest_avg_pnl_sentiment']} sentiment shows the best average profitability",
-    f"<b>Highest Trading Volume:</b> {summary['key_insights']['highest_volume_sentiment']} sentiment has the most trading activity",
-    f"<b>Highest Win Rate:</b> {summary['key_insights']['highest_win_rate_sentiment']} sentiment shows the best win rate",
-    f"<b>Sentiment Distribution:</b> Fear periods account for the most trades ({summary['sentiment_distribution']['Fear']:,}), "
-    f"followed by Greed ({summary['sentiment_distribution']['Greed']:,})"
-]
-
-for finding in findings:
-    elements.append(Paragraph(f"• {finding}", body_style))
-    elements.append(Spacer(1, 0.1*inch))
-
-elements.append(Spacer(1, 0.2*inch))
-
-# Detailed Analysis
-elements.append(Paragraph("Detailed Analysis by Sentiment", heading_style))
-
-# Create table from aggregated metrics
-table_data = [['Sentiment', 'Trades', 'Total Volume (USD)', 'Avg PnL (USD)', 'Win Rate']]
-for _, row in sentiment_agg.iterrows():
-    table_data.append([
-        row['classification'],
-        f"{int(row['total_trades']):,}",
-        f"${row['total_volume_usd']:,.0f}",
-        f"${row['avg_pnl']:.2f}",
-        f"{row['win_rate']:.1%}"
-    ])
-
-table = Table(table_data, colWidths=[1.5*inch, 1*inch, 1.5*inch, 1*inch, 1*inch])
-table.setStyle(TableStyle([
+metrics_table_style = TableStyle([
     ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
     ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
     ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
@@ -123,67 +68,319 @@ table.setStyle(TableStyle([
     ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
     ('GRID', (0, 0), (-1, -1), 1, colors.black),
     ('FONTSIZE', (0, 1), (-1, -1), 9),
-]))
-
-elements.append(table)
-elements.append(Spacer(1, 0.3*inch))
-
-# Insights by Sentiment
-elements.append(Paragraph("Insights by Sentiment Category", heading_style))
-
-insights_text = """
-<b>Extreme Greed:</b> Shows the highest average PnL ($67.89) and win rate (46.5%), indicating that traders perform best during extreme bullish sentiment. However, this also suggests potential market reversal risks.
-
-<b>Fear:</b> Has the highest trading volume ($483M) and most trades (61,837), suggesting traders are most active during uncertain market conditions. This could indicate both opportunity and risk.
-
-<b>Extreme Fear:</b> Shows the highest average absolute PnL ($94.01), indicating higher risk exposure. Traders should exercise caution and use conservative position sizing during these periods.
-
-<b>Greed:</b> Moderate trading activity with balanced risk/return profile. Average PnL of $42.74 with 38.5% win rate.
-
-<b>Neutral:</b> Most balanced trading behavior with moderate risk and returns. Average PnL of $34.31 with 40% win rate.
-"""
-
-elements.append(Paragraph(insights_text, body_style))
-elements.append(Spacer(1, 0.3*inch))
-
-# Trading Strategy Recommendations
-elements.append(Paragraph("Trading Strategy Recommendations", heading_style))
-
-recommendations = [
-    "<b>During Extreme Greed:</b> While profitability is highest, traders should be cautious of potential market reversals. Consider taking profits and reducing position sizes.",
-    "<b>During Fear:</b> High trading volume suggests opportunities exist, but increased volatility requires careful risk management. Focus on quality setups with proper stop-losses.",
-    "<b>During Extreme Fear:</b> Highest risk period - use conservative position sizing and wait for clear reversal signals before entering positions.",
-    "<b>During Neutral:</b> Balanced approach works best. Focus on consistent strategy execution without over-leveraging.",
-    "<b>During Greed:</b> Moderate bullish sentiment allows for balanced risk-taking. Maintain standard position sizing and risk management protocols."
-]
-
-for rec in recommendations:
-    elements.append(Paragraph(f"• {rec}", body_style))
-    elements.append(Spacer(1, 0.1*inch))
-
-elements.append(Spacer(1, 0.3*inch))
-
-# Methodology
-elements.append(Paragraph("Methodology", heading_style))
-elements.append(Paragraph(
-    "The analysis merged historical trading data from Hyperliquid with Bitcoin Fear & Greed Index data based on trade dates. "
-    "Key metrics calculated include: total trades, trading volume, average PnL, win rates, and risk metrics (absolute PnL, standard deviation). "
-    "The analysis covers all trades from May 2023 to May 2025, with sentiment classifications: Extreme Fear, Fear, Neutral, Greed, and Extreme Greed.",
-    body_style
-))
-
-elements.append(Spacer(1, 0.3*inch))
-
-# Conclusion
-elements.append(Paragraph("Conclusion", heading_style))
-elements.append(Paragraph(
-    "The analysis reveals clear patterns in trading behavior across different market sentiment conditions. Extreme Greed periods offer "
-    "the best profitability but require caution. Fear periods show the highest trading activity, suggesting both opportunity and risk. "
-    "Understanding these patterns can help traders develop more informed strategies that adapt to market sentiment conditions.",
-    body_style
-))
-
-# Build PDF
-doc.build(elements)
-print(f"PDF report generated: {REPORT_PATH}")
-
+])
+
+
+def _document(path):
+    return SimpleDocTemplate(str(path), pagesize=letter,
+                             rightMargin=72, leftMargin=72,
+                             topMargin=72, bottomMargin=18)
+
+
+def _distribution_finding(distribution):
+    """The sentiments with the most and second-most trades, from the summary's distribution."""
+    ranked = sorted(distribution.items(), key=lambda item: item[1], reverse=True)
+    if not ranked:
+        return "<b>Sentiment Distribution:</b> no trades fall on a day with a sentiment reading"
+    (first, first_count), rest = ranked[0], ranked[1:]
+    if not rest:
+        return f"<b>Sentiment Distribution:</b> all trades ({first_count:,}) fall in {first} periods"
+    second, second_count = rest[0]
+    return (f"<b>Sentiment Distribution:</b> {first} periods account for the most trades ({first_count:,}), "
+            f"followed by {second} ({second_count:,})")
+
+
+def _claim_support(sentiment_agg, tests, sentiment, metric, confidence, fmt):
+    """' (95% CI a-b; p = x against Y, the closest)' for a 'highest <metric>' finding."""
+    row = sentiment_agg[sentiment_agg['classification'] == sentiment]
+    text = []
+    if f'{metric}_ci_low' in sentiment_agg.columns and len(row):
+        text.append(f"{confidence:.0%} CI {fmt(row[f'{metric}_ci_low'].iloc[0])} to "
+                    f"{fmt(row[f'{metric}_ci_high'].iloc[0])}")
+    if tests is not None:
+        rivals = tests[(tests['metric'] == metric) & (tests['leader'] == sentiment)]
+        if len(rivals):
+            weakest = rivals.loc[rivals['p_value'].idxmax()]
+            text.append(f"permutation p = {weakest['p_value']:.3f} against {weakest['other']}, the closest")
+    return f" ({'; '.join(text)})" if text else ""
+
+
+def significance_elements(sentiment_agg, tests, confidence):
+    """The 'Statistical Significance' section: intervals per sentiment and the leader-vs-rest tests."""
+    elements = [Paragraph("Statistical Significance", heading_style), Paragraph(
+        f"Intervals are {confidence:.0%} percentile bootstrap intervals from resampling each sentiment's trades. "
+        f"p-values are two-sided permutation tests of the leading sentiment against each other one; a large "
+        f"p-value means the difference is within what random relabeling of the trades produces.",
+        body_style), Spacer(1, 0.15*inch)]
+
+    table_data = [['Sentiment', 'Avg PnL (USD)', f'{confidence:.0%} CI', 'Win Rate', f'{confidence:.0%} CI']]
+    for _, row in sentiment_agg.iterrows():
+        table_data.append([
+            row['classification'],
+            f"${row['avg_pnl']:.2f}",
+            f"${row['avg_pnl_ci_low']:.2f} to ${row['avg_pnl_ci_high']:.2f}",
+            f"{row['win_rate']:.1%}",
+            f"{row['win_rate_ci_low']:.1%} to {row['win_rate_ci_high']:.1%}",
+        ])
+    table = Table(table_data, colWidths=[1.3*inch, 1*inch, 1.5*inch, 0.9*inch, 1.4*inch])
+    table.setStyle(metrics_table_style)
+    elements += [table, Spacer(1, 0.2*inch)]
+
+    if tests is not None and len(tests):
+        table_data = [['Metric', 'Leader', 'Compared With', 'Difference', 'p-value']]
+        for row in tests.itertuples(index=False):
+            table_data.append([row.metric, row.leader, row.other, f"{row.difference:,.4f}", f"{row.p_value:.3f}"])
+        table = Table(table_data, colWidths=[1.4*inch, 1.2*inch, 1.2*inch, 1.1*inch, 0.8*inch])
+        table.setStyle(metrics_table_style)
+        elements += [table, Spacer(1, 0.3*inch)]
+    return elements
+
+
+def build_report(summary, sentiment_agg, report_path, tests=None, confidence=0.95):
+    """
+    Write the PDF report from the summary dict and the per-sentiment metrics
+    table. With `<metric>_ci_low/high` columns in the table (and optionally the
+    permutation `tests`), the findings carry their uncertainty and a
+    significance section is added.
+    """
+    # Create PDF
+    doc = _document(report_path)
+
+    # Container for the 'Flowable' objects
+    elements = []
+
+    # Title
+    elements.append(Paragraph("Trading Behavior vs Market Sentiment Analysis", title_style))
+    elements.append(Spacer(1, 0.2*inch))
+    elements.append(Paragraph("Data Science Assignment - Web3 Trading Team", styles['Heading2']))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Executive Summary
+    elements.append(Paragraph("Executive Summary", heading_style))
+    elements.append(Paragraph(
+        f"This report presents a comprehensive analysis of the relationship between trader behavior and market sentiment. "
+        f"The analysis covers {summary['total_trades']:,} trades from {summary['date_range']['start']} to {summary['date_range']['end']}, "
+        f"correlated with Bitcoin Fear & Greed Index data. Key findings reveal significant differences in trading behavior "
+        f"across different market sentiment conditions, with Extreme Greed periods showing the highest profitability and "
+        f"Fear periods showing the highest trading volume.",
+        body_style
+    ))
+    elements.append(Spacer(1, 0.2*inch))
+
+    # Key Findings
+    elements.append(Paragraph("Key Findings", heading_style))
+
+    insights = summary['key_insights']
+    pnl_support = _claim_support(sentiment_agg, tests, insights['highest_avg_pnl_sentiment'], 'avg_pnl',
+                                 confidence, lambda v: f"${v:.2f}")
+    win_support = _claim_support(sentiment_agg, tests, insights['highest_win_rate_sentiment'], 'win_rate',
+                                 confidence, lambda v: f"{v:.1%}")
+    findings = [
+        f"<b>Highest Average PnL:</b> {insights['highest_avg_pnl_sentiment']} sentiment shows the best average profitability{pnl_support}",
+        f"<b>Highest Trading Volume:</b> {insights['highest_volume_sentiment']} sentiment has the most trading activity",
+        f"<b>Highest Win Rate:</b> {insights['highest_win_rate_sentiment']} sentiment shows the best win rate{win_support}",
+        _distribution_finding(summary['sentiment_distribution'])
+    ]
+
+    for finding in findings:
+        elements.append(Paragraph(f"• {finding}", body_style))
+        elements.append(Spacer(1, 0.1*inch))
+
+    elements.append(Spacer(1, 0.2*inch))
+
+    # Detailed Analysis
+    elements.append(Paragraph("Detailed Analysis by Sentiment", heading_style))
+
+    # Create table from aggregated metrics
+    table_data = [['Sentiment', 'Trades', 'Total Volume (USD)', 'Avg PnL (USD)', 'Win Rate']]
+    for _, row in sentiment_agg.iterrows():
+        table_data.append([
+            row['classification'],
+            f"{int(row['total_trades']):,}",
+            f"${row['total_volume_usd']:,.0f}",
+            f"${row['avg_pnl']:.2f}",
+            f"{row['win_rate']:.1%}"
+        ])
+
+    table = Table(table_data, colWidths=[1.5*inch, 1*inch, 1.5*inch, 1*inch, 1*inch])
+    table.setStyle(metrics_table_style)
+
+    elements.append(table)
+    elements.append(Spacer(1, 0.3*inch))
+
+    if 'avg_pnl_ci_low' in sentiment_agg.columns:
+        elements.extend(significance_elements(sentiment_agg, tests, confidence))
+
+    # Insights by Sentiment
+    elements.append(Paragraph("Insights by Sentiment Category", heading_style))
+
+    insights_text = """
+    <b>Extreme Greed:</b> Shows the highest average PnL ($67.89) and win rate (46.5%), indicating that traders perform best during extreme bullish sentiment. However, this also suggests potential market reversal risks.
+
+    <b>Fear:</b> Has the highest trading volume ($483M) and most trades (61,837), suggesting traders are most active during uncertain market conditions. This could indicate both opportunity and risk.
+
+    <b>Extreme Fear:</b> Shows the highest average absolute PnL ($94.01), indicating higher risk exposure. Traders should exercise caution and use conservative position sizing during these periods.
+
+    <b>Greed:</b> Moderate trading activity with balanced risk/return profile. Average PnL of $42.74 with 38.5% win rate.
+
+    <b>Neutral:</b> Most balanced trading behavior with moderate risk and returns. Average PnL of $34.31 with 40% win rate.
+    """
+
+    elements.append(Paragraph(insights_text, body_style))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Trading Strategy Recommendations
+    elements.append(Paragraph("Trading Strategy Recommendations", heading_style))
+
+    recommendations = [
+        "<b>During Extreme Greed:</b> While profitability is highest, traders should be cautious of potential market reversals. Consider taking profits and reducing position sizes.",
+        "<b>During Fear:</b> High trading volume suggests opportunities exist, but increased volatility requires careful risk management. Focus on quality setups with proper stop-losses.",
+        "<b>During Extreme Fear:</b> Highest risk period - use conservative position sizing and wait for clear reversal signals before entering positions.",
+        "<b>During Neutral:</b> Balanced approach works best. Focus on consistent strategy execution without over-leveraging.",
+        "<b>During Greed:</b> Moderate bullish sentiment allows for balanced risk-taking. Maintain standard position sizing and risk management protocols."
+    ]
+
+    for rec in recommendations:
+        elements.append(Paragraph(f"• {rec}", body_style))
+        elements.append(Spacer(1, 0.1*inch))
+
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Methodology
+    elements.append(Paragraph("Methodology", heading_style))
+    elements.append(Paragraph(
+        "The analysis merged historical trading data from Hyperliquid with Bitcoin Fear & Greed Index data based on trade dates. "
+        "Key metrics calculated include: total trades, trading volume, average PnL, win rates, and risk metrics (absolute PnL, standard deviation). "
+        "The analysis covers all trades from May 2023 to May 2025, with sentiment classifications: Extreme Fear, Fear, Neutral, Greed, and Extreme Greed.",
+        body_style
+    ))
+
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Conclusion
+    elements.append(Paragraph("Conclusion", heading_style))
+    elements.append(Paragraph(
+        "The analysis reveals clear patterns in trading behavior across different market sentiment conditions. Extreme Greed periods offer "
+        "the best profitability but require caution. Fear periods show the highest trading activity, suggesting both opportunity and risk. "
+        "Understanding these patterns can help traders develop more informed strategies that adapt to market sentiment conditions.",
+        body_style
+    ))
+
+    # Build PDF
+    doc.build(elements)
+    return Path(report_path)
+
+
+# ---------- Per-account / per-coin reports ----------
+
+def entity_file_name(entity):
+    return re.sub(r'[^\w.@-]', '_', str(entity)) + '.pdf'
+
+
+def build_entity_report(kind, entity, breakdown, path):
+    """One PDF: `entity`'s (an account or a coin) metrics by sentiment."""
+    doc = _document(path)
+    trades = int(breakdown['trade_count'].sum())
+    total_pnl = breakdown['total_pnl'].sum()
+    wins = breakdown['wins'].sum()
+    best = breakdown.loc[breakdown['avg_pnl'].idxmax()]
+    busiest = breakdown.loc[breakdown['trade_count'].idxmax()]
+
+    elements = [
+        Paragraph(f"Sentiment Breakdown: {kind.title()} {entity}", heading_style),
+        Paragraph(
+            f"{trades:,} trades with a total volume of ${breakdown['total_volume'].sum():,.0f}, "
+            f"a total PnL of ${total_pnl:,.2f} and a win rate of {wins / max(trades, 1):.1%}. "
+            f"Most trades were placed during {busiest['classification']} ({int(busiest['trade_count']):,}); "
+            f"the best average PnL came during {best['classification']} (${best['avg_pnl']:.2f}).",
+            body_style
+        ),
+        Spacer(1, 0.2*inch),
+    ]
+
+    table_data = [['Sentiment', 'Trades', 'Volume (USD)', 'Total PnL', 'Avg PnL', 'Win Rate', 'Fees']]
+    for row in breakdown.itertuples(index=False):
+        table_data.append([
+            row.classification,
+            f"{int(row.trade_count):,}",
+            f"${row.total_volume:,.0f}",
+            f"${row.total_pnl:,.2f}",
+            f"${row.avg_pnl:.2f}",
+            f"{row.win_rate:.1%}",
+            f"${row.total_fees:,.2f}",
+        ])
+    table = Table(table_data, colWidths=[1.2*inch, 0.7*inch, 1.1*inch, 1*inch, 0.8*inch, 0.7*inch, 0.8*inch])
+    table.setStyle(metrics_table_style)
+    elements.append(table)
+    doc.build(elements)
+
+
+def _entity_batch(task):
+    """Worker: the reports for one batch of consecutive entities."""
+    kind, key, frame, bounds, output_dir = task
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        entity = frame[key].iat[start]
+        build_entity_report(kind, entity, frame.iloc[start:end], Path(output_dir) / entity_file_name(entity))
+    return len(bounds) - 1
+
+
+def build_entity_reports(breakdown, kind, key, output_dir, workers=None, batch_size=None, limit=None):
+    """
+    Write one report per distinct `key` value of `breakdown` into `output_dir`.
+
+    `breakdown` is sorted by `key` (as `sentiment_breakdown` returns it), so
+    entities are cut out of it in one pass over the group boundaries. Batches
+    of `batch_size` entities go to `workers` processes (default: one per CPU;
+    1 builds them here). Returns `{reports, seconds, reports_per_sec}`.
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    values = breakdown[key].to_numpy()
+    bounds = np.flatnonzero(np.r_[True, values[1:] != values[:-1], True])
+    if limit is not None:
+        bounds = bounds[:limit + 1]
+
+    tasks = []
+    for i in range(0, len(bounds) - 1, batch_size):
+        edges = bounds[i:i + batch_size + 1]
+        frame = breakdown.iloc[edges[0]:edges[-1]].reset_index(drop=True)
+        tasks.append((kind, key, frame, edges - edges[0], str(output_dir)))
+
+    t0 = time.perf_counter()
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            reports = sum(pool.map(_entity_batch, tasks))
+    else:
+        reports = sum(_entity_batch(task) for task in tasks)
+    seconds = time.perf_counter() - t0
+    return {'reports': reports, 'seconds': round(seconds, 3),
+            'reports_per_sec': round(reports / seconds, 1) if seconds > 0 else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the PDF report from the analysis outputs')
+    parser.add_argument('--output-dir', type=Path, default=BASE_DIR / 'outputs',
+                        help='charts and analysis_summary.json written by comprehensive_analysis.py')
+    parser.add_argument('--csv-dir', type=Path, default=BASE_DIR / 'csv_files',
+                        help='analysis CSVs written by comprehensive_analysis.py')
+    parser.add_argument('--report', type=Path, default=BASE_DIR / 'ds_report.pdf',
+                        help='path of the generated PDF')
+    parser.add_argument('--confidence', type=float, default=0.95,
+                        help='confidence level of the intervals in the CSV (from --significance)')
+    args = parser.parse_args()
+
+    # Load summary data and aggregated metrics
+    with open(args.output_dir / 'analysis_summary.json', 'r') as f:
+        summary = json.load(f)
+    sentiment_agg = pd.read_csv(args.csv_dir / 'sentiment_aggregated_metrics.csv')
+    tests_path = args.csv_dir / 'significance_tests.csv'
+    tests = pd.read_csv(tests_path) if tests_path.exists() and 'avg_pnl_ci_low' in sentiment_agg.columns else None
+
+    build_report(summary, sentiment_agg, args.report, tests=tests, confidence=args.confidence)
+    print(f"PDF report generated: {args.report}")
+
+
+if __name__ == '__main__':
+    main()
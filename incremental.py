@@ -0,0 +1,277 @@
+"""
+Incremental append mode.
+
+New fills are appended to `historical_data.csv` daily. Instead of recomputing
+the whole history, this mode keeps per-day partial aggregates on disk
+(`aggregators.GroupedStats` keyed by `day`, plus per-day `ValueSpill`s for the
+order statistics) together with a high-water mark on `ts`. Each run folds in
+only the trades added since the last run, then rolls the day partials up to
+the seven analysis tables and `analysis_summary.json`.
+
+Sentiment is applied at roll-up time, not when trades are folded: a late or
+revised fear & greed reading moves only the affected days' partials to their
+new class, and no trade has to be re-read.
+
+New trades are found by resuming the CSV at the byte offset where the last run
+stopped, after checking that the bytes before it are unchanged. If the file was
+rewritten instead of appended to, it is rescanned and only rows with `ts` past
+the watermark are folded.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregation import (ACCOUNT_MEASURES, DEFAULT_TOP_K, FLOW_MEASURES, QUANTILES, SENTIMENT_MEASURES,
+                         build_tables)
+from aggregators import GroupedStats, ValueSpill
+from data_cache import FEAR_GREED_CSV, HISTORICAL_CSV, clean_fear_greed, clean_historical
+from metrics import add_derived_metrics
+from schema import MISSING_DAY, apply_sentiment_schema, epoch_days
+from sentiment_join import SentimentTable
+from streaming import DEFAULT_CHUNKSIZE, summary_payload
+
+STATE_VERSION = 2
+MANIFEST_NAME = 'state.json'
+
+# Bytes before the resume offset that must be unchanged for an append-only resume
+TAIL_CHECK_BYTES = 4096
+
+# Day-grain partials: name -> (key columns, measures)
+DAY_GROUPINGS = {
+    'sentiment': (['day'], SENTIMENT_MEASURES),
+    'side': (['day', 'is_buy'], FLOW_MEASURES),
+    'accounts': (['day', 'Account'], ACCOUNT_MEASURES),
+}
+
+
+def _tail_digest(path, offset):
+    with open(path, 'rb') as f:
+        f.seek(max(offset - TAIL_CHECK_BYTES, 0))
+        return hashlib.sha256(f.read(offset - f.tell())).hexdigest()
+
+
+def _header(path):
+    with open(path, newline='') as f:
+        return next(csv.reader(f), [])
+
+
+class IncrementalState:
+    """Persisted day-grain partial aggregates, spills and the `ts` watermark."""
+
+    def __init__(self, state_dir):
+        self.state_dir = Path(state_dir)
+        self.stats = {name: GroupedStats(names, measures) for name, (names, measures) in DAY_GROUPINGS.items()}
+        self.spills = {m: ValueSpill(self.state_dir / 'spill', f'q{i}') for i, m in enumerate(QUANTILES)}
+        self.generation = 0
+        self.watermark = None
+        self.offset = 0
+        self.tail_digest = None
+        self.header = None
+        self.has_tokens = True
+        self.sentiment = {}
+
+    @classmethod
+    def load(cls, state_dir):
+        """The saved state, or a fresh one when there is none (or it is from another version)."""
+        state = cls(state_dir)
+        manifest_path = state.state_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            return state
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != STATE_VERSION:
+            return state
+
+        with np.load(state.state_dir / f"aggregates.{manifest['generation']}.npz") as arrays:
+            state.stats = {
+                name: GroupedStats.from_arrays(names, measures, arrays, name)
+                for name, (names, measures) in DAY_GROUPINGS.items()
+            }
+        for measure, spill in state.spills.items():
+            spill.restore(manifest['spill_counts'][measure])
+        state.generation = manifest['generation']
+        state.watermark = pd.Timestamp(manifest['watermark']) if manifest['watermark'] else None
+        state.offset = manifest['offset']
+        state.tail_digest = manifest['tail_digest']
+        state.header = manifest['header']
+        state.has_tokens = manifest['has_tokens']
+        state.sentiment = {int(day): label for day, label in manifest['sentiment'].items()}
+        return state
+
+    def save(self):
+        """Write a new generation of the aggregates, then switch the manifest to it."""
+        self.generation += 1
+        arrays = {}
+        for name, stats in self.stats.items():
+            arrays.update(stats.to_arrays(name))
+        aggregates = self.state_dir / f'aggregates.{self.generation}.npz'
+        np.savez(aggregates, **arrays)
+
+        manifest = {
+            'version': STATE_VERSION,
+            'generation': self.generation,
+            'watermark': self.watermark.isoformat() if self.watermark is not None else None,
+            'offset': self.offset,
+            'tail_digest': self.tail_digest,
+            'header': self.header,
+            'has_tokens': self.has_tokens,
+            'spill_counts': {m: {str(g): n for g, n in spill.counts.items()} for m, spill in self.spills.items()},
+            'sentiment': {str(day): label for day, label in self.sentiment.items()},
+        }
+        staged = self.state_dir / (MANIFEST_NAME + '.tmp')
+        with open(staged, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(staged, self.state_dir / MANIFEST_NAME)
+        for old in self.state_dir.glob('aggregates.*.npz'):
+            if old != aggregates:
+                old.unlink()
+
+    # ---------- Folding new trades ----------
+
+    def new_trades(self, csv_path, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Yield cleaned chunks of the trades added since the last run.
+
+        Resumes at the saved byte offset when the file was only appended to;
+        otherwise rescans it and keeps rows past the watermark.
+        """
+        header = _header(csv_path)
+        appended = (
+            self.offset > 0 and header == self.header
+            and Path(csv_path).stat().st_size >= self.offset
+            and _tail_digest(csv_path, self.offset) == self.tail_digest
+        )
+        if self.offset > 0 and not appended:
+            print(f"  {csv_path} was rewritten; rescanning for trades after {self.watermark}")
+
+        with open(csv_path, 'rb') as f:
+            if appended:
+                f.seek(self.offset)
+                reader = pd.read_csv(f, header=None, names=header, chunksize=chunksize, low_memory=False)
+            else:
+                reader = pd.read_csv(f, chunksize=chunksize, low_memory=False)
+            for chunk in reader:
+                chunk = clean_historical(chunk)
+                if not appended and self.watermark is not None:
+                    chunk = chunk[chunk['ts'] > self.watermark].copy()
+                if len(chunk):
+                    yield chunk
+            self.offset = f.tell()
+        self.header = header
+        self.tail_digest = _tail_digest(csv_path, self.offset)
+
+    def fold(self, trades):
+        """Fold one cleaned chunk of new trades into the day partials."""
+        trades['day'] = epoch_days(trades['ts'])
+        trades = add_derived_metrics(trades)
+        trades['account_seen'] = np.where(trades['Account'].notna(), 1.0, np.nan)
+        if 'Size Tokens' not in trades.columns:
+            self.has_tokens = False
+            trades['Size Tokens'] = np.nan
+
+        codes, mask = self.stats['sentiment'].update(trades)
+        for measure, spill in self.spills.items():
+            spill.append(codes, trades[measure].to_numpy(dtype=np.float64, na_value=np.nan)[mask])
+        self.stats['side'].update(trades)
+        self.stats['accounts'].update(trades)
+
+        latest = trades['ts'].max()
+        if pd.notna(latest) and (self.watermark is None or latest > self.watermark):
+            self.watermark = latest
+
+    # ---------- Roll-up ----------
+
+    def _classify(self, sentiment_table, days, lag):
+        codes, _ = sentiment_table.lookup(np.asarray(days, dtype=np.int64), lag)
+        return pd.Categorical.from_codes(codes, categories=sentiment_table.categories)
+
+    def revised_days(self, sentiment_table, lag=0):
+        """Trade days whose sentiment differs from the last roll-up (and the current labels)."""
+        days = self.stats['sentiment'].keys()['day'].to_numpy(dtype=np.int64)
+        labels = pd.Series(self._classify(sentiment_table, days, lag)).astype(object).where(lambda s: s.notna(), None)
+        current = dict(zip(days.tolist(), labels.tolist()))
+        revised = sorted(day for day, label in current.items()
+                         if day in self.sentiment and self.sentiment[day] != label)
+        return revised, current
+
+    def tables(self, sentiment_table, lag=0, top_k=DEFAULT_TOP_K, rank_by='pnl'):
+        """The seven analysis tables and the summary, with sentiment applied per day."""
+        day_keys = self.stats['sentiment'].keys()
+        days = day_keys['day'].to_numpy(dtype=np.int64)
+        classification = self._classify(sentiment_table, days, lag)
+        sentiment, day_class = self.stats['sentiment'].rollup(pd.DataFrame({'classification': classification}))
+
+        months = pd.Series(pd.to_datetime(np.where(days == MISSING_DAY, 0, days), unit='D'))
+        months = months.where(days != MISSING_DAY).dt.to_period('M')
+        monthly, _ = self.stats['sentiment'].rollup(pd.DataFrame({'year_month': months, 'classification': classification}))
+
+        coarse = {}
+        for name in ('side', 'accounts'):
+            keys = self.stats[name].keys()
+            keys.insert(0, 'classification', self._classify(sentiment_table, keys.pop('day'), lag))
+            coarse[name], _ = self.stats[name].rollup(keys)
+
+        quantiles = {}
+        members = [np.flatnonzero(day_class == gid) for gid in range(len(sentiment.index))]
+        for measure, qs in QUANTILES.items():
+            values = np.array([self.spills[measure].quantiles(group, qs) for group in members])
+            values = values.reshape(len(members), len(qs))
+            quantiles[measure] = {q: values[:, i] for i, q in enumerate(qs)}
+
+        tables = build_tables(sentiment.table(), coarse['side'].table(), monthly.table(),
+                              coarse['accounts'].table(), quantiles, has_tokens=self.has_tokens,
+                              top_k=top_k, rank_by=rank_by)
+
+        valid = days[(days != MISSING_DAY) & (self.stats['sentiment'].rows > 0)]
+        summary = summary_payload(sentiment, self.stats['sentiment'].rows.sum(),
+                                  valid.min() if len(valid) else None,
+                                  valid.max() if len(valid) else None,
+                                  tables['sentiment_aggregated_metrics'])
+        return tables, summary
+
+
+def run_incremental(base_dir, csv_dir, output_dir, state_dir, chunksize=DEFAULT_CHUNKSIZE, lag=0, reset=False,
+                    top_k=DEFAULT_TOP_K, rank_by='pnl'):
+    """Fold trades added since the last run and rewrite the seven CSVs and the summary."""
+    base_dir, csv_dir, output_dir, state_dir = Path(base_dir), Path(csv_dir), Path(output_dir), Path(state_dir)
+    if reset:
+        shutil.rmtree(state_dir, ignore_errors=True)
+    state_dir.mkdir(parents=True, exist_ok=True)
+
+    state = IncrementalState.load(state_dir)
+    print(f"Watermark: {state.watermark if state.watermark is not None else 'none (full build)'}")
+    previous = state.watermark
+    folded = late = 0
+    for trades in state.new_trades(base_dir / HISTORICAL_CSV, chunksize):
+        if previous is not None:
+            late += int((trades['ts'] <= previous).sum())
+        state.fold(trades)
+        folded += len(trades)
+        print(f"  {folded} new trades folded")
+    if late:
+        print(f"  {late} appended trades are at or before the previous watermark (late fills)")
+    print(f"New watermark: {state.watermark}")
+
+    fear_greed = apply_sentiment_schema(clean_fear_greed(pd.read_csv(base_dir / FEAR_GREED_CSV)))
+    sentiment_table = SentimentTable(fear_greed)
+    revised, state.sentiment = state.revised_days(sentiment_table, lag)
+    if revised:
+        print(f"  sentiment revised for {len(revised)} trade days; re-bucketing their partials")
+
+    tables, summary = state.tables(sentiment_table, lag, top_k, rank_by)
+    for name, table in tables.items():
+        print(f"\n=== {name} ===")
+        print(table)
+        table.to_csv(csv_dir / f'{name}.csv', index=False)
+    with open(output_dir / 'analysis_summary.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    state.save()
+    return tables, summary
@@ -0,0 +1,135 @@
+"""
+Trade outcomes conditioned on lagged and smoothed sentiment.
+
+The main analysis relates each trade to its own day's reading. Here PnL, win
+rate and volume are conditioned, for many lags and windows at once, on:
+
+- `lag`: the classification of the reading L days before the trade's day;
+- `rolling_mean`: the classification band of the mean index value over the W
+  days ending on the trade's day;
+- `change`: whether the index value rose, fell or stayed flat over those W
+  days.
+
+Nothing is re-joined per lag. The trades are rolled up to additive moments
+per trade day (from the cube), every (feature, day) pair gets its bucket by
+array arithmetic on the dense day-indexed `value` series
+(`sentiment_join.SentimentTable`), and one `Moments.rollup` of the day
+moments, tiled across the features, yields every (feature, lag or window,
+sentiment) row. Totals are exact, as in the main tables.
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregators import GroupTable
+from schema import MISSING_DAY
+
+DEFAULT_MAX_LAG = 30
+DEFAULT_WINDOWS = [3, 7, 14, 30]
+
+CHANGE_BUCKETS = ['falling', 'flat', 'rising']
+
+LAG_MEASURES = ['account_seen', 'Size USD', 'Closed PnL', 'win']
+
+
+def value_bands(fear_greed):
+    """Classifications in index-value order, with the lowest value published for each."""
+    lowest = fear_greed.groupby('classification', observed=True)['value'].min().sort_values()
+    return list(lowest.index.astype(str)), lowest.to_numpy(dtype=np.float64)
+
+
+def _shifted(table, slots, offsets):
+    """
+    `table[row, slot - offset]` for every (offset, slot), NaN outside the
+    table; a 1-D `table` is shared by all offsets, a 2-D one has a row per offset.
+    """
+    table = np.atleast_2d(table)
+    index = slots[None, :] - offsets[:, None]
+    inside = (index >= 0) & (index < table.shape[1])
+    rows = np.broadcast_to(np.arange(len(offsets))[:, None] if len(table) > 1 else 0, index.shape)
+    out = np.full(index.shape, np.nan)
+    out[inside] = table[rows[inside], index[inside]]
+    return out
+
+
+def _window_means(values, windows):
+    """Mean of the readings present in the `w` slots ending at each slot: `(windows, slots)`."""
+    present = ~np.isnan(values)
+    totals = np.concatenate([[0.0], np.cumsum(np.where(present, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(present)])
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends[None, :] - windows[:, None], 0)
+    n = counts[ends][None, :] - counts[starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, (totals[ends][None, :] - totals[starts]) / n, np.nan)
+
+
+def feature_buckets(sentiment, days, labels, lows, lags, windows):
+    """
+    Bucket of every (feature, trade day).
+
+    Returns a `(features, days)` array of row ids (-1 where there is no
+    reading) and the row keys: `feature`, `days` (the lag or window) and
+    `sentiment` (a classification or a `CHANGE_BUCKETS` direction).
+    """
+    lags, windows = np.asarray(lags, dtype=np.int64), np.asarray(windows, dtype=np.int64)
+    slots = np.asarray(days, dtype=np.int64) - sentiment.first_day
+    same_day = np.zeros(len(windows), dtype=np.int64)
+
+    # Classification `lag` days back, as its position in `labels`
+    band = pd.Index(labels).get_indexer(sentiment.categories.astype(str))
+    codes = np.where(sentiment.codes >= 0, band[np.maximum(sentiment.codes, 0)], -1)
+    lagged = _shifted(np.where(codes >= 0, codes, np.nan), slots, lags)
+
+    # Band of the window's mean value (the band whose lowest value it reaches)
+    means = _shifted(_window_means(sentiment.values, windows), slots, same_day)
+    banded = np.searchsorted(lows, means, side='right') - 1.0
+    banded[np.isnan(means) | (banded < 0)] = np.nan
+
+    # Direction of the change from the reading `w` days back: 0 / 1 / 2
+    change = _shifted(sentiment.values, slots, same_day) - _shifted(sentiment.values, slots, windows)
+    direction = np.sign(change) + 1
+
+    keys = ([('lag', lag, label) for lag in lags for label in labels]
+            + [('rolling_mean', w, label) for w in windows for label in labels]
+            + [('change', w, bucket) for w in windows for bucket in CHANGE_BUCKETS])
+    widths = [len(labels)] * (len(lags) + len(windows)) + [len(CHANGE_BUCKETS)] * len(windows)
+    first = np.concatenate([[0], np.cumsum(widths)[:-1]]).astype(np.int64)
+    buckets = np.vstack([lagged, banded, direction])
+    ids = np.where(np.isnan(buckets), -1, first[:, None] + np.nan_to_num(buckets).astype(np.int64))
+    return ids, pd.DataFrame(keys, columns=['feature', 'days', 'sentiment'])
+
+
+def lagged_sentiment(cube, sentiment, fear_greed, max_lag=DEFAULT_MAX_LAG, windows=DEFAULT_WINDOWS):
+    """
+    The lag x sentiment table: trades, volume, PnL and win rate per
+    (feature, days, sentiment), for lags `0..max_lag` and rolling `windows`.
+    """
+    days = cube.table(['day'], LAG_MEASURES)
+    keep = days.keys['day'].to_numpy() != MISSING_DAY
+    day_keys = days.keys['day'].to_numpy()[keep]
+    labels, lows = value_bands(fear_greed)
+    ids, keys = feature_buckets(sentiment, day_keys, labels, lows, range(max_lag + 1), windows)
+
+    # Every day's moments once per feature, rolled up into the feature rows in one pass
+    tiled = np.tile(np.flatnonzero(keep), len(ids))
+    lookup = ids.reshape(-1)
+    size = len(keys)
+    rows = np.bincount(lookup[lookup >= 0], weights=days.rows[tiled][lookup >= 0], minlength=size)
+    table = GroupTable(keys, rows.astype(np.int64),
+                       {m: days.moments[m].take(tiled).rollup(lookup, size, extrema=False) for m in LAG_MEASURES})
+
+    m = table.moments
+    size_usd, pnl = m['Size USD'], m['Closed PnL']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        win_rate = m['win'].sum() / table.rows
+    frame = keys.assign(
+        total_trades=m['account_seen'].count,
+        total_volume_usd=size_usd.sum(),
+        avg_trade_size_usd=size_usd.avg(),
+        total_pnl=pnl.sum(),
+        avg_pnl=pnl.avg(),
+        std_pnl=pnl.std(),
+        win_rate=win_rate,
+    ).round(2)
+    return frame[table.rows > 0].reset_index(drop=True)
@@ -0,0 +1,22 @@
+"""
+Derived per-trade metrics shared by the in-memory and streaming analysis paths.
+"""
+
+import numpy as np
+
+
+def add_derived_metrics(merged):
+    """Add win/loss flags, trade side flags and the risk proxies (in place)."""
+    merged['win'] = merged['Closed PnL'] > 0
+    merged['loss'] = merged['Closed PnL'] < 0
+    merged['is_buy'] = merged['Side'].str.upper() == 'BUY' if 'Side' in merged.columns else False
+    merged['is_sell'] = merged['Side'].str.upper() == 'SELL' if 'Side' in merged.columns else False
+
+    # Calculate risk metrics (using absolute PnL as proxy for risk)
+    merged['abs_pnl'] = merged['Closed PnL'].abs()
+    merged['risk_reward_ratio'] = np.where(
+        merged['Closed PnL'] != 0,
+        merged['abs_pnl'] / merged['Size USD'].abs(),
+        np.nan
+    )
+    return merged
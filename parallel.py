@@ -0,0 +1,132 @@
+"""
+Multi-core partitioned execution: the aggregate cube from `workers` processes.
+
+The trades are split into `workers` partitions by calendar month or by
+account, and each partition is aggregated in its own process. Workers read
+their rows straight from the memory-mapped columnar cache (`data_cache`), so
+only the cache path and the partition number are sent to them, never the
+trade data. Each worker returns small mergeable partials:
+
+- the partition's `Cube` cells (counts, sums, means, M2 per measure);
+- per-sentiment sorted runs of the quantile measures, written as .npy files.
+
+The parent merges the cells (`Cube.merge`: Chan updates for means and
+variances) and takes exact medians, quartiles and the PnL histograms from the
+memory-mapped runs (`run_quantiles`, `run_histogram`). The tables, summary and
+charts are then roll-ups of the merged cube, so the parent never holds the
+trades.
+"""
+
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import pandas as pd
+
+from aggregation import DEFAULT_TOP_K, QUANTILES, FusedAggregator
+from aggregators import group_sorted_keys, run_histogram, run_quantiles
+from charts import SENTIMENT_ORDER, histogram_frame
+from cube import Cube
+from data_cache import cache_specs, columnar_dir, read_frame
+from metrics import add_derived_metrics
+from schema import CATEGORICAL_COLUMNS, apply_trade_schema
+from sentiment_join import SentimentTable
+
+PARTITION_KEYS = ('month', 'account')
+
+# Trade columns the cube reads; high-cardinality ids (hashes, order ids) are
+# never loaded by the workers
+WORKER_COLUMNS = ['Account', 'Coin', 'Side', 'ts', 'Closed PnL', 'Size USD', 'Size Tokens', 'Fee']
+
+PNL_BINS = 50
+
+
+def partition_rows(cache_dir, by, partitions):
+    """
+    Row numbers grouped by partition, and each partition's bounds in them.
+
+    Computed once from the memory-mapped key column; workers slice their rows
+    out of the saved array instead of each rescanning the key.
+    """
+    specs = {spec['name']: spec for spec in cache_specs(cache_dir)['historical']}
+    directory = columnar_dir(cache_dir) / 'historical'
+    if by == 'month':
+        ts = np.load(directory / specs['ts']['file'], mmap_mode='r').view('datetime64[ns]')
+        key = ts.astype('datetime64[M]').view(np.int64)
+    elif by == 'account':
+        # Codes of the sorted account uniques; a stable hash of the account
+        key = np.load(directory / specs['Account']['file'], mmap_mode='r').astype(np.int64)
+    else:
+        raise ValueError(f"Unknown partition key: {by!r}")
+    part = key % partitions
+    order = np.argsort(part, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(part, minlength=partitions))])
+    return order, bounds
+
+
+def _aggregate_partition(task):
+    """Worker: the cube cells and sorted quantile runs of one partition of the cached trades."""
+    cache_dir, fear_greed, part, start, end, run_dir, join_mode, lag, float32 = task
+    specs = cache_specs(cache_dir)['historical']
+    rows = np.load(Path(run_dir) / 'rows.npy', mmap_mode='r')[start:end]
+    trades = read_frame(columnar_dir(cache_dir) / 'historical', specs, categorical=CATEGORICAL_COLUMNS,
+                        columns=WORKER_COLUMNS, rows=rows)
+    trades = apply_trade_schema(trades, float32=float32)
+    merged = SentimentTable(fear_greed).join(trades, mode=join_mode, lag=lag)
+    merged = add_derived_metrics(merged)
+
+    engine = FusedAggregator(merged)
+    codes, valid, keys = engine.group_codes(['classification'])
+    labels = [str(label) for label in keys['classification']]
+    runs = {}
+    for i, measure in enumerate(QUANTILES):
+        sorted_keys = group_sorted_keys(codes, engine.values(measure)[valid], len(labels))
+        runs[measure] = {}
+        for label, keys in zip(labels, sorted_keys):
+            path = Path(run_dir) / f'q{i}.{part}.{label}.npy'
+            np.save(path, keys)
+            runs[measure][label] = path
+    return Cube.build(merged, order_statistics=False), runs
+
+
+def parallel_cube(cache_dir, fear_greed, workers, by='month', join_mode='exact', lag=0, float32=False,
+                  run_root=None):
+    """The aggregate cube of the cached trades from `workers` processes, one partition each."""
+    if by not in PARTITION_KEYS:
+        raise ValueError(f"Unknown partition key: {by!r}")
+    run_dir = tempfile.mkdtemp(prefix='runs-', dir=run_root)
+    try:
+        order, bounds = partition_rows(cache_dir, by, workers)
+        np.save(Path(run_dir) / 'rows.npy', order)
+        tasks = [(str(cache_dir), fear_greed, part, bounds[part], bounds[part + 1], run_dir, join_mode, lag, float32)
+                 for part in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_aggregate_partition, tasks))
+        cube = Cube.merge([part for part, _ in results])
+
+        def label_runs(measure, label):
+            return [np.load(runs[measure][label], mmap_mode='r') for _, runs in results if label in runs[measure]]
+
+        # Exact order statistics across partitions from the sorted runs
+        labels = cube.table(['classification'], []).keys['classification']
+        for measure, qs in QUANTILES.items():
+            values = np.array([run_quantiles(label_runs(measure, str(label)), qs) for label in labels])
+            values = values.reshape(len(labels), len(qs))
+            cube.quantiles[measure] = {q: pd.Series(values[:, i], index=labels) for i, q in enumerate(qs)}
+        present = set(labels.astype(str))
+        cube.histograms = histogram_frame([(sent, *run_histogram(label_runs('Closed PnL', sent), PNL_BINS))
+                                           for sent in SENTIMENT_ORDER if sent in present])
+        return cube
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def parallel_tables(cache_dir, fear_greed, workers, by='month', join_mode='exact', lag=0,
+                    float32=False, run_root=None, top_k=DEFAULT_TOP_K, rank_by='pnl'):
+    """The seven analysis tables from `workers` processes (roll-ups of `parallel_cube`)."""
+    cube = parallel_cube(cache_dir, fear_greed, workers, by=by, join_mode=join_mode, lag=lag, float32=float32,
+                         run_root=run_root)
+    return cube.tables(top_k=top_k, rank_by=rank_by)
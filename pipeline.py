@@ -0,0 +1,503 @@
+"""
+The analysis as an importable pipeline of named stages.
+
+Each stage declares the stages it depends on and the options it reads, so
+asking for one output runs only what that output needs:
+
+    from pipeline import Pipeline
+    pipeline = Pipeline('../primetrade.ai', '.cache', 'outputs')
+    risk = pipeline.get('risk_analysis_by_sentiment')   # load .. tables, no charts
+    pipeline.get('chart:6_pnl_distribution.png')         # one PNG
+    pipeline.get('report')                               # the PDF
+
+Stages:
+  load -> schema -> join -> derived_metrics -> cube -> tables -> <each analysis table>
+    (tables reads the cube only with the cube engine, derived_metrics with the
+    fused / pandas engines)
+  fear_greed -> cube -> tables with workers > 1: the partitioned processes
+    read the trades from the columnar cache and the parent merges their cubes
+    (parallel.py); `fear_greed` then loads the sentiment table alone
+  derived_metrics -> top_accounts_by_sentiment_{coin,month}
+  derived_metrics -> sentiment_breakdown_{account,coin} (per-entity report input)
+  cube, tables -> summary, charts (all nine), chart:<file> (one)
+  summary, tables -> report;   schema -> memory_report;   tables -> parity
+  cube -> distinct_accounts;   derived_metrics, cube -> approximation_report
+  fear_greed, cube -> lagged_sentiment (outcomes by sentiment 0..max_lag days back)
+  derived_metrics -> significance (bootstrap intervals, permutation tests; in the report when enabled)
+  derived_metrics -> trade_sequences (streaks, gaps, holding time, positions per sentiment)
+
+With the `start` / `end` options, `load` reads only that date window, as a
+slice of the day-ordered trade store (`trade_store.py`), and every later
+stage works on the window.
+
+The cube (`cube.py`) is the trades aggregated at (day, classification,
+Account, Coin, side) grain; with the default engine the tables, summary and
+charts are roll-ups of it rather than scans of the trade frame. With the
+`approximate` option its quantiles and distinct counts come from sketches.
+
+Every stage has a key: a hash of its name, the options it reads, the
+pipeline's code and the keys of its dependencies, rooted in the SHA-256 of
+the two source CSVs (`data_cache.source_digests`: the columnar cache
+manifest's hashes while the files still match it). Results are memoized per
+key in memory, and the small ones (cube, analysis tables, rankings, chart and
+report paths) are also pickled under `<cache_dir>/stages`, so a later process asking for the report
+or a chart whose inputs did not change loads nothing. matplotlib/seaborn
+(`charts`) and reportlab (`generate_report`) are imported only by the stages
+that draw.
+"""
+
+import contextlib
+import hashlib
+import json
+import pickle
+from pathlib import Path
+
+import pandas as pd
+
+from aggregation import (DEFAULT_TOP_K, REPORT_GROUPINGS, TOP_K_GROUPINGS, account_rankings, check_parity,
+                         fused_tables, pandas_tables, sentiment_breakdown)
+from cube import Cube
+from data_cache import load_datasets, load_fear_greed, source_digests
+from lagged_sentiment import DEFAULT_MAX_LAG, DEFAULT_WINDOWS, lagged_sentiment
+from metrics import add_derived_metrics
+from schema import (CATEGORICAL_COLUMNS, MISSING_DAY, apply_sentiment_schema, apply_trade_schema, epoch_days,
+                    memory_report)
+from sentiment_join import SentimentTable
+from significance import DEFAULT_CONFIDENCE, DEFAULT_RESAMPLES, DEFAULT_SEED, significance, with_intervals
+from trade_sequences import sequence_metrics
+from trade_store import load_window, window_days
+
+DEFAULT_OPTIONS = {
+    'use_cache': True,          # memory-map the columnar cache instead of parsing the CSVs
+    'start': None,              # only trades from this date ('YYYY-MM-DD', inclusive) ...
+    'end': None,                # ... to this one, read as a slice of the day-ordered store (trade_store.py)
+    'rebuild_cache': False,
+    'object_columns': False,    # load identifiers as objects (the "before" side of memory_report)
+    'float32': False,
+    'join_mode': 'exact',
+    'lag': 0,
+    'engine': 'cube',           # roll-ups of the cube; 'fused': one pass over the trades; 'pandas': the
+                                # original per-analysis groupbys
+    'workers': 1,               # > 1: partitioned processes (parallel.py)
+    'partition_by': 'month',
+    'top_k': DEFAULT_TOP_K,
+    'rank_by': 'pnl',
+    'dpi': 300,
+    'chart_workers': None,
+    'approximate': None,        # (quantile rank error, distinct-count error): sketch the cube's order statistics
+    'max_lag': DEFAULT_MAX_LAG,  # lagged_sentiment: lags 0..max_lag days
+    'windows': DEFAULT_WINDOWS,  # lagged_sentiment: rolling windows in days
+    'significance': False,      # report: bootstrap intervals and permutation p-values
+    'resamples': DEFAULT_RESAMPLES,
+    'confidence': DEFAULT_CONFIDENCE,
+    'bootstrap_seed': DEFAULT_SEED,
+    'bootstrap_workers': None,
+}
+
+ANALYSIS_TABLES = ['sentiment_aggregated_metrics', 'profitability_by_sentiment', 'volume_analysis_by_sentiment',
+                   'risk_analysis_by_sentiment', 'buy_sell_analysis', 'time_trends', 'top_accounts_by_sentiment']
+
+CHART_FILES = ['1_trades_per_sentiment.png', '2_avg_pnl_per_sentiment.png', '3_win_rate_per_sentiment.png',
+               '4_total_volume_per_sentiment.png', '5_risk_metrics_per_sentiment.png', '6_pnl_distribution.png',
+               '7_volume_timeseries.png', '8_correlation_heatmap.png', '9_buy_vs_sell_pnl.png']
+
+# Modules whose code determines stage results; any change invalidates persisted results
+CODE_MODULES = ['pipeline.py', 'cube.py', 'aggregation.py', 'aggregators.py', 'data_cache.py', 'metrics.py', 'schema.py',
+                'sentiment_join.py', 'parallel.py', 'charts.py', 'generate_report.py', 'sketches.py',
+                'lagged_sentiment.py', 'significance.py', 'trade_store.py', 'trade_sequences.py']
+
+
+class Stage:
+    """
+    A named step: `fn(pipeline, *dependency results)`.
+
+    `deps` is a tuple of stage names, or a function of the pipeline's
+    options returning one, for a stage whose inputs depend on how it runs.
+    `persist` stages are pickled under the stage cache; `writes` stages
+    produce a file in the output directory (or the report path) and return
+    its path.
+    """
+
+    def __init__(self, name, fn, deps=(), options=(), persist=False, writes=False):
+        self.name = name
+        self.fn = fn
+        self.deps = deps if callable(deps) else tuple(deps)
+        self.options = tuple(options)
+        self.persist = persist
+        self.writes = writes
+
+    def dependencies(self, options):
+        return tuple(self.deps(options)) if callable(self.deps) else self.deps
+
+
+STAGES = {}
+
+
+def stage(name, deps=(), options=(), persist=False, writes=False):
+    def register(fn):
+        STAGES[name] = Stage(name, fn, deps, options, persist, writes)
+        return fn
+    return register
+
+
+def code_digest(root=Path(__file__).parent):
+    digest = hashlib.sha256()
+    for name in CODE_MODULES:
+        path = root / name
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def row_count(value):
+    """Rows in a stage result: a frame's length, summed over dicts, the largest of a tuple."""
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, dict):
+        counts = [row_count(v) for v in value.values()]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    if isinstance(value, tuple):
+        counts = [c for c in (row_count(v) for v in value) if c is not None]
+        return max(counts) if counts else None
+    return None
+
+
+class Pipeline:
+    """Stage results for one dataset and one set of options; see the module docstring."""
+
+    def __init__(self, base_dir, cache_dir, output_dir, report_path=None, profiler=None, persist=True, **options):
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown pipeline options: {sorted(unknown)}")
+        self.base_dir = Path(base_dir)
+        self.cache_dir = Path(cache_dir)
+        self.output_dir = Path(output_dir)
+        self.report_path = Path(report_path) if report_path else self.output_dir / 'ds_report.pdf'
+        self.options = dict(DEFAULT_OPTIONS, **options)
+        self.profiler = profiler
+        self.stage_dir = self.cache_dir / 'stages' if persist else None
+        self.results = {}
+        self._keys = {}
+        self._code = None
+        self._sources = None
+
+    # ---------- Keys and caching ----------
+
+    def key(self, name):
+        """Hash of everything stage `name`'s result depends on."""
+        if name not in self._keys:
+            spec = STAGES[name]
+            if self._code is None:
+                self._code = code_digest()
+            digest = hashlib.sha256(f'{name}|{self._code}'.encode())
+            digest.update(json.dumps({option: self.options[option] for option in spec.options},
+                                     sort_keys=True, default=str).encode())
+            if spec.writes:
+                digest.update(f'{self.output_dir.resolve()}|{self.report_path.resolve()}'.encode())
+            deps = spec.dependencies(self.options)
+            if not deps:
+                if self._sources is None:
+                    self._sources = source_digests(self.base_dir, self.cache_dir)
+                for source, sha256 in sorted(self._sources.items()):
+                    digest.update(f'{source}|{sha256}'.encode())
+            for dep in deps:
+                digest.update(self.key(dep).encode())
+            self._keys[name] = digest.hexdigest()
+        return self._keys[name]
+
+    def _stored_path(self, name):
+        return self.stage_dir / f"{name.replace(':', '-')}.{self.key(name)[:20]}.pkl"
+
+    def _load_stored(self, name):
+        if self.stage_dir is None or not STAGES[name].persist:
+            return None
+        path = self._stored_path(name)
+        if not path.exists():
+            return None
+        with open(path, 'rb') as f:
+            value, stamp = pickle.load(f)
+        # A stage whose result is a file is only current while the file is the
+        # one it wrote (another stage or run may have redrawn it since)
+        if stamp is not None and _file_stamp(value) != stamp:
+            return None
+        return value
+
+    def _store(self, name, value):
+        if self.stage_dir is None or not STAGES[name].persist:
+            return
+        self.stage_dir.mkdir(parents=True, exist_ok=True)
+        path = self._stored_path(name)
+        for old in self.stage_dir.glob(f"{name.replace(':', '-')}.*.pkl"):
+            old.unlink()
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump((value, _file_stamp(value) if isinstance(value, Path) else None), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+    # ---------- Running ----------
+
+    def get(self, name):
+        """The result of stage `name`, running it (and its missing dependencies) if needed."""
+        if name not in STAGES:
+            raise KeyError(f"Unknown stage: {name!r}")
+        key = self.key(name)
+        if name in self.results and self.results[name][0] == key:
+            return self.results[name][1]
+
+        spec = STAGES[name]
+        value = self._load_stored(name)
+        cached = value is not None
+        # Dependencies run (and are profiled) before this stage's own record opens
+        inputs = [] if cached else [self.get(dep) for dep in spec.dependencies(self.options)]
+        profile = self.profiler.stage(name) if self.profiler is not None else contextlib.nullcontext({})
+        with profile as record:
+            if not cached:
+                value = spec.fn(self, *inputs)
+                self._store(name, value)
+            record['cached'] = cached
+            record['rows_in'] = max([c for c in map(row_count, inputs) if c is not None], default=None)
+            record['rows_out'] = row_count(value)
+        self.results[name] = (key, value)
+        return value
+
+    def run(self, *names):
+        """`{name: result}` for several stages, sharing their common dependencies."""
+        return {name: self.get(name) for name in names}
+
+    def plan(self, name):
+        """Stage names `name` needs, dependencies first."""
+        order = []
+
+        def visit(node):
+            for dep in STAGES[node].dependencies(self.options):
+                visit(dep)
+            if node not in order:
+                order.append(node)
+        visit(name)
+        return order
+
+
+def _file_stamp(path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def stage_names():
+    return list(STAGES)
+
+
+# ---------- Stages ----------
+# Frame stages work on shallow copies: the schema, join and derived metrics
+# add or replace columns, never writing into their input's arrays, so each
+# memoized result stays as its stage returned it.
+
+@stage('load', options=('use_cache', 'rebuild_cache', 'object_columns', 'start', 'end'))
+def _load(p):
+    categorical = () if p.options['object_columns'] else CATEGORICAL_COLUMNS
+    start, end = p.options['start'], p.options['end']
+    if start is None and end is None:
+        return load_datasets(p.base_dir, p.cache_dir, use_cache=p.options['use_cache'],
+                             rebuild=p.options['rebuild_cache'], categorical=categorical)
+    if p.options['use_cache']:
+        # Only the window's rows are read, as slices of the day-ordered store
+        return load_window(p.base_dir, p.cache_dir, start, end, rebuild=p.options['rebuild_cache'],
+                           categorical=categorical)
+    # Without the cache the CSV is parsed in full and filtered
+    fear_greed, trades = load_datasets(p.base_dir, p.cache_dir, use_cache=False)
+    first_day, last_day = window_days(start, end)
+    days = epoch_days(trades['ts'])
+    keep = days != MISSING_DAY
+    if first_day is not None:
+        keep &= days >= first_day
+    if last_day is not None:
+        keep &= days <= last_day
+    return fear_greed, trades[keep].reset_index(drop=True)
+
+
+@stage('schema', deps=('load',), options=('float32',))
+def _schema(p, loaded):
+    fear_greed, trades = loaded
+    return (apply_sentiment_schema(fear_greed),
+            apply_trade_schema(trades.copy(deep=False), float32=p.options['float32']))
+
+
+def _fear_greed_deps(options):
+    """Partitioned runs read only the sentiment table here; otherwise it comes with the trades."""
+    return () if options['workers'] > 1 else ('schema',)
+
+
+@stage('fear_greed', deps=_fear_greed_deps, options=('rebuild_cache',))
+def _fear_greed(p, typed=None):
+    if typed is not None:
+        return typed[0]
+    return apply_sentiment_schema(load_fear_greed(p.base_dir, p.cache_dir, rebuild=p.options['rebuild_cache'],
+                                                  categorical=CATEGORICAL_COLUMNS))
+
+
+@stage('memory_report', deps=('load', 'schema'))
+def _memory_report(p, loaded, typed):
+    return memory_report(loaded[1], typed[1])
+
+
+@stage('join', deps=('schema',), options=('join_mode', 'lag'))
+def _join(p, typed):
+    fear_greed, trades = typed
+    return SentimentTable(fear_greed).join(trades.copy(deep=False), mode=p.options['join_mode'],
+                                           lag=p.options['lag'])
+
+
+@stage('derived_metrics', deps=('join',))
+def _derived_metrics(p, merged):
+    merged = add_derived_metrics(merged.copy(deep=False))
+    merged['year_month'] = merged['ts'].dt.to_period('M')
+    return merged
+
+
+def _cube_deps(options):
+    """Partitioned processes read the trades themselves and need only the sentiment table."""
+    return ('fear_greed',) if options['workers'] > 1 else ('derived_metrics',)
+
+
+@stage('cube', deps=_cube_deps, persist=True,
+       options=('approximate', 'workers', 'partition_by', 'join_mode', 'lag', 'float32'))
+def _cube(p, source):
+    if p.options['workers'] > 1:
+        from parallel import parallel_cube
+        return parallel_cube(p.cache_dir, source, p.options['workers'], by=p.options['partition_by'],
+                             join_mode=p.options['join_mode'], lag=p.options['lag'], float32=p.options['float32'])
+    return Cube.build(source, approximate=p.options['approximate'])
+
+
+@stage('distinct_accounts', deps=('cube',))
+def _distinct_accounts(p, cube):
+    return cube.distinct_accounts()
+
+
+@stage('lagged_sentiment', deps=('fear_greed', 'cube'), options=('max_lag', 'windows'), persist=True)
+def _lagged_sentiment(p, fear_greed, cube):
+    return lagged_sentiment(cube, SentimentTable(fear_greed), fear_greed, max_lag=p.options['max_lag'],
+                            windows=p.options['windows'])
+
+
+@stage('significance', deps=('derived_metrics',), options=('resamples', 'confidence', 'bootstrap_seed'),
+       persist=True)
+def _significance(p, merged):
+    """`(intervals, tests)`; blocks are seeded independently of the workers, so those are not in the key."""
+    return significance(merged, resamples=p.options['resamples'], confidence=p.options['confidence'],
+                        seed=p.options['bootstrap_seed'], workers=p.options['bootstrap_workers'])
+
+
+@stage('trade_sequences', deps=('derived_metrics',), persist=True)
+def _trade_sequences(p, merged):
+    return sequence_metrics(merged)
+
+
+@stage('approximation_report', deps=('derived_metrics', 'cube'))
+def _approximation_report(p, merged, cube):
+    """Sketch error vs exact values (approximate mode only)."""
+    return cube.approximation_report(merged) if cube.sketches is not None else None
+
+
+def _tables_deps(options):
+    """The cube with the cube engine or partitioned processes (whose cube is merged); else the trades."""
+    return ('cube',) if options['engine'] == 'cube' or options['workers'] > 1 else ('derived_metrics',)
+
+
+@stage('tables', deps=_tables_deps, persist=True, options=('engine', 'workers', 'top_k', 'rank_by'))
+def _tables(p, source):
+    if p.options['engine'] == 'cube' or p.options['workers'] > 1:
+        return source.tables(top_k=p.options['top_k'], rank_by=p.options['rank_by'])
+    engine = pandas_tables if p.options['engine'] == 'pandas' else fused_tables
+    return engine(source, top_k=p.options['top_k'], rank_by=p.options['rank_by'])
+
+
+def _analysis_stage(name):
+    stage(name, deps=('tables',))(lambda p, tables: tables[name])
+
+
+for _name in ANALYSIS_TABLES:
+    _analysis_stage(_name)
+
+
+def _ranking_stage(grouping):
+    def ranking(p, merged):
+        return account_rankings(merged, grouping, top_k=p.options['top_k'], rank_by=p.options['rank_by'])
+    stage(f'top_accounts_by_sentiment_{grouping}', deps=('derived_metrics',), options=('top_k', 'rank_by'),
+          persist=True)(ranking)
+
+
+for _grouping in TOP_K_GROUPINGS:
+    _ranking_stage(_grouping)
+
+
+def _breakdown_stage(grouping):
+    stage(f'sentiment_breakdown_{grouping}', deps=('derived_metrics',), persist=True)(
+        lambda p, merged: sentiment_breakdown(merged, grouping))
+
+
+for _grouping in REPORT_GROUPINGS:
+    _breakdown_stage(_grouping)
+
+
+@stage('parity', deps=('derived_metrics', 'cube', 'tables'), options=('engine', 'top_k', 'rank_by'))
+def _parity(p, merged, cube, tables):
+    """The selected engine (the cube, for --engine pandas) vs the per-analysis groupbys: `[(table, status)]`."""
+    top_k, rank_by = p.options['top_k'], p.options['rank_by']
+    reference = pandas_tables(merged, top_k=top_k, rank_by=rank_by)
+    candidate = cube.tables(top_k=top_k, rank_by=rank_by) if p.options['engine'] == 'pandas' else tables
+    return check_parity(reference, candidate)
+
+
+@stage('summary', deps=('cube', 'tables'))
+def _summary(p, cube, tables):
+    """The `analysis_summary.json` payload (without the run date)."""
+    return cube.summary(tables['sentiment_aggregated_metrics'])
+
+
+@stage('charts', deps=('tables', 'cube'), options=('dpi', 'chart_workers'))
+def _charts(p, tables, cube):
+    """Render the nine charts (unchanged ones are skipped); `{file name: status}`."""
+    from charts import chart_jobs, render_charts
+    p.output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = chart_jobs(tables['sentiment_aggregated_metrics'], tables['risk_analysis_by_sentiment'], cube)
+    return render_charts(jobs, p.output_dir, dpi=p.options['dpi'], workers=p.options['chart_workers'])
+
+
+def _chart_stage(file_name, needs_cube):
+    def chart(p, tables, cube=None):
+        from charts import chart_jobs, render_charts
+        p.output_dir.mkdir(parents=True, exist_ok=True)
+        jobs = chart_jobs(tables['sentiment_aggregated_metrics'], tables['risk_analysis_by_sentiment'], cube,
+                          names=[file_name])
+        render_charts(jobs, p.output_dir, dpi=p.options['dpi'], workers=1)
+        return p.output_dir / file_name
+    stage(f'chart:{file_name}', deps=('tables', 'cube') if needs_cube else ('tables',),
+          options=('dpi',), persist=True, writes=True)(chart)
+
+
+def _register_charts():
+    # Importing charts does not load matplotlib; that happens on the first render
+    from charts import CUBE_CHARTS
+    for file_name in CHART_FILES:
+        _chart_stage(file_name, file_name in CUBE_CHARTS)
+
+
+_register_charts()
+
+
+@stage('report', deps=('summary', 'tables'), persist=True, writes=True,
+       options=('significance', 'resamples', 'confidence', 'bootstrap_seed'))
+def _report(p, summary, tables):
+    from generate_report import build_report
+    p.report_path.parent.mkdir(parents=True, exist_ok=True)
+    sentiment_agg, tests = tables['sentiment_aggregated_metrics'], None
+    if p.options['significance']:
+        # Only fetched when enabled, so a plain report never needs the trades
+        intervals, tests = p.get('significance')
+        sentiment_agg = with_intervals(sentiment_agg, intervals)
+    return build_report(summary, sentiment_agg, p.report_path, tests=tests, confidence=p.options['confidence'])
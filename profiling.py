@@ -0,0 +1,222 @@
+"""
+Stage-level instrumentation for the analysis pipeline.
+
+`StageProfiler.stage(name)` wraps one step of a run and records its wall
+time, CPU time (this process and, separately, finished child processes such
+as chart or partition workers), rows in and out, rows per second and peak
+resident memory. `write` saves the records as `profile.json` next to
+`analysis_summary.json`.
+
+Peak memory is the process high-water mark (VmHWM), reset at the start of
+each stage through /proc/self/clear_refs, so `peak_rss_delta_mb` is the most
+the stage added on top of what was resident when it began. Where the mark
+cannot be reset (non-Linux), ru_maxrss is used and the delta is only a lower
+bound; `peak_rss_exact` in the run section records which applies.
+
+With `sample=True` a background thread samples the main thread's Python
+stack every `interval` seconds during every stage, and `write` keeps the
+samples of the slowest stage (or of the stage named by `sample`): a
+`profile_<stage>.folded` file of collapsed stacks (flame graph input) and the
+top functions by self and total samples in `profile.json`. Time spent inside
+C code that holds the GIL is attributed to the Python line that called it.
+"""
+
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+PROFILE_NAME = 'profile.json'
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 25
+
+
+# ---------- Memory ----------
+
+def _status_kb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak():
+    """Reset this process's high-water mark; False when the platform cannot."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _maxrss_kb():
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb // 1024 if sys.platform == 'darwin' else kb
+
+
+def current_rss_mb():
+    kb = _status_kb('VmRSS')
+    return round((kb if kb is not None else _maxrss_kb()) / 1024, 1)
+
+
+def peak_mb():
+    """Peak resident memory of this process since the last reset, in MiB."""
+    kb = _status_kb('VmHWM')
+    return round((kb if kb is not None else _maxrss_kb()) / 1024, 1)
+
+
+# ---------- Sampling ----------
+
+class StackSampler:
+    """Background thread counting the Python stacks of one thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _frames(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            stack = self._frames()
+            if stack:
+                self.stacks[stack] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def top_functions(stacks, n=TOP_FUNCTIONS):
+    """Functions by samples at the top of the stack (self) and anywhere in it (total)."""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for function in set(stack):
+            total[function] += count
+    samples = sum(stacks.values()) or 1
+    return [{'function': function, 'self': own[function], 'total': count,
+             'total_share': round(count / samples, 4)}
+            for function, count in sorted(total.items(), key=lambda item: (-own[item[0]], -item[1]))[:n]]
+
+
+# ---------- Stages ----------
+
+class StageProfiler:
+    """Records one entry per pipeline stage; see the module docstring."""
+
+    def __init__(self, sample=False, interval=SAMPLE_INTERVAL):
+        self.sample = sample
+        self.interval = interval
+        self.records = []
+        self.samples = {}
+        self.peak_exact = reset_peak()
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Profile the body as stage `name`.
+
+        Yields the stage's record; set `rows_out` (and `rows_in`, if not known
+        up front) on it inside the block.
+        """
+        record = {'name': name, 'rows_in': rows_in, 'rows_out': None}
+        sampler = StackSampler(threading.main_thread().ident, self.interval) if self.sample else None
+        self.peak_exact = reset_peak() and self.peak_exact
+        rss_start = current_rss_mb()
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        if sampler:
+            sampler.start()
+        try:
+            yield record
+        finally:
+            if sampler:
+                self.samples[name] = sampler.stop()
+            wall = time.perf_counter() - wall0
+            cpu = time.process_time() - cpu0
+            after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            peak = peak_mb()
+            rows = record['rows_in'] if record['rows_in'] is not None else record['rows_out']
+            record.update({
+                'wall_seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4),
+                'child_cpu_seconds': round(max(after.ru_utime + after.ru_stime
+                                               - children.ru_utime - children.ru_stime, 0.0), 4),
+                'rows_per_sec': round(rows / wall, 1) if rows is not None and wall > 0 else None,
+                'rss_start_mb': rss_start,
+                'peak_rss_mb': peak,
+                'peak_rss_delta_mb': round(max(peak - rss_start, 0.0), 1),
+            })
+            self.records.append(record)
+
+    def slowest(self):
+        return max(self.records, key=lambda record: record['wall_seconds'])['name'] if self.records else None
+
+    def report(self, mode=None):
+        """The `profile.json` payload."""
+        total = sum(record['wall_seconds'] for record in self.records)
+        return {
+            'run': {
+                'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'mode': mode,
+                'argv': sys.argv[1:],
+                'python': platform.python_version(),
+                'cpus': os.cpu_count(),
+                'wall_seconds': round(time.perf_counter() - self.started, 4),
+                'peak_rss_exact': self.peak_exact,
+            },
+            'stages': [dict(record, share=round(record['wall_seconds'] / total, 4) if total else None)
+                       for record in self.records],
+            'slowest_stage': self.slowest(),
+        }
+
+    def write(self, output_dir, mode=None):
+        """Write `profile.json` (and the sampled stage's folded stacks) into `output_dir`."""
+        output_dir = Path(output_dir)
+        payload = self.report(mode)
+        if self.samples:
+            stage = self.slowest() if self.sample is True else self.sample
+            stacks = self.samples.get(stage, Counter())
+            folded = output_dir / f'profile_{stage}.folded'
+            with open(folded, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{';'.join(stack)} {count}\n")
+            payload['sample_profile'] = {
+                'stage': stage,
+                'interval_seconds': self.interval,
+                'samples': sum(stacks.values()),
+                'folded_stacks': folded.name,
+                'top_functions': top_functions(stacks),
+            }
+        with open(output_dir / PROFILE_NAME, 'w') as f:
+            json.dump(payload, f, indent=2)
+        return payload
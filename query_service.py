@@ -0,0 +1,282 @@
+"""
+Local HTTP query service over the joined trade/sentiment frame.
+
+The trades are loaded, joined to the fear & greed index and given their
+derived metrics once, at start-up, through the stage pipeline. The typed
+frame stays in memory together with a row index per filter column and a
+time-ordered index, so a query only touches the rows it selects. Recent
+answers are kept in an LRU cache.
+
+    python query_service.py --port 8765
+
+    GET /query?classification=Extreme+Fear&account=0xabc...&start=2024-03-01&end=2024-03-31
+    GET /query?classification=Greed&group_by=coin
+    GET /tables                         the analysis tables of comprehensive_analysis.py
+    GET /tables/risk_analysis_by_sentiment
+    GET /stats                          rows, load time and cache hits
+
+`/query` filters are `classification`, `account`, `coin` and `side` (repeat
+the parameter or separate values with commas to match any of them) and
+`start` / `end` (inclusive dates, on the trade's calendar day). `group_by`
+takes any of those four names plus `month`. The answer has one row per group
+with the metrics of `aggregation.grouped_metrics`: analysis 1's columns plus
+wins, losses and PnL quartiles.
+"""
+
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregation import METRIC_MEASURES, grouped_metrics
+from pipeline import ANALYSIS_TABLES, Pipeline
+from schema import day_to_date, epoch_days
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 256
+
+# Query parameter -> column
+FILTERS = {
+    'classification': 'classification',
+    'account': 'Account',
+    'coin': 'Coin',
+    'side': 'Side',
+}
+GROUPS = dict(FILTERS, month='year_month')
+
+# Columns a query's subset frame needs besides its group keys
+_MEASURE_COLUMNS = ['Account'] + [m for m in METRIC_MEASURES if m != 'account_seen']
+
+
+class QueryError(ValueError):
+    """A malformed query (answered with HTTP 400)."""
+
+
+class TradeIndex:
+    """Row positions of `merged` by filter value and by calendar day."""
+
+    def __init__(self, merged):
+        self.merged = merged
+        self.codes = {}
+        self.categories = {}
+        self._rows = {}
+        self._starts = {}
+        for column in FILTERS.values():
+            series = merged[column]
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype('category')
+            codes = series.cat.codes.to_numpy()
+            # Rows grouped by code (ascending positions inside each code)
+            self.codes[column] = codes
+            self.categories[column] = pd.Index(series.cat.categories)
+            self._rows[column] = np.argsort(codes, kind='stable')
+            counts = np.bincount(codes[codes >= 0], minlength=len(self.categories[column]))
+            self._starts[column] = np.concatenate([[0], np.cumsum(counts)]) + int((codes < 0).sum())
+
+        day = merged['day'].to_numpy()
+        self.time_order = None if merged['day'].is_monotonic_increasing else np.argsort(day, kind='stable')
+        self.days = day if self.time_order is None else day[self.time_order]
+
+    def value_codes(self, column, values):
+        """Codes of `values` in `column` (unknown values are dropped)."""
+        codes = self.categories[column].get_indexer(values)
+        return codes[codes >= 0]
+
+    def rows_for_codes(self, column, codes):
+        """Sorted positions of the rows whose `column` code is in `codes`."""
+        starts, rows = self._starts[column], self._rows[column]
+        parts = [rows[starts[code]:starts[code + 1]] for code in codes]
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def day_range(self, first, last):
+        """Positions of the rows with `first <= day <= last`, or a slice when the frame is time-ordered."""
+        lo = np.searchsorted(self.days, first, side='left')
+        hi = np.searchsorted(self.days, last, side='right')
+        if self.time_order is None:
+            return slice(lo, hi)
+        return np.sort(self.time_order[lo:hi])
+
+    def select(self, filters, first_day=None, last_day=None):
+        """Sorted positions of the rows matching every filter (`{column: codes}`) and the day range."""
+        n = len(self.merged)
+        rows = None
+        if first_day is not None or last_day is not None:
+            span = self.day_range(first_day if first_day is not None else np.iinfo(np.int32).min + 1,
+                                  last_day if last_day is not None else np.iinfo(np.int32).max)
+            rows = np.arange(n)[span] if isinstance(span, slice) else span
+
+        # Start from the most selective filter, then check the others on its rows
+        ordered = sorted(filters.items(), key=lambda item: sum(
+            self._starts[item[0]][c + 1] - self._starts[item[0]][c] for c in item[1]))
+        for column, codes in ordered:
+            if rows is None:
+                rows = self.rows_for_codes(column, codes)
+            else:
+                rows = rows[np.isin(self.codes[column][rows], codes)]
+        return np.arange(n) if rows is None else rows
+
+
+class QueryEngine:
+    """Answers filtered aggregate queries from one in-memory frame."""
+
+    def __init__(self, pipeline, cache_size=DEFAULT_CACHE_SIZE):
+        t0 = time.perf_counter()
+        self.pipeline = pipeline
+        self.merged = pipeline.get('derived_metrics')
+        self.index = TradeIndex(self.merged)
+        self.load_seconds = round(time.perf_counter() - t0, 3)
+        self._cached = lru_cache(maxsize=cache_size)(self._answer)
+
+    def parse(self, params):
+        """Normalize `{name: [values]}` query parameters into a hashable key."""
+        unknown = set(params) - set(FILTERS) - {'start', 'end', 'group_by'}
+        if unknown:
+            raise QueryError(f"unknown parameter(s): {', '.join(sorted(unknown))}")
+
+        def values(name):
+            return tuple(sorted({v.strip() for raw in params.get(name, []) for v in raw.split(',') if v.strip()}))
+
+        filters = tuple((name, values(name)) for name in FILTERS if values(name))
+        group_by = values('group_by')
+        bad = [name for name in group_by if name not in GROUPS]
+        if bad:
+            raise QueryError(f"cannot group by {', '.join(bad)} (choose from {', '.join(GROUPS)})")
+        days = []
+        for name in ('start', 'end'):
+            value = params.get(name, [None])[-1]
+            try:
+                days.append(int(epoch_days([pd.Timestamp(value)])[0]) if value else None)
+            except (ValueError, TypeError):
+                raise QueryError(f"{name} must be a date (YYYY-MM-DD), got {value!r}")
+        return filters, tuple(name for name in GROUPS if name in group_by), days[0], days[1]
+
+    def query(self, params):
+        """The answer to one `/query` (cached by its normalized parameters)."""
+        return self._cached(self.parse(params))
+
+    def _answer(self, key):
+        filters, group_by, first_day, last_day = key
+        t0 = time.perf_counter()
+        codes = {FILTERS[name]: self.index.value_codes(FILTERS[name], list(values)) for name, values in filters}
+        rows = self.index.select(codes, first_day, last_day)
+
+        columns = list(dict.fromkeys([GROUPS[name] for name in group_by] + _MEASURE_COLUMNS))
+        subset = self.merged.iloc[rows, [self.merged.columns.get_loc(c) for c in columns]]
+        result = grouped_metrics(subset, [GROUPS[name] for name in group_by])
+        if 'year_month' in result.columns:
+            result['year_month'] = result['year_month'].astype(str)
+        return {
+            'filters': dict(filters),
+            'start': None if first_day is None else str(day_to_date(first_day)),
+            'end': None if last_day is None else str(day_to_date(last_day)),
+            'group_by': list(group_by),
+            'rows_matched': int(len(rows)),
+            'compute_ms': round((time.perf_counter() - t0) * 1000, 3),
+            'results': records(result),
+        }
+
+    def table(self, name):
+        if name not in ANALYSIS_TABLES:
+            raise KeyError(name)
+        return records(self.pipeline.get(name))
+
+    def stats(self):
+        info = self._cached.cache_info()
+        return {
+            'rows': int(len(self.merged)),
+            'load_seconds': self.load_seconds,
+            'cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize},
+        }
+
+
+def records(frame):
+    """A frame as JSON-ready row dicts (NaN and infinities become null)."""
+    return json.loads(frame.to_json(orient='records', date_format='iso'))
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET /query, /tables[/<name>] and /stats; `self.server.engine` answers."""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        engine = self.server.engine
+        try:
+            if url.path == '/query':
+                t0 = time.perf_counter()
+                payload = dict(engine.query(parse_qs(url.query)))
+                payload['elapsed_ms'] = round((time.perf_counter() - t0) * 1000, 3)
+            elif url.path == '/tables':
+                payload = {'tables': ANALYSIS_TABLES}
+            elif url.path.startswith('/tables/'):
+                payload = {'table': url.path[len('/tables/'):],
+                           'rows': engine.table(url.path[len('/tables/'):])}
+            elif url.path == '/stats':
+                payload = engine.stats()
+            else:
+                return self._send(404, {'error': f'no such endpoint: {url.path}'})
+        except QueryError as e:
+            return self._send(400, {'error': str(e)})
+        except KeyError as e:
+            return self._send(404, {'error': f'no such table: {e.args[0]}'})
+        self._send(200, payload)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(engine, host='127.0.0.1', port=DEFAULT_PORT, verbose=False):
+    """Serve `engine` over HTTP until interrupted."""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.engine = engine
+    server.verbose = verbose
+    print(f"Serving {len(engine.merged)} trades on http://{host}:{server.server_port} "
+          f"(loaded in {engine.load_seconds}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    base = Path(__file__).parent
+    parser = argparse.ArgumentParser(description='Serve filtered aggregate queries over the trade data')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--data-dir', type=Path, default=base.parent / 'primetrade.ai',
+                        help='directory holding historical_data.csv and fear_greed_index.csv')
+    parser.add_argument('--cache-dir', type=Path, default=base / '.cache',
+                        help='columnar cache and stage results')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='query results kept in the LRU cache')
+    parser.add_argument('--sentiment-join', choices=['exact', 'asof'], default='exact')
+    parser.add_argument('--sentiment-lag', type=int, default=0, metavar='N')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    print("Loading datasets...")
+    pipeline = Pipeline(args.data_dir, args.cache_dir, base / 'outputs',
+                        join_mode=args.sentiment_join, lag=args.sentiment_lag)
+    serve(QueryEngine(pipeline, cache_size=args.cache_size), args.host, args.port, args.verbose)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Ingestion schema for the trade and sentiment frames.
+
+Identifiers are loaded as categoricals and calendar dates as int32 epoch-days
+(`day`) instead of Python `datetime.date` objects. An opt-in reduced-precision
+mode stores the numeric measures as float32. The default schema is lossless, so
+every CSV produced by the analysis is byte-identical to the object-typed frame.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Repeated string identifiers, stored as sorted categoricals so groupby order
+# matches the object-typed frame
+CATEGORICAL_COLUMNS = ['Account', 'Coin', 'Side', 'Direction', 'classification']
+
+# Measures that may be narrowed to float32 in reduced-precision mode
+FLOAT_COLUMNS = ['Closed PnL', 'Size USD', 'Execution Price', 'Fee', 'Size Tokens', 'Start Position']
+
+EPOCH = date(1970, 1, 1)
+
+# Day key for rows whose timestamp failed to parse; never present in the sentiment table
+MISSING_DAY = np.iinfo(np.int32).min
+
+
+def epoch_days(values):
+    """Convert datetime64 values (or a datetime Series) to int32 epoch-days."""
+    values = np.asarray(values, dtype='datetime64[ns]')
+    days = values.astype('datetime64[D]').astype(np.int64)
+    days[np.isnat(values)] = MISSING_DAY
+    return days.astype(np.int32)
+
+
+def day_to_date(day):
+    """Inverse of `epoch_days` for a single day key."""
+    return EPOCH + timedelta(days=int(day))
+
+
+def _to_category(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.astype('category')
+
+
+def apply_trade_schema(historical_data, float32=False):
+    """Convert the cleaned trade frame to the compact schema (in place)."""
+    for col in CATEGORICAL_COLUMNS:
+        if col in historical_data.columns:
+            historical_data[col] = _to_category(historical_data[col])
+
+    historical_data['day'] = epoch_days(historical_data['ts'])
+    if 'date' in historical_data.columns:
+        historical_data.drop(columns='date', inplace=True)
+
+    if float32:
+        for col in FLOAT_COLUMNS:
+            if col in historical_data.columns:
+                historical_data[col] = historical_data[col].astype(np.float32)
+    return historical_data
+
+
+def apply_sentiment_schema(fear_greed):
+    """Convert the cleaned fear & greed frame to the compact schema."""
+    fear_greed = fear_greed.copy()
+    fear_greed['day'] = epoch_days(pd.to_datetime(fear_greed['date']))
+    fear_greed = fear_greed.drop(columns='date')
+    fear_greed['classification'] = _to_category(fear_greed['classification'])
+    return fear_greed
+
+
+def decategorize(frame):
+    """Return `frame` with categorical columns turned back into plain object columns."""
+    cat_cols = [c for c in frame.columns if isinstance(frame[c].dtype, pd.CategoricalDtype)]
+    if not cat_cols:
+        return frame
+    return frame.astype({c: object for c in cat_cols})
+
+
+def column_memory(frame):
+    """Deep per-column memory usage in bytes, without the index."""
+    return frame.memory_usage(index=False, deep=True)
+
+
+def memory_report(before, after):
+    """
+    Per-column memory of two representations of the same data.
+
+    Columns present in only one frame (e.g. `date` vs `day`) show 0 for the other.
+    """
+    report = pd.DataFrame({
+        'before_bytes': column_memory(before),
+        'after_bytes': column_memory(after),
+    }).fillna(0).astype(np.int64)
+    report.loc['TOTAL'] = report.sum()
+    report['before_mb'] = (report['before_bytes'] / 2**20).round(2)
+    report['after_mb'] = (report['after_bytes'] / 2**20).round(2)
+    report['saving_pct'] = (
+        100 * (1 - report['after_bytes'] / report['before_bytes'].replace(0, np.nan))
+    ).round(1)
+    report.index.name = 'column'
+    return report
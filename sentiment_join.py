@@ -0,0 +1,126 @@
+"""
+Array-indexed sentiment join.
+
+The fear & greed series has at most one reading per calendar day, so instead of
+hash-joining every trade on a `date` key we build a dense table indexed by
+`day - first_day` and look each trade's sentiment up by position. Two modes:
+
+- exact: the reading for the trade's own day (optionally `lag` days earlier);
+  identical to the old `merge(on='date', how='left')`.
+- as-of: the most recent reading published at or before the trade timestamp
+  (optionally shifted back by `lag` days). Readings carry a unix `timestamp`;
+  trade `ts` values are IST wall-clock, so readings are shifted by
+  `reading_offset` (IST = UTC+05:30 by default) before comparing.
+"""
+
+import numpy as np
+import pandas as pd
+
+from schema import MISSING_DAY
+
+NS_PER_DAY = 86_400 * 10**9
+IST_OFFSET = pd.Timedelta(hours=5, minutes=30)
+
+
+class SentimentTable:
+    """Dense day-indexed `classification`/`value` lookup built from the compact fear & greed frame."""
+
+    def __init__(self, fear_greed, reading_offset=IST_OFFSET):
+        # One reading per day; a repeated day keeps its last reading
+        fear_greed = fear_greed.drop_duplicates('day', keep='last').sort_values('day')
+        classification = fear_greed['classification']
+        if not isinstance(classification.dtype, pd.CategoricalDtype):
+            classification = classification.astype('category')
+        self.categories = classification.cat.categories
+
+        days = fear_greed['day'].to_numpy(dtype=np.int64)
+        self.first_day = int(days[0]) if len(days) else 0
+        span = int(days[-1]) - self.first_day + 1 if len(days) else 0
+        self.codes = np.full(span, -1, dtype=np.int16)
+        self.values = np.full(span, np.nan)
+        self.codes[days - self.first_day] = classification.cat.codes.to_numpy()
+        self.values[days - self.first_day] = fear_greed['value'].to_numpy(dtype=np.float64)
+
+        # Publication instants for as-of lookups, on the trades' wall clock
+        if 'timestamp' in fear_greed.columns:
+            published = pd.to_datetime(fear_greed['timestamp'], unit='s') + reading_offset
+            self.published = published.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        else:
+            self.published = days * NS_PER_DAY
+        order = np.argsort(self.published, kind='stable')
+        self.published = self.published[order]
+        self.published_codes = classification.cat.codes.to_numpy()[order]
+        self.published_values = fear_greed['value'].to_numpy(dtype=np.float64)[order]
+
+        # Per calendar day of the trades' clock: index of the last reading
+        # published before that day starts. With at most one reading per day an
+        # as-of lookup is then two array reads instead of a binary search.
+        if len(self.published):
+            self.asof_base = int(self.published[0] // NS_PER_DAY)
+            span = int(self.published[-1] // NS_PER_DAY) - self.asof_base + 2
+            day_starts = (self.asof_base + np.arange(span + 1)) * NS_PER_DAY
+            self.last_before = np.searchsorted(self.published, day_starts, side='left') - 1
+            self.crowded_days = np.flatnonzero(np.diff(self.last_before) > 1)
+
+    def positions(self, days, lag=0):
+        """Table slot for each trade day (-1 when there is no reading that day)."""
+        days = np.asarray(days, dtype=np.int64)
+        offset = days - lag - self.first_day
+        in_range = (days != MISSING_DAY) & (offset >= 0) & (offset < len(self.codes))
+        return np.where(in_range, offset, -1)
+
+    def lookup(self, days, lag=0):
+        """`(codes, values)` of the reading `lag` days before each trade day."""
+        slot = self.positions(days, lag)
+        hit = slot >= 0
+        safe = np.where(hit, slot, 0)
+        if not len(self.codes):
+            return np.full(len(slot), -1, dtype=np.int16), np.full(len(slot), np.nan)
+        codes = np.where(hit, self.codes[safe], -1)
+        values = np.where(hit, self.values[safe], np.nan)
+        return codes, values
+
+    def lookup_asof(self, ts, lag=0):
+        """`(codes, values)` of the latest reading published at or before `ts - lag days`."""
+        ts = np.asarray(ts, dtype='datetime64[ns]')
+        if not len(self.published):
+            return np.full(len(ts), -1, dtype=np.int16), np.full(len(ts), np.nan)
+        valid = ~np.isnat(ts)
+        target = ts.view(np.int64) - lag * NS_PER_DAY
+
+        span = len(self.last_before) - 1
+        slot = target // NS_PER_DAY - self.asof_base
+        inside = (slot >= 0) & (slot < span)
+        k = np.clip(slot, 0, span - 1)
+        # Candidate: the day's own reading (last one published before the next
+        # day starts), unless it is published after the trade
+        latest = self.last_before[k + 1]
+        published = self.published[np.maximum(latest, 0)]
+        idx = np.where((latest >= 0) & (published <= target), latest, self.last_before[k])
+        idx = np.where(inside, idx, np.where(slot < 0, -1, len(self.published) - 1))
+        if len(self.crowded_days):
+            # Days with several readings fall back to a binary search
+            crowded = inside & np.isin(k, self.crowded_days)
+            idx[crowded] = np.searchsorted(self.published, target[crowded], side='right') - 1
+
+        hit = valid & (idx >= 0)
+        safe = np.where(hit, idx, 0)
+        codes = np.where(hit, self.published_codes[safe], -1)
+        values = np.where(hit, self.published_values[safe], np.nan)
+        return codes, values
+
+    def join(self, trades, mode='exact', lag=0):
+        """
+        Attach `classification` and `value` to `trades` (in place) and return it.
+
+        Rows without a matching reading get NaN, as with a left merge.
+        """
+        if mode == 'asof':
+            codes, values = self.lookup_asof(trades['ts'], lag)
+        elif mode == 'exact':
+            codes, values = self.lookup(trades['day'], lag)
+        else:
+            raise ValueError(f"Unknown sentiment join mode: {mode!r}")
+        trades['classification'] = pd.Categorical.from_codes(codes, categories=self.categories)
+        trades['value'] = values
+        return trades
@@ -0,0 +1,188 @@
+"""
+Bootstrap confidence intervals and permutation tests for the per-sentiment metrics.
+
+The report ranks sentiments by average PnL and win rate; `significance`
+says how sure those rankings are. It returns two frames:
+
+- intervals: per sentiment and `BOOTSTRAP_METRICS` metric, the estimate and
+  a percentile bootstrap interval (the sentiment's trades resampled with
+  replacement);
+- tests: per metric, the leading sentiment against every other one, with a
+  two-sided permutation p-value (the two groups' trades pooled and randomly
+  relabeled).
+
+Resamples are drawn as index matrices, one row per resample, and turned
+into a weight matrix (how often each trade is drawn, or whether it is
+relabeled), so every measure's resampled sums are one matrix product; no
+resample is a Python iteration. A matrix holds at most `block_bytes`, so
+large groups are processed in blocks of resamples, and the blocks are
+independent tasks spread over processes. Each block has its own seed spawned
+from `seed`, so the results do not depend on the number of workers.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregation import FusedAggregator
+from schema import decategorize
+
+DEFAULT_RESAMPLES = 1000
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_SEED = 0
+DEFAULT_BLOCK_BYTES = 32 << 20
+
+# sentiment_aggregated_metrics column -> per-trade measure it is the mean of
+BOOTSTRAP_METRICS = {
+    'avg_pnl': 'Closed PnL',
+    'win_rate': 'win',
+    'avg_trade_size_usd': 'Size USD',
+}
+
+
+def _blocks(resamples, n, block_bytes):
+    """Resamples per block, so that a `(block, n)` float64 matrix fits in `block_bytes`."""
+    per_block = max(1, block_bytes // (8 * max(n, 1)))
+    return [min(per_block, resamples - start) for start in range(0, resamples, per_block)]
+
+
+def _sums(columns, weights):
+    """Weighted per-measure sums and present-row counts, one per row of `weights`: two `(measures, rows)`."""
+    values, present = columns
+    return values @ weights.T, present @ weights.T
+
+
+def _bootstrap_block(columns, size, rng):
+    """Means of `size` resamples with replacement: `(measures, size)`."""
+    n = columns[1].shape[1]
+    draws = rng.integers(0, n, size=(size, n))
+    draws += np.arange(size)[:, None] * n
+    weights = np.bincount(draws.reshape(-1), minlength=size * n).reshape(size, n).astype(np.float64)
+    sums, counts = _sums(columns, weights)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+def _permutation_block(columns, size, rng, n_first, observed):
+    """Per measure, how many of `size` relabelings differ in mean at least as much as `observed`."""
+    # A random n_first-subset per row: the n_first smallest of uniform keys (ties have probability 0)
+    keys = rng.random((size, columns[1].shape[1]))
+    kth = np.partition(keys, n_first - 1, axis=1)[:, n_first - 1]
+    sums, counts = _sums(columns, (keys <= kth[:, None]).astype(np.float64))
+    totals, total_counts = columns[0].sum(axis=1), columns[1].sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difference = sums / counts - (totals[:, None] - sums) / (total_counts[:, None] - counts)
+    # The tolerance keeps relabelings that tie the observed difference from rounding below it
+    return (np.abs(difference) >= np.abs(observed)[:, None] * (1 - 1e-9)).sum(axis=1)
+
+
+def _block(task):
+    """Worker: one block of bootstrap resamples or permutations."""
+    kind, columns, size, seed, extra = task
+    rng = np.random.default_rng(seed)
+    if kind == 'bootstrap':
+        return _bootstrap_block(columns, size, rng)
+    return _permutation_block(columns, size, rng, *extra)
+
+
+def sentiment_columns(merged):
+    """
+    Per sentiment (labels in sorted order), its trades' `BOOTSTRAP_METRICS`
+    measures: `(values with NaN as 0, presence as 0 / 1)`, one row per measure.
+
+    A measure's mean is over the rows where it is present, as in the
+    aggregated table: `Closed PnL` and `Size USD` skip their own missing
+    values, and the win rate is over all rows (`win.sum() / rows`).
+    """
+    engine = FusedAggregator(merged)
+    codes, valid, keys = engine.group_codes(['classification'])
+    values = np.vstack([engine.values(measure)[valid] for measure in BOOTSTRAP_METRICS.values()])
+    present = ~np.isnan(values)
+    present[list(BOOTSTRAP_METRICS.values()).index('win')] = True
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+    groups = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        rows = order[start:end]
+        groups.append((np.nan_to_num(values[:, rows]), present[:, rows].astype(np.float64)))
+    return list(decategorize(keys)['classification']), groups
+
+
+def significance(merged, resamples=DEFAULT_RESAMPLES, confidence=DEFAULT_CONFIDENCE, seed=DEFAULT_SEED,
+                 workers=None, block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    `(intervals, tests)` for the sentiments of `merged` (see the module
+    docstring). `workers` processes run the blocks (default: one per CPU;
+    1 runs them here).
+    """
+    labels, groups = sentiment_columns(merged)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        estimates = np.array([values.sum(axis=1) / present.sum(axis=1) for values, present in groups])
+    metrics = list(BOOTSTRAP_METRICS)
+
+    # Per metric, the leader against every other sentiment; a pair shared by
+    # several metrics is permuted once for all of them
+    pairs = {}
+    for m in range(len(metrics)):
+        leader = int(np.nanargmax(estimates[:, m]))
+        for other in range(len(labels)):
+            if other != leader:
+                pairs.setdefault((leader, other), []).append(m)
+
+    tasks, owners = [], []
+    for g, columns in enumerate(groups):
+        for size in _blocks(resamples, columns[1].shape[1], block_bytes):
+            tasks.append(['bootstrap', columns, size, None, None])
+            owners.append(('bootstrap', g))
+    for leader, other in pairs:
+        a, b = groups[leader], groups[other]
+        columns = (np.hstack([a[0], b[0]]), np.hstack([a[1], b[1]]))
+        extra = (a[1].shape[1], estimates[leader] - estimates[other])
+        for size in _blocks(resamples, columns[1].shape[1], block_bytes):
+            tasks.append(['permutation', columns, size, None, extra])
+            owners.append(('permutation', (leader, other)))
+    for task, child in zip(tasks, np.random.SeedSequence(seed).spawn(len(tasks))):
+        task[3] = child
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_block, map(tuple, tasks)))
+    else:
+        results = [_block(tuple(task)) for task in tasks]
+    collected = {}
+    for owner, result in zip(owners, results):
+        collected.setdefault(owner, []).append(result)
+
+    alpha = (1 - confidence) / 2
+    intervals = []
+    for g, label in enumerate(labels):
+        means = np.hstack(collected['bootstrap', g])
+        for m, metric in enumerate(metrics):
+            low, high = np.nanquantile(means[m], [alpha, 1 - alpha])
+            intervals.append({'classification': label, 'metric': metric, 'estimate': estimates[g, m],
+                              'ci_low': low, 'ci_high': high})
+
+    tests = []
+    for (leader, other), measures in pairs.items():
+        extreme = np.sum(collected['permutation', (leader, other)], axis=0)
+        for m in measures:
+            tests.append({'metric': metrics[m], 'leader': labels[leader], 'other': labels[other],
+                          'difference': estimates[leader, m] - estimates[other, m],
+                          'p_value': (extreme[m] + 1) / (resamples + 1)})
+    tests = pd.DataFrame(tests, columns=['metric', 'leader', 'other', 'difference', 'p_value'])
+    tests = tests.sort_values(['metric', 'p_value'], kind='stable').reset_index(drop=True)
+    return pd.DataFrame(intervals), tests
+
+
+def with_intervals(sentiment_agg, intervals):
+    """`sentiment_agg` with `<metric>_ci_low` / `<metric>_ci_high` columns for each bootstrapped metric."""
+    wide = intervals.pivot(index='classification', columns='metric', values=['ci_low', 'ci_high'])
+    table = sentiment_agg.copy()
+    for metric in BOOTSTRAP_METRICS:
+        for bound in ('ci_low', 'ci_high'):
+            values = table['classification'].map(wide[bound, metric])
+            table[f'{metric}_{bound}'] = values.round(4 if metric == 'win_rate' else 2)
+    return table
@@ -0,0 +1,300 @@
+"""
+Mergeable sketches for the approximate analysis mode.
+
+- `KLLSketch` answers quantile queries over a stream of floats from a few
+  hundred retained items (Karnin, Lang & Liberty, "Optimal Quantile
+  Approximation in Streams", 2016). Items live in compactors of growing
+  weight; a full compactor sorts itself and promotes every other item, so
+  memory depends on the rank accuracy asked for, not on the number of
+  values. Two sketches of disjoint streams merge into a sketch of the union.
+- `HyperLogLog` counts distinct values for many groups at once from `2**p`
+  one-byte registers per group (Flajolet et al., 2007), with the usual
+  linear-counting correction for small cardinalities. Registers merge by
+  element-wise maximum.
+
+Both take an error target: the normalized rank error of a quantile and the
+relative standard error of a distinct count. `rank_error_bound` /
+`HyperLogLog.relative_error` give the bounds the chosen sizes correspond to;
+`quantile_errors` measures the error actually achieved against exact values.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_QUANTILE_ERROR = 0.01
+DEFAULT_DISTINCT_ERROR = 0.01
+
+# KLL: capacity ratio between consecutive compactors, and the constant relating
+# the top compactor's capacity k to the rank error (~1.7 / k at 99% confidence)
+_KLL_DECAY = 2 / 3
+_KLL_ERROR_CONSTANT = 1.7
+_KLL_MIN_CAPACITY = 2
+
+# Values fed to a sketch at a time, so an update never holds more than this
+# many unsorted values on top of the sketch
+UPDATE_BLOCK = 1 << 16
+
+
+# ---------- Quantiles ----------
+
+class KLLSketch:
+    """Quantiles of a float stream with normalized rank error ~`rank_error_bound(k)`."""
+
+    def __init__(self, k, seed=0):
+        self.k = int(k)
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def for_error(cls, error=DEFAULT_QUANTILE_ERROR, seed=0):
+        return cls(math.ceil(_KLL_ERROR_CONSTANT / error), seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(_KLL_MIN_CAPACITY, math.ceil(self.k * _KLL_DECAY ** depth))
+
+    def update(self, values):
+        """Add `values` (NaNs are skipped)."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        for start in range(0, len(values), UPDATE_BLOCK):
+            block = values[start:start + UPDATE_BLOCK]
+            self.levels[0] = np.concatenate([self.levels[0], block])
+            self.count += len(block)
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold `other` (a sketch of a disjoint stream) into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        # Compact the lowest full compactor until none is over capacity (adding
+        # a level shrinks the capacities below it, hence the rescan)
+        while True:
+            full = [level for level, items in enumerate(self.levels) if len(items) > self._capacity(level)]
+            if not full:
+                return
+            level = full[0]
+            items = self.levels[level]
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            # An odd item out stays behind; every other one of the rest moves up
+            # with twice the weight, starting at a random offset
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            pairs = items[:len(items) - len(keep)]
+            self.levels[level] = keep
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1],
+                                                     pairs[self._rng.integers(2)::2]])
+
+    def quantiles(self, qs):
+        """Approximate `qs` quantiles (NaN when empty)."""
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.count == 0:
+            return np.full(len(qs), np.nan)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, cumulative = values[order], np.cumsum(weights[order])
+        ranks = qs * (cumulative[-1] - 1)
+        return values[np.minimum(np.searchsorted(cumulative, ranks, side='right'), len(values) - 1)]
+
+    def retained(self):
+        return sum(len(items) for items in self.levels)
+
+    def nbytes(self):
+        return sum(items.nbytes for items in self.levels)
+
+
+def rank_error_bound(k):
+    return _KLL_ERROR_CONSTANT / k
+
+
+def quantile_errors(approximate, values, qs):
+    """
+    Achieved error of `approximate` (one value per q) against the exact values.
+
+    The rank error is how far q lies outside the range of normalized ranks the
+    approximate value occupies among `values` (0 when it is a correct answer).
+    """
+    values = np.sort(np.asarray(values, dtype=np.float64)[~np.isnan(values)])
+    n = len(values)
+    exact = np.quantile(values, qs) if n else np.full(len(qs), np.nan)
+    out = []
+    for q, approx, truth in zip(qs, approximate, exact):
+        lo = np.searchsorted(values, approx, side='left') / max(n - 1, 1)
+        hi = (np.searchsorted(values, approx, side='right') - 1) / max(n - 1, 1)
+        out.append({
+            'q': q,
+            'approximate': float(approx),
+            'exact': float(truth),
+            'abs_error': float(abs(approx - truth)),
+            'rank_error': float(max(lo - q, q - hi, 0.0)) if n else None,
+        })
+    return out
+
+
+# ---------- Distinct counts ----------
+
+def hash_values(series):
+    """Stable 64-bit hashes of a column (categories are hashed once)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        hashes = pd.util.hash_array(np.asarray(series.cat.categories, dtype=object))
+        codes = series.cat.codes.to_numpy()
+        return np.where(codes >= 0, hashes[np.maximum(codes, 0)], np.uint64(0)), codes >= 0
+    valid = series.notna().to_numpy()
+    return pd.util.hash_array(np.asarray(series, dtype=object)), valid
+
+
+def _highest_bit(values):
+    """Index of the highest set bit of each (non-zero) uint64."""
+    hi = (values >> np.uint64(32)).astype(np.float64)
+    lo = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide='ignore'):
+        return np.where(hi > 0, 32 + np.floor(np.log2(hi)), np.floor(np.log2(lo))).astype(np.int64)
+
+
+class HyperLogLog:
+    """Distinct-count sketches for `size` groups, `2**p` registers each."""
+
+    def __init__(self, size=0, p=14):
+        self.p = int(p)
+        self.m = 1 << self.p
+        self.registers = np.zeros((size, self.m), dtype=np.uint8)
+
+    @classmethod
+    def for_error(cls, error=DEFAULT_DISTINCT_ERROR, size=0):
+        p = math.ceil(math.log2((1.04 / error) ** 2))
+        return cls(size, min(max(p, 4), 18))
+
+    def __len__(self):
+        return len(self.registers)
+
+    def grow(self, size):
+        if size > len(self):
+            extra = np.zeros((size - len(self), self.m), dtype=np.uint8)
+            self.registers = np.concatenate([self.registers, extra])
+
+    def update(self, codes, hashes):
+        """Add the values hashed by `hashes` to the groups `codes` (aligned arrays)."""
+        if not len(codes):
+            return self
+        self.grow(int(codes.max()) + 1)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        bucket = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        # Leading zeros of the remaining bits, plus one; a guard bit bounds it
+        rest = (hashes << np.uint64(self.p)) | np.uint64(1 << (self.p - 1))
+        rho = (64 - _highest_bit(rest)).astype(np.uint8)
+        flat = self.registers.reshape(-1)
+        np.maximum.at(flat, codes.astype(np.int64) * self.m + bucket, rho)
+        return self
+
+    def merge(self, other, lookup=None):
+        """Fold `other` in (`lookup` maps its group ids to ours; identity by default)."""
+        if lookup is None:
+            lookup = np.arange(len(other))
+        self.grow(int(lookup.max()) + 1 if len(lookup) else 0)
+        np.maximum.at(self.registers, lookup, other.registers)
+        return self
+
+    def estimate(self):
+        """Estimated distinct count per group."""
+        m = float(self.m)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)), axis=1)
+        zeros = (self.registers == 0).sum(axis=1)
+        with np.errstate(divide='ignore'):
+            linear = m * np.log(m / np.maximum(zeros, 1))
+        return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def nbytes(self):
+        return self.registers.nbytes // max(len(self), 1)
+
+
+# ---------- Per-group sketches ----------
+
+class GroupSketches:
+    """
+    `KLLSketch`es of several measures and a `HyperLogLog` of one key column,
+    per group id: the fixed-size stand-in for exact per-group quantiles and
+    distinct counts.
+    """
+
+    def __init__(self, measures, quantile_error=DEFAULT_QUANTILE_ERROR, distinct_error=DEFAULT_DISTINCT_ERROR):
+        self.quantile_error = quantile_error
+        self.distinct_error = distinct_error
+        self.kll = {measure: [] for measure in measures}
+        self.distinct = HyperLogLog.for_error(distinct_error)
+
+    def __len__(self):
+        return len(self.distinct)
+
+    def grow(self, size):
+        for sketches in self.kll.values():
+            while len(sketches) < size:
+                sketches.append(KLLSketch.for_error(self.quantile_error, seed=len(sketches)))
+        self.distinct.grow(size)
+
+    def update(self, codes, values, size):
+        """Add `{measure: values}` (aligned with the group ids `codes`), a block of rows at a time."""
+        self.grow(size)
+        for start in range(0, len(codes), UPDATE_BLOCK):
+            block = codes[start:start + UPDATE_BLOCK]
+            order = np.argsort(block, kind='stable')
+            bounds = np.searchsorted(block[order], np.arange(size + 1))
+            for gid in np.flatnonzero(np.diff(bounds)):
+                rows = start + order[bounds[gid]:bounds[gid + 1]]
+                for measure, column in values.items():
+                    self.kll[measure][gid].update(column[rows])
+
+    def update_distinct(self, codes, hashes, size):
+        self.grow(size)
+        self.distinct.update(codes, hashes)
+
+    def merge(self, other, lookup=None):
+        """Fold `other` in (`lookup` maps its group ids to ours; identity by default)."""
+        if lookup is None:
+            lookup = np.arange(len(other))
+        self.grow(int(lookup.max()) + 1 if len(lookup) else 0)
+        for measure, sketches in other.kll.items():
+            for gid, sketch in zip(lookup, sketches):
+                self.kll[measure][gid].merge(sketch)
+        self.distinct.merge(other.distinct, lookup)
+        return self
+
+    def quantiles(self, measure, qs):
+        """`{q: per-group values}`, like `aggregators.group_quantiles`."""
+        values = np.array([sketch.quantiles(qs) for sketch in self.kll[measure]]).reshape(len(self), len(qs))
+        return {q: values[:, i] for i, q in enumerate(qs)}
+
+    def describe(self):
+        """Configured error bounds and memory per group."""
+        k = KLLSketch.for_error(self.quantile_error).k
+        return {
+            'quantile_sketch': 'KLL',
+            'quantile_rank_error_target': self.quantile_error,
+            'quantile_rank_error_bound': round(rank_error_bound(k), 6),
+            'kll_k': k,
+            'distinct_sketch': 'HyperLogLog',
+            'distinct_relative_error_target': self.distinct_error,
+            'distinct_relative_error_bound': round(self.distinct.relative_error(), 6),
+            'hll_precision': self.distinct.p,
+            'bytes_per_group': {
+                'quantile_sketches': [sum(sketches[gid].nbytes() for sketches in self.kll.values())
+                                      for gid in range(len(self))],
+                'distinct_sketch': self.distinct.nbytes(),
+            },
+        }
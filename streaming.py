@@ -0,0 +1,166 @@
+"""
+Bounded-memory streaming mode for the sentiment analysis.
+
+`historical_data.csv` is read in chunks; each chunk is cleaned, joined to the
+fear & greed table and folded into mergeable partial aggregates
+(`aggregators.GroupedStats`). Medians and quartiles come from on-disk value
+spills (`aggregators.ValueSpill`), or, with `approximate=(quantile error,
+distinct error)`, from fixed-size per-sentiment sketches (`sketches.py`) that
+also estimate distinct accounts, so nothing is spilled. Peak memory therefore
+depends on the chunk size and on the number of distinct groups, not on the
+length of the file.
+"""
+
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from aggregation import (ACCOUNT_MEASURES, DEFAULT_TOP_K, FLOW_MEASURES, QUANTILES, SENTIMENT_MEASURES,
+                         build_tables, key_insights)
+from aggregators import GroupedStats, ValueSpill
+from data_cache import FEAR_GREED_CSV, HISTORICAL_CSV, clean_fear_greed, clean_historical
+from metrics import add_derived_metrics
+from schema import MISSING_DAY, apply_sentiment_schema, day_to_date, epoch_days
+from sentiment_join import SentimentTable
+from sketches import GroupSketches, hash_values
+
+DEFAULT_CHUNKSIZE = 250_000
+
+
+class StreamingAnalysis:
+    """Partial aggregates for the seven analysis tables, fed one chunk at a time."""
+
+    def __init__(self, spill_dir, approximate=None):
+        self.sentiment = GroupedStats(['classification'], SENTIMENT_MEASURES)
+        self.side = GroupedStats(['classification', 'is_buy'], FLOW_MEASURES)
+        self.monthly = GroupedStats(['year_month', 'classification'], FLOW_MEASURES)
+        self.accounts = GroupedStats(['classification', 'Account'], ACCOUNT_MEASURES)
+        self.sketches = GroupSketches(QUANTILES, *approximate) if approximate else None
+        self.spills = {} if approximate else {m: ValueSpill(spill_dir, f'q{i}') for i, m in enumerate(QUANTILES)}
+        self.has_tokens = True
+        self.total_rows = 0
+        self.first_day = None
+        self.last_day = None
+
+    def update(self, merged):
+        """Fold one joined, derived chunk into the aggregates."""
+        merged['account_seen'] = np.where(merged['Account'].notna(), 1.0, np.nan)
+        merged['year_month'] = merged['ts'].dt.to_period('M')
+        if 'Size Tokens' not in merged.columns:
+            self.has_tokens = False
+            merged['Size Tokens'] = np.nan
+
+        codes, mask = self.sentiment.update(merged)
+        for measure, spill in self.spills.items():
+            spill.append(codes, merged[measure].to_numpy(dtype=np.float64, na_value=np.nan)[mask])
+        if self.sketches is not None:
+            size = len(self.sentiment.index)
+            self.sketches.update(codes, {m: merged[m].to_numpy(dtype=np.float64, na_value=np.nan)[mask]
+                                         for m in QUANTILES}, size)
+            hashes, has_account = hash_values(merged['Account'])
+            has_account = has_account[mask]
+            self.sketches.update_distinct(codes[has_account], hashes[mask][has_account], size)
+        self.side.update(merged)
+        self.monthly.update(merged)
+        self.accounts.update(merged)
+
+        self.total_rows += len(merged)
+        days = merged['day'].to_numpy()
+        days = days[days != MISSING_DAY]
+        if len(days):
+            lo, hi = int(days.min()), int(days.max())
+            self.first_day = lo if self.first_day is None else min(self.first_day, lo)
+            self.last_day = hi if self.last_day is None else max(self.last_day, hi)
+
+    def tables(self, top_k=DEFAULT_TOP_K, rank_by='pnl'):
+        """Project the aggregates into the seven analysis tables (see `aggregation.build_tables`)."""
+        quantiles = {}
+        for measure, qs in QUANTILES.items():
+            if self.sketches is not None:
+                quantiles[measure] = self.sketches.quantiles(measure, qs)
+                continue
+            spill = self.spills[measure]
+            values = np.array([spill.quantiles(gid, qs) for gid in range(len(self.sentiment.index))])
+            values = values.reshape(len(self.sentiment.index), len(qs))
+            quantiles[measure] = {q: values[:, i] for i, q in enumerate(qs)}
+        return build_tables(self.sentiment.table(), self.side.table(), self.monthly.table(),
+                            self.accounts.table(), quantiles, has_tokens=self.has_tokens,
+                            top_k=top_k, rank_by=rank_by)
+
+    def distinct_accounts(self):
+        """Estimated distinct accounts per sentiment (approximate mode)."""
+        return pd.DataFrame({'classification': [k[0] for k in self.sentiment.index.keys],
+                             'unique_accounts': self.sketches.distinct.estimate().round().astype(np.int64)})
+
+    def summary(self, sentiment_agg):
+        """The `analysis_summary.json` payload, from the aggregates alone."""
+        return summary_payload(self.sentiment, self.total_rows, self.first_day, self.last_day, sentiment_agg)
+
+
+def summary_payload(sentiment, total_rows, first_day, last_day, sentiment_agg):
+    """`analysis_summary.json` from per-sentiment `GroupedStats` and the trade day range."""
+    counts = pd.Series(sentiment.rows, index=[k[0] for k in sentiment.index.keys])
+    counts = counts.sort_values(ascending=False)
+    return {
+        'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'total_trades': int(total_rows),
+        'trades_with_sentiment': int(sentiment.rows.sum()),
+        'date_range': {
+            'start': str(day_to_date(first_day)) if first_day is not None else 'nan',
+            'end': str(day_to_date(last_day)) if last_day is not None else 'nan'
+        },
+        'sentiment_distribution': {str(k): int(v) for k, v in counts.items()},
+        'key_insights': key_insights(sentiment_agg)
+    }
+
+
+def iter_joined_chunks(csv_path, fear_greed, chunksize=DEFAULT_CHUNKSIZE, join_mode='exact', lag=0):
+    """Yield cleaned, sentiment-joined chunks of the trade CSV with derived metrics."""
+    sentiment_table = SentimentTable(fear_greed)
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, low_memory=False):
+        chunk = clean_historical(chunk)
+        chunk['day'] = epoch_days(chunk['ts'])
+        merged = sentiment_table.join(chunk, mode=join_mode, lag=lag)
+        yield add_derived_metrics(merged)
+
+
+def run_streaming(base_dir, csv_dir, output_dir, chunksize=DEFAULT_CHUNKSIZE, spill_root=None,
+                  join_mode='exact', lag=0, top_k=DEFAULT_TOP_K, rank_by='pnl', approximate=None):
+    """
+    Write the seven CSVs and `analysis_summary.json` from one chunked pass;
+    approximate mode adds `distinct_accounts_by_sentiment.csv` and the sketch
+    bounds (`approximation_report.json`; no exact values to measure against).
+    """
+    base_dir, csv_dir, output_dir = Path(base_dir), Path(csv_dir), Path(output_dir)
+    fear_greed = apply_sentiment_schema(clean_fear_greed(pd.read_csv(base_dir / FEAR_GREED_CSV)))
+
+    spill_dir = tempfile.mkdtemp(prefix='spill-', dir=spill_root)
+    try:
+        analysis = StreamingAnalysis(spill_dir, approximate)
+        for i, merged in enumerate(iter_joined_chunks(base_dir / HISTORICAL_CSV, fear_greed, chunksize,
+                                                          join_mode, lag)):
+            analysis.update(merged)
+            print(f"  chunk {i + 1}: {analysis.total_rows} rows folded")
+        tables = analysis.tables(top_k, rank_by)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    for name, table in tables.items():
+        print(f"\n=== {name} ===")
+        print(table)
+        table.to_csv(csv_dir / f'{name}.csv', index=False)
+
+    if approximate:
+        analysis.distinct_accounts().to_csv(csv_dir / 'distinct_accounts_by_sentiment.csv', index=False)
+        with open(output_dir / 'approximation_report.json', 'w') as f:
+            json.dump(analysis.sketches.describe(), f, indent=2)
+
+    summary = analysis.summary(tables['sentiment_aggregated_metrics'])
+    with open(output_dir / 'analysis_summary.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+    return tables, summary
@@ -0,0 +1,87 @@
+"""
+A small synthetic dataset in the raw file layout, with the awkward cases the
+engines must agree on:
+
+- trades whose `Closed PnL` (or `Size USD`) is missing;
+- trade days with no fear & greed reading (their trades have no sentiment);
+- accounts with identical fills, so their ranks tie at the top-k cut.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pipeline import Pipeline  # noqa: E402
+
+START = pd.Timestamp('2024-01-01')
+DAYS = 60
+ROWS = 400
+MISSING_SENTIMENT_DAYS = [3, 17, 18, 41]
+TIED_ACCOUNTS = 3
+TOP_K = 2
+
+
+def write_dataset(directory, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(START, periods=DAYS, freq='D')
+    value = rng.integers(5, 95, DAYS)
+    classification = np.select([value <= 24, value <= 46, value <= 54, value <= 75],
+                               ['Extreme Fear', 'Fear', 'Neutral', 'Greed'], 'Extreme Greed')
+    pd.DataFrame({
+        'timestamp': dates.view('int64') // 10**9,
+        'value': value,
+        'classification': classification,
+        'date': dates.strftime('%Y-%m-%d'),
+    }).drop(index=MISSING_SENTIMENT_DAYS).to_csv(directory / 'fear_greed_index.csv', index=False)
+
+    seconds = np.sort(START.value // 10**9 + rng.integers(0, DAYS * 86_400, ROWS))
+    accounts = np.array([f'0x{i:040x}' for i in range(1, 9)])[rng.integers(0, 8, ROWS)]
+    pnl = np.where(rng.random(ROWS) < 0.5, 0.0, rng.normal(0, 50, ROWS).round(2))
+    pnl[rng.choice(ROWS, 20, replace=False)] = np.nan
+    size_usd = rng.lognormal(5, 1, ROWS).round(2)
+    size_usd[rng.choice(ROWS, 10, replace=False)] = np.nan
+    trades = pd.DataFrame({
+        'Account': accounts,
+        'Coin': np.array(['BTC', 'ETH', 'SOL'])[rng.integers(0, 3, ROWS)],
+        'Execution Price': rng.lognormal(3, 1, ROWS).round(4),
+        'Size Tokens': rng.lognormal(1, 1, ROWS).round(4),
+        'Size USD': size_usd,
+        'Side': np.where(rng.random(ROWS) < 0.5, 'BUY', 'SELL'),
+        'Timestamp IST': pd.to_datetime(seconds, unit='s').strftime('%d-%m-%Y %H:%M'),
+        'Start Position': rng.normal(0, 100, ROWS).round(3),
+        'Direction': np.where(pnl == 0, 'Open Long', 'Close Long'),
+        'Closed PnL': pnl,
+        'Fee': (np.nan_to_num(size_usd) * 0.0005).round(6),
+        'Timestamp': (seconds - 19_800) * 1000.0,
+    })
+
+    # Accounts that repeat the same profitable fills tie for the top ranks
+    tied = trades.iloc[::25].assign(**{'Closed PnL': 1000.0, 'Direction': 'Close Long'})
+    copies = [tied.assign(Account=f'0x{0xfeed + i:040x}') for i in range(TIED_ACCOUNTS)]
+    trades = pd.concat([trades, *copies]).sort_values('Timestamp', kind='stable')
+    trades.to_csv(directory / 'historical_data.csv', index=False)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    """Directory with `historical_data.csv` and `fear_greed_index.csv`."""
+    return write_dataset(tmp_path_factory.mktemp('data'))
+
+
+@pytest.fixture
+def pipeline(dataset, tmp_path):
+    def make(**options):
+        return Pipeline(dataset, tmp_path / 'cache', tmp_path / 'out', persist=False, **options)
+    return make
+
+
+@pytest.fixture
+def merged(pipeline):
+    """The joined trades with derived metrics."""
+    return pipeline(use_cache=False).get('derived_metrics')
@@ -0,0 +1,22 @@
+import pytest
+
+from aggregation import pandas_tables
+from conftest import TOP_K
+from test_parity import assert_parity
+
+pytest.importorskip('duckdb')
+
+from backends import open_backend  # noqa: E402
+
+
+@pytest.mark.parametrize('rank_by', ['pnl', 'win_rate'])
+def test_duckdb_tables_match_pandas(dataset, merged, tmp_path, rank_by):
+    tables = open_backend('duckdb', dataset, tmp_path / 'cache', top_k=TOP_K, rank_by=rank_by).tables()
+    assert_parity(pandas_tables(merged, top_k=TOP_K, rank_by=rank_by), tables)
+
+
+def test_duckdb_window_matches_pandas(dataset, pipeline, tmp_path):
+    window = {'start': '2024-01-10', 'end': '2024-02-05'}
+    expected = pipeline(use_cache=False, engine='pandas', top_k=TOP_K, **window).get('tables')
+    tables = open_backend('duckdb', dataset, tmp_path / 'duckdb', top_k=TOP_K, **window).tables()
+    assert_parity(expected, tables)
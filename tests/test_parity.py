@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from aggregation import check_parity, fused_tables, pandas_tables
+from conftest import MISSING_SENTIMENT_DAYS, START, TIED_ACCOUNTS, TOP_K
+from cube import Cube
+
+
+def assert_parity(expected, actual):
+    assert sorted(actual) == sorted(expected)
+    mismatches = [(table, status) for table, status in check_parity(expected, actual) if status.startswith('MISMATCH')]
+    assert not mismatches
+
+
+def test_dataset_has_the_edge_cases(merged):
+    assert merged['Closed PnL'].isna().any()
+    assert merged['Size USD'].isna().any()
+    missing = merged['ts'].dt.normalize().isin(START + pd.to_timedelta(MISSING_SENTIMENT_DAYS, unit='D'))
+    assert missing.any() and merged.loc[missing, 'classification'].isna().all()
+    # In every sentiment more accounts share the best total PnL than fit in the top k
+    totals = merged.groupby(['classification', 'Account'], observed=True)['Closed PnL'].sum()
+    best = totals.groupby(level='classification', observed=True).transform('max')
+    assert ((totals == best).groupby(level='classification', observed=True).sum() == TIED_ACCOUNTS).all()
+    assert TIED_ACCOUNTS > TOP_K
+
+
+@pytest.mark.parametrize('rank_by', ['pnl', 'win_rate'])
+def test_fused_tables_match_pandas(merged, rank_by):
+    assert_parity(pandas_tables(merged, top_k=TOP_K, rank_by=rank_by),
+                  fused_tables(merged, top_k=TOP_K, rank_by=rank_by))
+
+
+@pytest.mark.parametrize('rank_by', ['pnl', 'win_rate'])
+def test_cube_tables_match_pandas(merged, rank_by):
+    assert_parity(pandas_tables(merged, top_k=TOP_K, rank_by=rank_by),
+                  Cube.build(merged).tables(top_k=TOP_K, rank_by=rank_by))
+
+
+def test_top_k_ties_are_cut_like_pandas(merged):
+    top = Cube.build(merged).tables(top_k=TOP_K)['top_accounts_by_sentiment']
+    reference = pandas_tables(merged, top_k=TOP_K)['top_accounts_by_sentiment']
+    assert (top.groupby('classification', observed=True).size() <= TOP_K).all()
+    assert list(top['Account']) == list(reference['Account'])
+
+
+@pytest.mark.parametrize('engine', ['fused', 'cube'])
+def test_pipeline_tables_match_pandas(pipeline, engine):
+    expected = pipeline(use_cache=False, engine='pandas', top_k=TOP_K).get('tables')
+    assert_parity(expected, pipeline(engine=engine, top_k=TOP_K).get('tables'))
+
+
+@pytest.mark.parametrize('partition_by', ['month', 'account'])
+def test_worker_cubes_merge_like_the_serial_cube(pipeline, partition_by):
+    serial = pipeline(engine='cube', top_k=TOP_K)
+    parallel = pipeline(workers=2, partition_by=partition_by, top_k=TOP_K)
+    assert_parity(serial.get('tables'), parallel.get('tables'))
+    pd.testing.assert_frame_equal(serial.get('cube').histograms, parallel.get('cube').histograms)
+    parallel.get('summary')
+    assert not {'load', 'schema', 'join', 'derived_metrics'} & set(parallel.results)
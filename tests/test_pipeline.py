@@ -0,0 +1,37 @@
+import os
+import shutil
+
+import pytest
+
+from pipeline import Pipeline
+
+
+@pytest.mark.parametrize('engine, source', [('cube', 'cube'), ('fused', 'derived_metrics'),
+                                            ('pandas', 'derived_metrics')])
+def test_tables_build_only_their_engine_input(pipeline, engine, source):
+    p = pipeline(engine=engine)
+    assert p.plan('tables')[-2:] == [source, 'tables']
+    p.get('tables')
+    assert ('cube' in p.results) == (engine == 'cube')
+
+
+def test_engine_changes_the_tables_key(pipeline):
+    assert pipeline(engine='cube').key('tables') != pipeline(engine='fused').key('tables')
+
+
+def test_key_follows_content_not_mtime(dataset, tmp_path):
+    data = tmp_path / 'data'
+    shutil.copytree(dataset, data)
+    path = data / 'historical_data.csv'
+
+    def key():
+        return Pipeline(data, tmp_path / 'cache', tmp_path / 'out').key('tables')
+
+    before = key()
+    assert key() == before
+    # Same size and mtime, other content: as left by `cp -p` of an edited copy
+    stat = path.stat()
+    content = path.read_bytes()
+    path.write_bytes(content.replace(b'BUY', b'BUZ', 1))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert key() != before
@@ -0,0 +1,23 @@
+import numpy as np
+
+from aggregation import pandas_tables
+from significance import BOOTSTRAP_METRICS, significance, with_intervals
+
+
+def test_estimates_match_aggregated_metrics(merged):
+    intervals, tests = significance(merged, resamples=200, workers=1)
+    table = pandas_tables(merged)['sentiment_aggregated_metrics'].set_index('classification')
+    wide = intervals.pivot(index='classification', columns='metric', values='estimate')
+    for metric in BOOTSTRAP_METRICS:
+        assert (wide[metric].round(2) == table[metric].reindex(wide.index)).all(), metric
+
+
+def test_intervals_contain_estimates(merged):
+    intervals, tests = significance(merged, resamples=200, workers=1)
+    assert (intervals['ci_low'] <= intervals['estimate']).all()
+    assert (intervals['estimate'] <= intervals['ci_high']).all()
+    assert tests['p_value'].between(0, 1).all()
+
+    table = with_intervals(pandas_tables(merged)['sentiment_aggregated_metrics'], intervals)
+    for metric in BOOTSTRAP_METRICS:
+        assert not np.isnan(table[f'{metric}_ci_low']).any()
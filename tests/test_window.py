@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from comprehensive_analysis import main
+from cube import Cube
+from generate_report import _distribution_finding
+
+
+def directories(dataset, tmp_path):
+    return ['--data-dir', str(dataset), '--output-dir', str(tmp_path / 'out'), '--csv-dir', str(tmp_path / 'csv'),
+            '--cache-dir', str(tmp_path / 'cache')]
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'duckdb'])
+def test_empty_window_stops_with_a_message(dataset, tmp_path, backend):
+    if backend == 'duckdb':
+        pytest.importorskip('duckdb')
+    with pytest.raises(SystemExit, match='No trades with a sentiment reading between 2030-01-01 and 2030-02-01'):
+        main(directories(dataset, tmp_path) + ['--backend', backend, '--start', '2030-01-01', '--end', '2030-02-01'])
+    assert not (tmp_path / 'out' / 'analysis_summary.json').exists()
+
+
+def test_cube_summary_without_trade_days(merged):
+    empty = merged.iloc[:0]
+    summary = Cube.build(empty).summary(merged.iloc[:0].assign(total_volume_usd=[], avg_pnl=[], win_rate=[]))
+    assert summary['total_trades'] == 0
+    assert summary['date_range'] == {'start': 'nan', 'end': 'nan'}
+
+
+def test_report_for_a_window_without_fear(dataset, tmp_path):
+    # 2024-01-01 .. 2024-01-03 are Extreme Greed, Greed and Neutral days
+    main(directories(dataset, tmp_path) + ['--start', '2024-01-01', '--end', '2024-01-03', '--report', '--preview'])
+    with open(tmp_path / 'out' / 'analysis_summary.json') as f:
+        assert 'Fear' not in json.load(f)['sentiment_distribution']
+    assert (tmp_path / 'out' / 'ds_report.pdf').stat().st_size > 0
+
+
+@pytest.mark.parametrize('distribution, expected', [
+    ({'Greed': 3, 'Neutral': 5}, 'Neutral periods account for the most trades (5), followed by Greed (3)'),
+    ({'Greed': 3}, 'all trades (3) fall in Greed periods'),
+    ({}, 'no trades'),
+])
+def test_distribution_finding(distribution, expected):
+    assert expected in _distribution_finding(distribution)
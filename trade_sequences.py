@@ -0,0 +1,194 @@
+"""
+Per-account trade-sequence analytics.
+
+The main tables treat every fill on its own. Here each account's fills are
+put in time order (one sort by `Account`, `ts`) and followed along:
+
+- `gap_hours`: time since the account's previous fill;
+- `streak`: length of the current run of wins (> 0) or losses (< 0), over
+  the fills that closed with a nonzero PnL, this fill included;
+- `cumulative_pnl`: the account's realized PnL up to and including the fill;
+- `position_tokens` / `position_usd`: the running position in the fill's
+  coin after the fill, from the first fill's `Start Position` plus the
+  signed sizes since (the USD value at the fill's price);
+- `holding_hours`: for a `Close ...` fill, time since the latest `Open ...`
+  fill of the same account and coin.
+
+Nothing loops over accounts. Every column is a segmented scan over the
+sorted rows: a cumulative sum minus its value at the segment start, or a
+running maximum of row positions (the last open fill, the start of a run).
+`sequence_metrics` then aggregates the columns by `classification` with
+`aggregators.Moments`; streaks count once per completed run, under the
+sentiment of the run's last fill.
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregation import FusedAggregator
+from aggregators import Moments, group_quantiles
+from schema import decategorize
+
+SEQUENCE_COLUMNS = ['gap_hours', 'streak', 'cumulative_pnl', 'position_tokens', 'position_usd', 'holding_hours']
+
+HOUR_NS = 3600 * 10**9
+MISSING_TS = np.iinfo(np.int64).min
+
+
+def _codes(series):
+    """Integer codes of a key column, -1 where missing."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.int64)
+    return pd.factorize(series)[0].astype(np.int64)
+
+
+def _starts(keys):
+    """True on the first row of each run of equal `keys` (already sorted)."""
+    starts = np.ones(len(keys), dtype=bool)
+    starts[1:] = keys[1:] != keys[:-1]
+    return starts
+
+
+def _first_row(starts):
+    """Position of the first row of each row's segment."""
+    return np.maximum.accumulate(np.where(starts, np.arange(len(starts)), 0))
+
+
+def _segment_cumsum(values, starts):
+    """Cumulative sum of `values` restarting at every segment start."""
+    total = np.cumsum(values)
+    return total - (total - values)[_first_row(starts)]
+
+
+def _prefix_flags(series, prefix):
+    """Rows whose (categorical or string) value starts with `prefix`."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        flags = series.cat.categories.astype(str).str.startswith(prefix)
+        codes = series.cat.codes.to_numpy()
+        return np.where(codes >= 0, np.asarray(flags)[np.maximum(codes, 0)], False)
+    return series.astype(str).str.startswith(prefix).to_numpy()
+
+
+def _runs(account, outcome):
+    """
+    Win/loss runs over the decided fills (`outcome` +1 / -1), in sequence order.
+
+    Returns each fill's run position (1-based) and previous outcome in the
+    same account (0 for the account's first decided fill), and the last
+    fill and length of every run.
+    """
+    starts = _starts(account) | _starts(outcome)
+    position = np.arange(len(outcome)) - _first_row(starts) + 1
+    previous = np.zeros(len(outcome), dtype=np.int64)
+    previous[1:] = outcome[:-1]
+    previous[_starts(account)] = 0
+    ends = np.append(np.flatnonzero(starts)[1:], len(outcome)) - 1
+    return position, previous, ends, position[ends]
+
+
+def trade_sequences(merged):
+    """
+    `(columns, prior, runs)` for the fills of `merged` (with derived metrics).
+
+    `columns` holds the `SEQUENCE_COLUMNS` in `merged`'s row order, NaN where
+    undefined (no account or timestamp, an account's first fill, a close
+    without an open). `prior` is the outcome (+1 / -1, 0 for none) of the
+    account's previous decided fill, and `runs` is `(last row, length,
+    outcome)` of every win/loss run, rows being positions in `merged`.
+    """
+    n = len(merged)
+    account = _codes(merged['Account'])
+    ts = merged['ts'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    usable = (account >= 0) & (ts != MISSING_TS)
+    order = np.lexsort((ts, account))
+    order = order[usable[order]]
+    acc, when = account[order], ts[order]
+    first = _starts(acc)
+    out = {name: np.full(n, np.nan) for name in SEQUENCE_COLUMNS}
+
+    gap = np.full(len(order), np.nan)
+    gap[1:] = (when[1:] - when[:-1]) / HOUR_NS
+    gap[first] = np.nan
+    out['gap_hours'][order] = gap
+
+    pnl = np.nan_to_num(merged['Closed PnL'].to_numpy(dtype=np.float64, na_value=np.nan)[order])
+    out['cumulative_pnl'][order] = _segment_cumsum(pnl, first)
+
+    # Streaks over the fills that realized a win or a loss
+    decided = np.flatnonzero(pnl != 0)
+    outcome = np.sign(pnl[decided]).astype(np.int64)
+    position, previous, ends, lengths = _runs(acc[decided], outcome)
+    out['streak'][order[decided]] = outcome * position
+    prior = np.zeros(n, dtype=np.int64)
+    prior[order[decided]] = previous
+
+    # Running position per (account, coin): a stable sort of the sequence by
+    # coin within account keeps each pair's fills in time order
+    coin = _codes(merged['Coin'])[order]
+    held = coin >= 0
+    pair = np.where(held, acc * (coin.max() + 2) + coin, -1)
+    by_pair = np.argsort(pair, kind='stable')
+    by_pair = by_pair[held[by_pair]]
+    rows = order[by_pair]
+    pair_start = _starts(pair[by_pair])
+    side = (merged['is_buy'].to_numpy(dtype=np.float64) - merged['is_sell'].to_numpy(dtype=np.float64))[rows]
+    size = np.nan_to_num(merged['Size Tokens'].to_numpy(dtype=np.float64, na_value=np.nan)[rows])
+    opening = np.nan_to_num(merged['Start Position'].to_numpy(dtype=np.float64, na_value=np.nan)[rows])
+    tokens = opening[_first_row(pair_start)] + _segment_cumsum(side * size, pair_start)
+    out['position_tokens'][rows] = tokens
+    out['position_usd'][rows] = np.abs(tokens) * merged['Execution Price'].to_numpy(
+        dtype=np.float64, na_value=np.nan)[rows]
+
+    # Holding time: each close back to the pair's latest open
+    if 'Direction' in merged.columns:
+        direction = merged['Direction'].iloc[rows]
+        is_open, is_close = _prefix_flags(direction, 'Open'), _prefix_flags(direction, 'Close')
+        last_open = np.maximum.accumulate(np.where(is_open, np.arange(len(rows)), -1))
+        matched = is_close & (last_open >= _first_row(pair_start))
+        when = ts[rows]
+        out['holding_hours'][rows[matched]] = (when[matched] - when[last_open[matched]]) / HOUR_NS
+
+    runs = (order[decided][ends], lengths, outcome[ends])
+    return pd.DataFrame(out, index=merged.index), prior, runs
+
+
+def sequence_metrics(merged):
+    """Trade-sequence behaviour per `classification` (see the module docstring)."""
+    columns, prior, (run_ends, run_lengths, run_outcome) = trade_sequences(merged)
+    engine = FusedAggregator(merged)
+    codes, valid, keys = engine.group_codes(['classification'])
+    size = len(keys)
+    sentiment = np.full(len(merged), -1, dtype=np.int64)
+    sentiment[valid] = codes
+
+    def moments(values, where=None):
+        keep = sentiment >= 0 if where is None else (sentiment >= 0) & where
+        return Moments.from_values(sentiment[keep], values[keep], size, spread=False)
+
+    def median(values):
+        keep = sentiment >= 0
+        return group_quantiles(sentiment[keep], values[keep], size, [0.5])[0.5]
+
+    def run_moments(outcome):
+        keep = (run_outcome == outcome) & (sentiment[run_ends] >= 0)
+        return Moments.from_values(sentiment[run_ends][keep], run_lengths[keep], size, spread=False)
+
+    win = engine.values('win')
+    decided = engine.values('Closed PnL') != 0
+    wins, losses = run_moments(1), run_moments(-1)
+    table = decategorize(keys).assign(
+        trades=np.bincount(codes, minlength=size),
+        avg_gap_hours=moments(columns['gap_hours'].to_numpy()).avg(),
+        median_gap_hours=median(columns['gap_hours'].to_numpy()),
+        avg_holding_hours=moments(columns['holding_hours'].to_numpy()).avg(),
+        median_holding_hours=median(columns['holding_hours'].to_numpy()),
+        avg_position_usd=moments(columns['position_usd'].to_numpy()).avg(),
+        avg_cumulative_pnl=moments(columns['cumulative_pnl'].to_numpy()).avg(),
+        avg_win_streak=wins.avg(),
+        max_win_streak=np.where(wins.count > 0, wins.max, np.nan),
+        avg_loss_streak=losses.avg(),
+        max_loss_streak=np.where(losses.count > 0, losses.max, np.nan),
+    ).round(2)
+    table['win_rate_after_win'] = moments(win, decided & (prior == 1)).avg().round(4)
+    table['win_rate_after_loss'] = moments(win, decided & (prior == -1)).avg().round(4)
+    return table
@@ -0,0 +1,149 @@
+"""
+Day-ordered trade store for date-window scans.
+
+The columnar cache (`data_cache.py`) keeps the trades in CSV order, so any
+date window means reading and filtering every row. The store is a second
+copy of the cached trade columns, sorted by `ts` (trades without a timestamp
+last), with a day -> first-row offset index:
+
+    <cache_dir>/by_day/col_*.npy        the cache's column files, in ts order
+    <cache_dir>/by_day/day_offsets.npy  offsets[d - first_day] = first row on or after day d
+    <cache_dir>/by_day/store.json       column specs, day span and the cache build it was made from
+
+A date range is then one contiguous row slice of every memory-mapped column
+(no copy until the frame is built), and a set of days, such as the days of
+one sentiment, is a handful of slices. Reading a window therefore costs
+time and memory in proportion to the window, not to the full history. The
+store is built from the cache on first use and rebuilt when the cache is.
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_cache import MANIFEST_NAME, build_cache, cache_is_current, cache_specs, columnar_dir, read_frame
+from schema import epoch_days
+
+STORE_VERSION = 1
+STORE_DIR = 'by_day'
+STORE_MANIFEST = 'store.json'
+
+
+def _cache_build(cache_dir):
+    """Fingerprint of the cache build the store must match (the trade CSV's recorded hash)."""
+    with open(columnar_dir(cache_dir) / MANIFEST_NAME) as f:
+        return json.load(f)['sources']['historical_data.csv']['sha256']
+
+
+def build_store(cache_dir, directory=None):
+    """Write the store for the current columnar cache and return its manifest."""
+    cache_dir = Path(cache_dir)
+    directory = Path(directory) if directory else cache_dir / STORE_DIR
+    specs = cache_specs(cache_dir)['historical']
+    source = columnar_dir(cache_dir) / 'historical'
+
+    ts_spec = next(spec for spec in specs if spec['name'] == 'ts')
+    ts = np.load(source / ts_spec['file'], mmap_mode='r')
+    missing = ts == np.iinfo(np.int64).min
+    # Stable, so trades with equal timestamps keep their CSV order
+    order = np.argsort(np.where(missing, np.iinfo(np.int64).max, ts), kind='stable')
+
+    staging = directory.with_name(directory.name + '.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    for spec in specs:
+        np.save(staging / spec['file'], np.load(source / spec['file'], mmap_mode='r')[order])
+        if 'uniques' in spec:
+            shutil.copyfile(source / spec['uniques'], staging / spec['uniques'])
+
+    dated = int((~missing).sum())
+    days = epoch_days(ts[order[:dated]].view('datetime64[ns]'))
+    first_day = int(days[0]) if dated else 0
+    span = int(days[-1]) - first_day + 1 if dated else 0
+    offsets = np.searchsorted(days, first_day + np.arange(span + 1), side='left')
+    np.save(staging / 'day_offsets.npy', offsets.astype(np.int64))
+
+    manifest = {
+        'version': STORE_VERSION,
+        'source': _cache_build(cache_dir),
+        'specs': specs,
+        'rows': int(len(ts)),
+        'dated_rows': dated,
+        'first_day': first_day,
+    }
+    with open(staging / STORE_MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    staging.rename(directory)
+    return manifest
+
+
+class TradeStore:
+    """Row slices of the day-ordered store; see the module docstring."""
+
+    def __init__(self, directory, manifest):
+        self.directory = Path(directory)
+        self.specs = manifest['specs']
+        self.rows = manifest['rows']
+        self.dated_rows = manifest['dated_rows']
+        self.first_day = manifest['first_day']
+        self.offsets = np.load(self.directory / 'day_offsets.npy')
+
+    @classmethod
+    def open(cls, cache_dir, rebuild=False):
+        """The store of `cache_dir`'s current cache, (re)built when missing or made from an older cache."""
+        directory = Path(cache_dir) / STORE_DIR
+        manifest = None
+        if not rebuild and (directory / STORE_MANIFEST).exists():
+            with open(directory / STORE_MANIFEST) as f:
+                manifest = json.load(f)
+            if manifest.get('version') != STORE_VERSION or manifest['source'] != _cache_build(cache_dir):
+                manifest = None
+        if manifest is None:
+            print(f"Building day-ordered trade store in {directory}...")
+            manifest = build_store(cache_dir, directory)
+        return cls(directory, manifest)
+
+    def _offset(self, day):
+        return int(self.offsets[min(max(day - self.first_day, 0), len(self.offsets) - 1)])
+
+    def day_range(self, first_day=None, last_day=None):
+        """Row slice of the trades with `first_day <= day <= last_day` (inclusive; either bound optional)."""
+        start = 0 if first_day is None else self._offset(first_day)
+        stop = self.dated_rows if last_day is None else self._offset(last_day + 1)
+        return slice(start, max(start, stop))
+
+    def day_rows(self, days):
+        """Row positions of the trades on any of `days` (e.g. one sentiment's days), in store order."""
+        slots = np.unique(np.asarray(days, dtype=np.int64)) - self.first_day
+        slots = slots[(slots >= 0) & (slots < len(self.offsets) - 1)]
+        starts, lengths = self.offsets[slots], self.offsets[slots + 1] - self.offsets[slots]
+        # The runs starts[i] .. starts[i] + lengths[i], concatenated without a loop
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    def read(self, rows=slice(None), categorical=(), columns=None):
+        """The trades at `rows` (a slice reads each mapped column as a view)."""
+        return read_frame(self.directory, self.specs, categorical=categorical, columns=columns, rows=rows)
+
+
+def window_days(start=None, end=None):
+    """Inclusive `(first_day, last_day)` epoch-days of date strings (None where open)."""
+    return tuple(None if value is None else int(epoch_days([pd.Timestamp(value)])[0]) for value in (start, end))
+
+
+def load_window(base_dir, cache_dir, start=None, end=None, rebuild=False, categorical=()):
+    """
+    `(fear_greed, trades)` like `data_cache.load_datasets`, with only the
+    trades dated `start` to `end` (inclusive) read, from the store.
+    """
+    if rebuild or not cache_is_current(cache_dir, base_dir):
+        print(f"Building columnar cache in {cache_dir}...")
+        build_cache(base_dir, cache_dir)
+    specs = cache_specs(cache_dir)
+    fear_greed = read_frame(columnar_dir(cache_dir) / 'fear_greed', specs['fear_greed'], categorical=categorical)
+    store = TradeStore.open(cache_dir)
+    trades = store.read(store.day_range(*window_days(start, end)), categorical=categorical)
+    return fear_greed, trades